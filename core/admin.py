@@ -5,8 +5,11 @@ Interfaz administrativa optimizada para gestionar contenido del sistema.
 """
 
 from django.contrib import admin
+from django.db.models import Prefetch
 from django.utils.html import format_html
-from .models import Category, VideoAsset, Topic, Tag, Quiz
+from . import sequence
+from .signals import send_tag_changes
+from .models import Category, CourseSequenceEntry, VideoAsset, Topic, Tag, Quiz
 
 
 @admin.register(Category)
@@ -28,9 +31,10 @@ class CategoryAdmin(admin.ModelAdmin):
     icon_preview.short_description = 'Icono'
     
     def topic_count(self, obj):
-        """Muestra el número de topics en esta categoría."""
-        return obj.topics.count()
+        """Muestra el número de topics en esta categoría (publicados / total)."""
+        return f"{obj.published_topic_count} / {obj.topic_count}"
     topic_count.short_description = 'Temas'
+    topic_count.admin_order_field = 'topic_count'
 
 
 @admin.register(VideoAsset)
@@ -41,7 +45,7 @@ class VideoAssetAdmin(admin.ModelAdmin):
     list_display = ['title', 'platform', 'external_id', 'duration_formatted', 'topic_count', 'created_at']
     list_filter = ['platform', 'created_at']
     search_fields = ['title', 'external_id', 'description']
-    readonly_fields = ['created_at', 'updated_at', 'preview_url']
+    readonly_fields = ['created_at', 'updated_at', 'metadata_checked_at', 'preview_url']
     fieldsets = [
         ('Información del Video', {
             'fields': ['title', 'platform', 'external_id', 'duration_seconds', 'uploaded_date']
@@ -54,7 +58,7 @@ class VideoAssetAdmin(admin.ModelAdmin):
             'classes': ['collapse']
         }),
         ('Metadata', {
-            'fields': ['created_at', 'updated_at'],
+            'fields': ['created_at', 'updated_at', 'metadata_checked_at'],
             'classes': ['collapse']
         }),
     ]
@@ -73,9 +77,9 @@ class VideoAssetAdmin(admin.ModelAdmin):
     
     def topic_count(self, obj):
         """Muestra el número de topics que usan este video."""
-        count = obj.topics.count()
-        return format_html('<strong>{}</strong> temas', count)
+        return format_html('<strong>{}</strong> temas', obj.topic_count)
     topic_count.short_description = 'Topics'
+    topic_count.admin_order_field = 'topic_count'
     
     def preview_url(self, obj):
         """Genera un link de previsualización del video."""
@@ -112,6 +116,7 @@ class TopicAdmin(admin.ModelAdmin):
         'is_published'
     ]
     list_filter = ['category', 'location_tag', 'is_published', 'created_at']
+    list_select_related = ['category', 'video']
     search_fields = ['code', 'title', 'description', 'tags__name']
     list_editable = ['is_published']
     prepopulated_fields = {}
@@ -143,7 +148,13 @@ class TopicAdmin(admin.ModelAdmin):
         }),
     ]
     
-    ordering = ['code']
+    ordering = ['sort_key', 'code']
+    
+    def get_queryset(self, request):
+        """Tags precargados en una sola consulta para toda la página."""
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+        )
     
     def timestamp_formatted(self, obj):
         """Muestra el timestamp en formato legible."""
@@ -167,9 +178,10 @@ class TopicAdmin(admin.ModelAdmin):
     
     def tag_count(self, obj):
         """Muestra el número de tags."""
-        count = obj.tags.count()
+        tags = obj.tags.all()  # precargados en get_queryset
+        count = len(tags)
         if count > 0:
-            tags = ', '.join([tag.name for tag in obj.tags.all()[:3]])
+            tags = ', '.join([tag.name for tag in tags[:3]])
             if count > 3:
                 tags += f'... (+{count-3})'
             return format_html('<span title="{}">{} tags</span>', tags, count)
@@ -190,10 +202,37 @@ class TopicAdmin(admin.ModelAdmin):
         return '-'
     video_preview.short_description = 'Preview del Video'
     
+    def save_related(self, request, form, formsets, change):
+        """
+        TagInline edita la tabla intermedia directamente (sin m2m_changed);
+        se notifica la diferencia para mantener índice y contadores al día.
+        """
+        topic = form.instance
+        before = set(topic.tags.values_list('pk', flat=True)) if change else set()
+        super().save_related(request, form, formsets, change)
+        after = set(topic.tags.values_list('pk', flat=True))
+        send_tag_changes(topic, added=after - before, removed=before - after)
+    
+    def changelist_view(self, request, extra_context=None):
+        """Las ediciones masivas (list_editable) reconstruyen la secuencia una sola vez."""
+        with sequence.batch():
+            return super().changelist_view(request, extra_context)
+    
+    def delete_queryset(self, request, queryset):
+        with sequence.batch():
+            super().delete_queryset(request, queryset)
+    
     def navigation_links(self, obj):
         """Muestra links de navegación al topic anterior/siguiente."""
-        prev_topic = obj.get_previous_topic()
-        next_topic = obj.get_next_topic()
+        entry = CourseSequenceEntry.objects.select_related(
+            'prev_topic', 'next_topic'
+        ).filter(topic=obj).first()
+        if entry:
+            prev_topic, next_topic = entry.prev_topic, entry.next_topic
+        else:
+            # Temas no publicados no están en la secuencia
+            prev_topic = obj.get_previous_topic()
+            next_topic = obj.get_next_topic()
         
         html = '<div>'
         if prev_topic:
@@ -227,19 +266,31 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ['name']
     filter_horizontal = ['topics']
     
+    def get_queryset(self, request):
+        """Sólo los primeros 5 códigos de cada tag, en una consulta (ventana por tag)."""
+        return super().get_queryset(request).prefetch_related(
+            Prefetch(
+                'topics',
+                queryset=Topic.objects.only('id', 'code', 'sort_key').in_course_order()[:5],
+                to_attr='preview_topics',
+            )
+        )
+    
     def topic_count_display(self, obj):
         """Muestra el número de topics etiquetados."""
         count = obj.get_topic_count()
         return format_html('<strong>{}</strong> temas', count)
     topic_count_display.short_description = 'Temas'
+    topic_count_display.admin_order_field = 'topic_count'
     
     def topic_preview(self, obj):
         """Muestra preview de los topics asociados."""
-        topics = obj.topics.all()[:5]
+        topics = obj.preview_topics
         if topics:
             preview = ', '.join([f"{t.code}" for t in topics])
-            if obj.get_topic_count() > 5:
-                preview += f'... (+{obj.get_topic_count()-5})'
+            count = obj.get_topic_count()
+            if count > 5:
+                preview += f'... (+{count-5})'
             return preview
         return '-'
     topic_preview.short_description = 'Preview'
@@ -279,9 +330,9 @@ class QuizAdmin(admin.ModelAdmin):
     
     def topic_count_display(self, obj):
         """Muestra el número de topics incluidos."""
-        count = obj.topics.count()
-        return format_html('<strong>{}</strong> temas', count)
+        return format_html('<strong>{}</strong> temas', obj.stats_topic_count)
     topic_count_display.short_description = 'Topics'
+    topic_count_display.admin_order_field = 'stats_topic_count'
     
     def topic_codes_display(self, obj):
         """Muestra los códigos de los topics incluidos."""
@@ -292,16 +343,25 @@ class QuizAdmin(admin.ModelAdmin):
     topic_codes_display.short_description = 'Códigos de Temas'
     
     def estimated_duration(self, obj):
-        """Muestra la duración estimada total."""
+        """Muestra la duración estimada total (estadísticas cacheadas del quiz)."""
         total_seconds = obj.get_total_duration_seconds()
         if total_seconds:
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-            if hours > 0:
-                return f"{hours}h {minutes}m"
-            return f"{minutes}m"
+            return format_html(
+                '{} de video ({} en los segmentos evaluados) · {} categoría(s)',
+                self.format_minutes(total_seconds),
+                self.format_minutes(obj.stats_segment_seconds),
+                obj.stats_category_count,
+            )
         return 'No calculado'
     estimated_duration.short_description = 'Duración Estimada'
+    
+    @staticmethod
+    def format_minutes(total_seconds):
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        if hours > 0:
+            return f"{hours}h {minutes}m"
+        return f"{minutes}m"
 
 
 # Configuración del sitio admin
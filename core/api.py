@@ -0,0 +1,443 @@
+"""
+API JSON de solo lectura
+=========================
+Para kioscos y la app móvil (antes raspaban el HTML).
+
+    GET /api/categories/
+    GET /api/topics/?category=<slug>&limit=50&after=<cursor>|before=<cursor>|code=<código>
+    GET /api/topics/<code>/
+    GET /api/videos/<id>/chapters/?t=<segundos>
+    GET /api/tags/
+    GET /api/quizzes/
+    GET /api/search/?q=<texto>&offset=0&limit=20
+    GET /api/transcripts/search/?q=<frase>&limit=20
+    GET /api/sync/?since=<versión>&location=<ubicación>&category=<slug>&limit=500
+    GET /api/suggest/?q=<prefijo>&limit=8
+
+Todas (menos chapters, transcripts, sync y suggest) aceptan ?fields=a,b,c para devolver sólo esos campos.
+
+Los topics salen de TopicPayload (JSON ya serializado, ver core.payloads):
+un listado es una consulta sobre el índice (sort_key, code) más la
+concatenación de los textos guardados. Las respuestas llevan ETag /
+Last-Modified y se cachean completas para clientes anónimos (mismos mixins
+que las vistas HTML), así el polling de los kioscos se responde con 304 o
+desde el caché.
+
+sync es el feed incremental de los dispositivos de piso (core.changelog):
+devuelve la última versión de cada objeto que cambió desde `since`, o un
+tombstone si se borró (o dejó de aplicar a su ubicación/categoría), y la
+versión a pedir la próxima vez. Mientras "more" sea true hay que seguir
+pidiendo con since=<version>. Mientras el registro retiene entradas
+recientes (ver core.changelog) la respuesta no se cachea ni lleva ETag:
+cambia al liberarlas aunque no cambie la versión de contenido.
+
+suggest es el autocompletado del buscador: responde desde el índice en
+memoria de core.typeahead, sin consultas ni caché de páginas.
+"""
+
+import json
+import math
+
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.views import View
+
+from . import chapters, changelog, search, transcripts, typeahead
+from .cache import CachedPageMixin, ConditionalGetMixin
+from .models import Category, ChangeLogEntry, Quiz, Tag, Topic, TopicPayload, VideoAsset
+from .pagination import KeysetPaginator
+from .payloads import PAYLOAD_FIELDS, dumps, select_fields
+from .views import latest
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 2000
+
+
+class ApiError(Exception):
+    """Parámetro inválido: se responde 400 con el mensaje."""
+
+
+class ApiView(ConditionalGetMixin, CachedPageMixin, View):
+    """Base de los endpoints: JSON, ?fields= y errores 400."""
+    fields = ()  # campos disponibles para ?fields=
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return self.render(self.get_body())
+        except ApiError as exc:
+            return HttpResponseBadRequest(dumps({'error': str(exc)}), content_type='application/json')
+
+    def get_body(self):
+        raise NotImplementedError
+
+    def render(self, body):
+        return HttpResponse(body, content_type='application/json')
+
+    def get_fields(self):
+        """Campos pedidos en ?fields= (None: todos)."""
+        raw = self.request.GET.get('fields', '').strip()
+        if not raw:
+            return None
+        fields = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Campos desconocidos: {', '.join(unknown)}")
+        return fields
+
+    def get_limit(self, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+        try:
+            limit = int(self.request.GET.get('limit', default))
+        except ValueError:
+            raise ApiError('limit debe ser un número')
+        return max(1, min(limit, maximum))
+
+    def serialize_list(self, rows):
+        """Lista de dicts -> texto JSON, aplicando ?fields=."""
+        fields = self.get_fields()
+        if fields:
+            rows = [{name: row[name] for name in fields} for row in rows]
+        return dumps({'results': rows})
+
+
+def join_payloads(payloads, fields):
+    """Concatena los JSON guardados (o sus versiones reducidas)."""
+    if fields:
+        return ','.join(select_fields(payload.data, fields) for payload in payloads)
+    return ','.join(payload.data for payload in payloads)
+
+
+class CategoryListApiView(ApiView):
+    fields = ('slug', 'name', 'icon', 'description', 'order', 'topic_count', 'url')
+
+    def get_validator_state(self):
+        state = Category.objects.aggregate(total=Count('pk'), latest=Max('updated_at'))
+        # published_topic_count cambia sin tocar Category.updated_at
+        topics = TopicPayload.objects.aggregate(latest=Max('updated_at'), total=Count('pk'))
+        return (latest(state['latest'], topics['latest']), state['total'], topics['total'])
+
+    def get_body(self):
+        return self.serialize_list([
+            {
+                'slug': category.slug,
+                'name': category.name,
+                'icon': category.icon,
+                'description': category.description,
+                'order': category.order,
+                'topic_count': category.published_topic_count,
+                'url': reverse('core:category_list', kwargs={'slug': category.slug}),
+            }
+            for category in Category.objects.all()
+        ])
+
+
+class TopicListApiView(ApiView):
+    """Temas publicados en orden de curso, paginados por cursor."""
+    fields = PAYLOAD_FIELDS
+    validator_params = ('category',)
+
+    def get_payloads(self):
+        payloads = TopicPayload.objects.published().only('topic_id', 'sort_key', 'code', 'data')
+        slug = self.request.GET.get('category')
+        if slug:
+            category = Category.objects.filter(slug=slug).values_list('pk', flat=True).first()
+            if category is None:
+                raise ApiError(f'Categoría inexistente: {slug}')
+            payloads = payloads.filter(category_id=category)
+        return payloads
+
+    def get_validator_state(self):
+        try:
+            payloads = self.get_payloads()
+        except ApiError:
+            return None
+        state = payloads.aggregate(total=Count('pk'), latest=Max('updated_at'))
+        return (state['latest'], state['total'])
+
+    def get_body(self):
+        params = self.request.GET
+        page = KeysetPaginator(self.get_payloads(), self.get_limit()).page(
+            after=params.get('after'),
+            before=params.get('before'),
+            code=params.get('code', '').strip(),
+        )
+        return (
+            '{"results":[' + join_payloads(page, self.get_fields()) + '],'
+            f'"next":{json.dumps(page.next_cursor)},"previous":{json.dumps(page.previous_cursor)}}}'
+        )
+
+
+class TopicDetailApiView(ApiView):
+    fields = PAYLOAD_FIELDS
+
+    def get_validator_state(self):
+        payload = TopicPayload.objects.published().filter(code=self.kwargs['code']).values_list(
+            'updated_at', flat=True
+        ).first()
+        return (payload,) if payload else None
+
+    def get(self, request, *args, **kwargs):
+        self.payload = TopicPayload.objects.published().filter(code=kwargs['code']).first()
+        if self.payload is None:
+            return HttpResponse(dumps({'error': 'No encontrado'}), status=404, content_type='application/json')
+        return super().get(request, *args, **kwargs)
+
+    def get_body(self):
+        return join_payloads([self.payload], self.get_fields())
+
+
+class ChapterMapApiView(ApiView):
+    """
+    Mapa de capítulos de un video (core.chapters) tal como está guardado.
+    Con ?t=<segundos> agrega "active": el índice del capítulo que se
+    reproduce en ese segundo (null si ninguno).
+    """
+
+    def get_validator_state(self):
+        updated_at = VideoAsset.objects.filter(pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+        return (updated_at,) if updated_at else None
+
+    def get(self, request, *args, **kwargs):
+        self.video = VideoAsset.objects.filter(pk=kwargs['pk']).only('pk', 'duration_seconds', 'chapter_map').first()
+        if self.video is None:
+            return HttpResponse(dumps({'error': 'No encontrado'}), status=404, content_type='application/json')
+        return super().get(request, *args, **kwargs)
+
+    def get_body(self):
+        body = {'video': self.video.pk, 'duration_seconds': self.video.duration_seconds}
+        body.update(chapters.build_map([], self.video.duration_seconds))
+        body.update(self.video.chapter_map)
+        if 't' in self.request.GET:
+            try:
+                seconds = float(self.request.GET['t'])
+            except ValueError:
+                seconds = None
+            if seconds is None or not math.isfinite(seconds):
+                raise ApiError('t debe ser un número de segundos')
+            body['active'] = chapters.get_map(self.video).locate(seconds)
+        return dumps(body)
+
+
+class TagListApiView(ApiView):
+    fields = ('slug', 'name', 'topic_count')
+
+    def get_validator_state(self):
+        state = Tag.objects.aggregate(total=Count('pk'), latest=Max('updated_at'))
+        # Los cambios de relaciones tag x topic regeneran los payloads
+        topics = TopicPayload.objects.aggregate(latest=Max('updated_at'))
+        return (latest(state['latest'], topics['latest']), state['total'])
+
+    def get_body(self):
+        return self.serialize_list([
+            {'slug': slug, 'name': name, 'topic_count': count}
+            for slug, name, count in Tag.objects.values_list('slug', 'name', 'published_topic_count')
+        ])
+
+
+class QuizListApiView(ApiView):
+    fields = (
+        'id', 'title', 'description', 'passing_score', 'time_limit_minutes', 'topic_codes',
+        'topic_count', 'total_duration_seconds', 'segment_seconds',
+    )
+
+    def get_validator_state(self):
+        state = Quiz.objects.filter(is_active=True).aggregate(
+            total=Count('pk'), latest=Max('updated_at'), stats=Max('stats_updated_at')
+        )
+        return (latest(state['latest'], state['stats']), state['total'])
+
+    def get_body(self):
+        return self.serialize_list([
+            {
+                'id': quiz.pk,
+                'title': quiz.title,
+                'description': quiz.description,
+                'passing_score': quiz.passing_score,
+                'time_limit_minutes': quiz.time_limit_minutes,
+                'topic_codes': quiz.get_topic_codes(),
+                'topic_count': quiz.stats_topic_count,
+                'total_duration_seconds': quiz.stats_total_duration_seconds,
+                'segment_seconds': quiz.stats_segment_seconds,
+            }
+            for quiz in Quiz.objects.filter(is_active=True)
+        ])
+
+
+class SuggestApiView(View):
+    """Sugerencias por prefijo (core.typeahead)."""
+
+    def get(self, request):
+        try:
+            limit = int(request.GET.get('limit', typeahead.DEFAULT_LIMIT))
+        except ValueError:
+            return HttpResponseBadRequest(dumps({'error': 'limit debe ser un número'}), content_type='application/json')
+        results = typeahead.suggest(request.GET.get('q', ''), limit)
+        response = HttpResponse('{"results":[' + ','.join(results) + ']}', content_type='application/json')
+        response['Cache-Control'] = 'private, max-age=60'
+        return response
+
+
+class SearchApiView(ApiView):
+    """
+    Resultados de core.search.execute() (cacheados por consulta y filtros:
+    category, location, tag, platform); cada página concatena los payloads
+    de sus ids en orden de relevancia.
+    """
+    fields = PAYLOAD_FIELDS
+
+    def get_validator_state(self):
+        return None  # la búsqueda tiene su propio caché (namespace 'search')
+
+    def get_body(self):
+        try:
+            offset = max(0, int(self.request.GET.get('offset', 0)))
+        except ValueError:
+            raise ApiError('offset debe ser un número')
+        limit = self.get_limit(default=20)
+        result = search.execute(self.request.GET.get('q', ''), search.parse_filters(self.request.GET))
+        ids = result.ids[offset:offset + limit]
+        payloads = TopicPayload.objects.published().filter(pk__in=ids).only('topic_id', 'data').in_bulk()
+        page = [payloads[pk] for pk in ids if pk in payloads]
+        return (
+            f'{{"query":{json.dumps(result.query)},"total":{result.total},'
+            f'"limited":{json.dumps(result.limited)},'
+            f'"fuzzy":{json.dumps(result.fuzzy)},"suggestion":{json.dumps(result.suggestion)},'
+            f'"filters":{dumps(result.filters)},"facets":{dumps(result.facets)},'
+            '"results":[' + join_payloads(page, self.get_fields()) + ']}'
+        )
+
+
+class TranscriptSearchApiView(ApiView):
+    """
+    Momentos de los videos donde se dice la frase (core.transcripts): enlace
+    de embed al segundo exacto y el tema que se reproduce en ese momento.
+    """
+
+    def get_validator_state(self):
+        return None  # cacheada en el namespace 'search', como la búsqueda
+
+    def get_body(self):
+        limit = self.get_limit(default=transcripts.DEFAULT_LIMIT, maximum=transcripts.MAX_LIMIT)
+        hits = transcripts.search(self.request.GET.get('q', ''), limit)
+        return dumps({'results': [hit.as_dict() for hit in hits]})
+
+
+# Datos de cada modelo en el feed de sync: sin contadores ni estadísticas
+# (cambian sin que cambie el objeto; el dispositivo los deriva de lo que tiene)
+
+def sync_categories(ids):
+    return {
+        category.pk: {
+            'id': category.pk, 'slug': category.slug, 'name': category.name, 'icon': category.icon,
+            'description': category.description, 'order': category.order,
+        }
+        for category in Category.objects.filter(pk__in=ids)
+    }
+
+
+def sync_videos(ids):
+    return {
+        video.pk: {
+            'id': video.pk, 'title': video.title, 'platform': video.platform,
+            'external_id': video.external_id, 'duration_seconds': video.duration_seconds,
+            'embed_url': video.get_embed_url(), 'watch_url': video.get_watch_url(),
+        }
+        for video in VideoAsset.objects.filter(pk__in=ids)
+    }
+
+
+def sync_tags(ids):
+    return {
+        pk: {'id': pk, 'slug': slug, 'name': name}
+        for pk, slug, name in Tag.objects.filter(pk__in=ids).values_list('pk', 'slug', 'name')
+    }
+
+
+def sync_quizzes(ids):
+    return {
+        quiz.pk: {
+            'id': quiz.pk, 'title': quiz.title, 'description': quiz.description,
+            'passing_score': quiz.passing_score, 'time_limit_minutes': quiz.time_limit_minutes,
+            'topic_codes': quiz.get_topic_codes(),
+        }
+        for quiz in Quiz.objects.filter(pk__in=ids, is_active=True)
+    }
+
+
+SYNC_SERIALIZERS = {
+    'category': sync_categories,
+    'video': sync_videos,
+    'tag': sync_tags,
+    'quiz': sync_quizzes,
+}
+
+
+class SyncApiView(ApiView):
+    """Cambios desde una versión del registro (ver core.changelog)."""
+    validator_params = ('since', 'location', 'category', 'limit')
+
+    @cached_property
+    def held_back(self):
+        return changelog.has_held_back()
+
+    def get_page_cache_timeout(self):
+        return 0 if self.held_back else super().get_page_cache_timeout()
+
+    def get_validators(self):
+        return (None, None) if self.held_back else super().get_validators()
+
+    def get_filters(self):
+        params = self.request.GET
+        try:
+            since = max(0, int(params.get('since', 0)))
+        except ValueError:
+            raise ApiError('since debe ser un número')
+        location = params.get('location', '').strip() or None
+        if location and location not in dict(Topic.LOCATION_CHOICES):
+            raise ApiError(f'Ubicación desconocida: {location}')
+        category = None
+        slug = params.get('category')
+        if slug:
+            category = Category.objects.filter(slug=slug).values_list('pk', flat=True).first()
+            if category is None:
+                raise ApiError(f'Categoría inexistente: {slug}')
+        return since, location, category
+
+    def get_validator_state(self):
+        try:
+            self.get_filters()
+        except ApiError:
+            return None
+        state = ChangeLogEntry.objects.aggregate(latest=Max('created_at'), version=Max('id'))
+        return (state['latest'], state['version']) if state['latest'] else None
+
+    def get_body(self):
+        since, location, category = self.get_filters()
+        entries, version, more = changelog.changes(
+            since, location=location, category_id=category,
+            limit=self.get_limit(default=SYNC_DEFAULT_LIMIT, maximum=SYNC_MAX_LIMIT),
+        )
+        wanted = {}
+        for entry in entries:
+            if entry.action == 'upsert':
+                wanted.setdefault(entry.model, []).append(entry.object_id)
+        data = {model: serialize(wanted[model]) for model, serialize in SYNC_SERIALIZERS.items() if model in wanted}
+        # Los temas salen tal cual de TopicPayload (texto JSON ya guardado)
+        data['topic'] = dict(
+            TopicPayload.objects.published().filter(pk__in=wanted.get('topic', [])).values_list('topic_id', 'data')
+        )
+        changes = []
+        for entry in entries:
+            found = data.get(entry.model, {}).get(entry.object_id)
+            # Borrado (o despublicado) después de registrarse el cambio
+            if entry.action == 'delete' or found is None:
+                changes.append(f'{{"model":"{entry.model}","id":{entry.object_id},"action":"delete"}}')
+                continue
+            if entry.model != 'topic':
+                found = dumps(found)
+            changes.append(f'{{"model":"{entry.model}","id":{entry.object_id},"action":"upsert","data":{found}}}')
+        return f'{{"version":{version},"more":{json.dumps(more)},"changes":[' + ','.join(changes) + ']}'
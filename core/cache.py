@@ -0,0 +1,222 @@
+"""
+Utilidades de caché
+====================
+Versionado de namespaces: en lugar de borrar claves una a una, cada namespace
+tiene un número de versión que forma parte de sus claves. Incrementarlo
+invalida de golpe todo lo cacheado bajo ese namespace.
+
+Namespaces en uso: 'search' (resultados de búsqueda) y 'content' (páginas
+públicas completas, ver CachedPageMixin).
+"""
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+VERSION_KEY = 'version:{}'
+
+
+def initial_version():
+    """
+    Versión inicial basada en el reloj: si la clave de versión se pierde
+    (desalojo, reinicio del backend) nunca se reutiliza un número anterior.
+    """
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    """Versión actual del namespace."""
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), timeout=None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_version(namespace):
+    """Invalida todo el namespace. Retorna la nueva versión."""
+    key = VERSION_KEY.format(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # La clave no existía (o fue desalojada)
+        cache.add(key, initial_version(), timeout=None)
+        return cache.incr(key)
+
+
+def make_key(namespace, *parts):
+    """Clave versionada y de longitud fija: '<namespace>:<versión>:<md5>'."""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'{namespace}:{get_version(namespace)}:{digest}'
+
+
+# --- Caché de páginas completas ----------------------------------------------
+
+PAGE_NAMESPACE = 'content'
+PAGE_STATS_KEY = 'page_cache:{}'
+# Último (digest, Last-Modified) de cada página, sin versión (ver ConditionalGetMixin)
+LAST_VALIDATORS_KEY = 'validators:{}'
+
+
+def page_cache_key(request, *variant):
+    """
+    Clave de la página: path + query string (incluye ?page=) normalizado, y
+    `variant` (ver CachedPageMixin.get_cache_variant).
+    """
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return make_key(PAGE_NAMESPACE, request.path, query, *variant)
+
+
+def record_page_cache(outcome):
+    """Incrementa el contador 'hit' o 'miss' del caché de páginas."""
+    key = PAGE_STATS_KEY.format(outcome)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+
+def page_cache_stats():
+    """{'hit': n, 'miss': n, 'ratio': hits / total}"""
+    stats = {outcome: cache.get(PAGE_STATS_KEY.format(outcome), 0) for outcome in ('hit', 'miss')}
+    total = stats['hit'] + stats['miss']
+    stats['ratio'] = stats['hit'] / total if total else 0.0
+    return stats
+
+
+class CachedPageMixin:
+    """
+    Cachea la respuesta completa de una vista pública para visitantes anónimos.
+
+    La clave incluye la versión del namespace 'content', que los signals
+    incrementan ante cualquier cambio de contenido: no hay que borrar páginas
+    una a una y el tráfico estable no llega a la base de datos.
+    """
+    page_cache_timeout = None  # None: settings.PAGE_CACHE_TIMEOUT
+
+    def get_cache_variant(self):
+        """
+        Datos además de la versión 'content' de los que depende la página
+        (ej: la versión del snapshot del catálogo que la renderiza).
+        """
+        return ()
+
+    def get_page_cache_timeout(self):
+        if self.page_cache_timeout is not None:
+            return self.page_cache_timeout
+        return getattr(settings, 'PAGE_CACHE_TIMEOUT', 3600)
+
+    def is_page_cacheable(self, request):
+        user = getattr(request, 'user', None)
+        return (
+            request.method == 'GET'
+            and not (user and user.is_authenticated)
+            and self.get_page_cache_timeout() > 0
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_cache_key(request, *self.get_cache_variant())
+        response = cache.get(key)
+        if response is not None:
+            record_page_cache('hit')
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        record_page_cache('miss')
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            if hasattr(response, 'render'):
+                response.add_post_render_callback(
+                    lambda rendered: cache.set(key, rendered, self.get_page_cache_timeout())
+                )
+            else:
+                cache.set(key, response, self.get_page_cache_timeout())
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+
+# --- GET condicional ----------------------------------------------------------
+
+class ConditionalGetMixin:
+    """
+    Responde 304 a If-None-Match / If-Modified-Since sin renderizar.
+
+    La vista implementa get_validator_state(): una tupla cuyo primer elemento
+    es la fecha de la última modificación de lo que muestra la página (o None
+    si no se puede calcular) y el resto datos que también cambian el
+    contenido (ej: cuántas filas hay, para detectar borrados). Se calcula con
+    una consulta y se cachea bajo la versión del namespace 'content', así que
+    mientras nada cambie la revalidación no llega a la base de datos.
+
+    `validator_params` lista los parámetros de la query string que cambian
+    el estado (ej: un filtro); el resto (página, cursor) no lo afecta.
+
+    Last-Modified sólo ve las filas que quedan: borrar (o despublicar) una
+    que no era la más nueva cambia el ETag pero no esa fecha. Por eso el
+    último par (ETag, fecha) de cada página se guarda fuera del namespace
+    versionado, y si el ETag cambió sin que la fecha avanzara se usa el
+    momento del recálculo: un cliente que sólo manda If-Modified-Since
+    tampoco recibe un 304 de una página que perdió filas.
+    """
+    validator_params = ()
+
+    def get_validator_state(self):
+        raise NotImplementedError
+
+    def get_cache_variant(self):
+        """Como CachedPageMixin.get_cache_variant: forma parte de la clave."""
+        return ()
+
+    def get_validators(self):
+        """(etag, last_modified) de la página, o (None, None)."""
+        scope = (self.request.path,) + tuple(
+            self.request.GET.get(name, '') for name in self.validator_params
+        ) + tuple(self.get_cache_variant())
+        key = make_key(PAGE_NAMESPACE, 'validators', *scope)
+        validators = cache.get(key)
+        if validators is None:
+            state = self.get_validator_state()
+            if not state or state[0] is None:
+                validators = (None, None)
+            else:
+                digest = hashlib.md5(repr(scope + tuple(state)).encode()).hexdigest()
+                validators = (quote_etag(digest), self.get_last_modified(scope, digest, state[0]))
+            timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 3600)
+            if timeout:
+                cache.set(key, validators, timeout)
+        return validators
+
+    def get_last_modified(self, scope, digest, modified_at):
+        """Timestamp de Last-Modified: nunca igual al anterior si el ETag cambió."""
+        last_modified = int(modified_at.timestamp())
+        key = LAST_VALIDATORS_KEY.format(hashlib.md5(repr(scope).encode()).hexdigest())
+        previous = cache.get(key)
+        if previous and previous[0] != digest and last_modified <= previous[1]:
+            last_modified = max(previous[1] + 1, int(time.time()))
+        cache.set(key, (digest, last_modified), timeout=None)
+        return last_modified
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        etag, last_modified = self.get_validators()
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+        response = super().dispatch(request, *args, **kwargs)
+        if etag is not None and response.status_code == 200:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
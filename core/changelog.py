@@ -0,0 +1,127 @@
+"""
+Registro de cambios (sincronización incremental)
+=================================================
+Los dispositivos de piso (bodega, cedi, caja...) tienen mala conectividad:
+en vez de bajar el catálogo completo piden "los cambios desde la versión N"
+(GET /api/sync/, ver core.api.SyncApiView).
+
+- Cada cambio de Category, VideoAsset, Topic, Tag o Quiz agrega una fila a
+  ChangeLogEntry; su id autoincremental es la versión.
+- Los borrados quedan como 'delete' (tombstone). Un tema que deja de estar
+  publicado, o que cambia de ubicación o de categoría, deja un tombstone con
+  la ubicación/categoría anterior: así el dispositivo que filtraba por ellas
+  se entera de que debe quitarlo.
+- Los temas se registran cuando cambia su payload (core.payloads), que ya
+  cubre los cambios de categoría, video y tags; los demás modelos desde
+  los signals y el importador.
+- changes() devuelve sólo la última entrada de cada objeto, así la
+  respuesta es proporcional a lo que cambió y no a la cantidad de cambios.
+- La versión que se entrega no incluye las entradas de los últimos
+  CHANGELOG_COMMIT_LAG_SECONDS: los ids se asignan al insertar y no al
+  confirmar, así que una transacción aún abierta puede tener un id menor
+  que otro ya visible. Un dispositivo que avanzara hasta ese id no vería
+  nunca la entrada atrasada; con el margen la recibe en la consulta siguiente.
+- compact() borra entradas reemplazadas por otra más nueva del mismo objeto
+  (comando compact_changelog); no cambia lo que ve ningún dispositivo.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import ChangeLogEntry
+
+
+# Temas que ven todos los dispositivos, además de los de su ubicación
+SHARED_LOCATIONS = ('', 'general')
+
+
+def record(model, object_ids, action='upsert'):
+    """Una entrada por id (model es una clave de ChangeLogEntry.MODEL_CHOICES)."""
+    ChangeLogEntry.objects.bulk_create(
+        [ChangeLogEntry(model=model, object_id=pk, action=action) for pk in object_ids if pk is not None]
+    )
+
+
+def record_topics(changes):
+    """
+    `changes`: tuplas (topic_id, anterior, actual) donde anterior/actual son
+    (location_tag, category_id) si el tema estaba/está publicado, o None.
+    """
+    entries = []
+    for topic_id, previous, current in changes:
+        if previous is not None and previous != current:
+            location_tag, category_id = previous
+            entries.append(ChangeLogEntry(
+                model='topic', object_id=topic_id, action='delete',
+                location_tag=location_tag, category_id=category_id,
+            ))
+        if current is not None:
+            location_tag, category_id = current
+            entries.append(ChangeLogEntry(
+                model='topic', object_id=topic_id,
+                location_tag=location_tag, category_id=category_id,
+            ))
+    ChangeLogEntry.objects.bulk_create(entries)
+
+
+def current_version(lag=None):
+    """
+    Última versión confirmada: el id más alto entre las entradas con más de
+    `lag` segundos (por defecto CHANGELOG_COMMIT_LAG_SECONDS). Recorre el
+    índice de la pk desde el final, así que cuesta lo que las entradas retenidas.
+    """
+    if lag is None:
+        lag = settings.CHANGELOG_COMMIT_LAG_SECONDS
+    entries = ChangeLogEntry.objects.order_by('-id')
+    if lag:
+        entries = entries.filter(created_at__lte=timezone.now() - timedelta(seconds=lag))
+    return entries.values_list('id', flat=True).first() or 0
+
+
+def has_held_back(lag=None):
+    """¿Hay entradas que current_version() todavía no entrega?"""
+    if lag is None:
+        lag = settings.CHANGELOG_COMMIT_LAG_SECONDS
+    if not lag:
+        return False
+    latest = ChangeLogEntry.objects.order_by('-id').values_list('created_at', flat=True).first()
+    return latest is not None and latest > timezone.now() - timedelta(seconds=lag)
+
+
+def changes(since=0, location=None, category_id=None, limit=500):
+    """
+    (entradas, versión, hay_más): la última entrada de cada objeto con
+    versión > since, en orden de versión. Los filtros sólo se aplican a los
+    temas (el resto del catálogo es chico y lo necesitan todos). Las
+    entradas retenidas por current_version() llegan en la consulta siguiente.
+    """
+    version = current_version()
+    entries = ChangeLogEntry.objects.filter(id__gt=since, id__lte=version)
+    topic_filter = Q()
+    if location:
+        topic_filter &= Q(location_tag__in=(location, *SHARED_LOCATIONS))
+    if category_id is not None:
+        topic_filter &= Q(category_id=category_id)
+    if topic_filter:
+        entries = entries.filter(~Q(model='topic') | topic_filter)
+    latest = entries.values('model', 'object_id').annotate(last=Max('id')).values('last')
+    page = list(
+        ChangeLogEntry.objects.filter(id__in=latest).only('id', 'model', 'object_id', 'action')[:limit + 1]
+    )
+    more = len(page) > limit
+    if more:
+        page = page[:limit]
+        version = page[-1].id
+    return page, version, more
+
+
+def compact():
+    """Borra las entradas que tienen otra más nueva del mismo objeto y filtro."""
+    latest = ChangeLogEntry.objects.values(
+        'model', 'object_id', 'location_tag', 'category_id'
+    ).annotate(last=Max('id')).values('last')
+    deleted, _ = ChangeLogEntry.objects.exclude(id__in=latest).delete()
+    return deleted
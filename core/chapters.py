@@ -0,0 +1,132 @@
+"""
+Capítulos de los videos
+========================
+Cada VideoAsset guarda en `chapter_map` la lista ordenada de sus temas
+publicados como arrays paralelos (JSON compacto):
+
+    {"starts": [0, 95, 310], "ends": [95, 310, 600],
+     "topics": [12, 13, 14], "codes": ["1.1", "1.2", "1.3"],
+     "titles": ["Apertura", "Ventas", "Cierre"]}
+
+El fin de cada capítulo es el inicio del siguiente; el del último es
+duration_seconds (null si no se conoce). El tema activo en el segundo X se
+busca con bisect sobre `starts` (ChapterMap.locate), en Python y en el
+reproductor (topic_detail.html), sin consultas por cada tick.
+
+El mapa se recalcula sólo cuando cambian los temas de ese video (o su
+duración): core.signals y el importador llaman a refresh_videos(), que
+compara y escribe sólo si cambió. El comando rebuild_chapter_maps
+recalcula todos.
+"""
+
+import bisect
+from dataclasses import dataclass
+
+from django.utils import timezone
+
+from .models import Topic, VideoAsset
+
+
+def build_map(rows, duration_seconds=None):
+    """rows: (start_seconds, topic_id, code, title) ya ordenadas."""
+    starts = [start for start, _, _, _ in rows]
+    return {
+        'starts': starts,
+        'ends': (starts[1:] + [duration_seconds]) if starts else [],
+        'topics': [topic_id for _, topic_id, _, _ in rows],
+        'codes': [code for _, _, code, _ in rows],
+        'titles': [title for _, _, _, title in rows],
+    }
+
+
+def compute_maps(video_ids):
+    """{video_id: mapa} de esos videos, con una consulta de temas."""
+    video_ids = set(video_ids)
+    rows = {video_id: [] for video_id in video_ids}
+    topics = Topic.objects.published().filter(video_id__in=video_ids).order_by(
+        'video_id', 'start_seconds', 'sort_key', 'code'
+    ).values_list('video_id', 'start_seconds', 'pk', 'code', 'title')
+    for video_id, *row in topics:
+        rows[video_id].append(tuple(row))
+    durations = dict(VideoAsset.objects.filter(pk__in=video_ids).values_list('pk', 'duration_seconds'))
+    return {video_id: build_map(rows[video_id], durations[video_id]) for video_id in durations}
+
+
+def refresh_videos(video_ids, batch_size=500):
+    """
+    Recalcula los mapas y guarda sólo los que cambiaron (tocando
+    updated_at del video: las páginas de sus temas muestran los capítulos).
+    Retorna cuántos cambiaron.
+    """
+    video_ids = [video_id for video_id in set(video_ids) if video_id is not None]
+    changed = 0
+    for start in range(0, len(video_ids), batch_size):
+        chunk = video_ids[start:start + batch_size]
+        current = dict(VideoAsset.objects.filter(pk__in=chunk).values_list('pk', 'chapter_map'))
+        for video_id, chapter_map in compute_maps(chunk).items():
+            if current.get(video_id) != chapter_map:
+                VideoAsset.objects.filter(pk=video_id).update(chapter_map=chapter_map, updated_at=timezone.now())
+                changed += 1
+    return changed
+
+
+def rebuild():
+    return refresh_videos(VideoAsset.objects.values_list('pk', flat=True))
+
+
+@dataclass(frozen=True)
+class Chapter:
+    """Un capítulo del mapa (para plantillas y la API)."""
+    index: int
+    topic_id: int
+    code: str
+    title: str
+    start: int
+    end: int = None
+
+    @property
+    def duration(self):
+        return None if self.end is None else max(0, self.end - self.start)
+
+
+class ChapterMap:
+    """Lectura del mapa guardado: capítulos y búsqueda binaria por segundo."""
+
+    def __init__(self, data):
+        data = data or {}
+        self.starts = data.get('starts', [])
+        self.ends = data.get('ends', [])
+        self.topics = data.get('topics', [])
+        self.codes = data.get('codes', [])
+        self.titles = data.get('titles', [])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        return Chapter(
+            index, self.topics[index], self.codes[index], self.titles[index],
+            self.starts[index], self.ends[index],
+        )
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def locate(self, seconds):
+        """Índice del capítulo que se reproduce en ese segundo (None antes del primero o al terminar)."""
+        index = bisect.bisect_right(self.starts, seconds) - 1
+        if index < 0:
+            return None
+        end = self.ends[index]
+        if end is not None and seconds >= end and index == len(self) - 1:
+            return None
+        return index
+
+    def active(self, seconds):
+        """El Chapter activo en ese segundo, o None."""
+        index = self.locate(seconds)
+        return None if index is None else self[index]
+
+
+def get_map(video):
+    return ChapterMap(video.chapter_map)
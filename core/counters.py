@@ -0,0 +1,136 @@
+"""
+Contadores desnormalizados
+===========================
+Category, VideoAsset y Tag guardan `topic_count` y `published_topic_count`
+para que el home y los listados del admin no hagan un COUNT por fila.
+
+- Cambios de Topic (crear, publicar, mover de categoría/video, borrar):
+  deltas atómicos con F() sobre las filas afectadas.
+- Cambios de tags (m2m e inline del admin): deltas o recuento exacto de los
+  pocos tags involucrados.
+- reconcile(): recálculo exacto con una sola UPDATE por contador, para
+  corregir cualquier desviación (comando reconcile_counters).
+- Los tags cuyo contador se mueve quedan en el registro de cambios
+  (core.changelog): el autocompletado (core.typeahead) muestra y ordena por
+  published_topic_count y sólo vuelve a leer los tags registrados.
+"""
+
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from . import changelog
+from .models import Category, Tag, Topic, VideoAsset
+
+
+TopicTag = Tag.topics.through
+
+
+def _shift(queryset, total=0, published=0):
+    """Suma (o resta, sin bajar de 0) a los contadores de las filas del queryset."""
+    updates = {}
+    if total:
+        updates['topic_count'] = Greatest(F('topic_count') + total, Value(0))
+    if published:
+        updates['published_topic_count'] = Greatest(F('published_topic_count') + published, Value(0))
+    if updates:
+        queryset.update(**updates)
+
+
+def _shift_tags(tag_ids, total=0, published=0):
+    """_shift sobre esos tags, registrando el cambio (update() no manda signals)."""
+    if tag_ids and (total or published):
+        _shift(Tag.objects.filter(pk__in=tag_ids), total=total, published=published)
+        changelog.record('tag', tag_ids)
+
+
+def topic_changed(previous, current):
+    """
+    Aplica el delta de un Topic en su Category y VideoAsset.
+    `previous` y `current` son dicts con category_id, video_id e is_published
+    (None si el topic no existía / ya no existe).
+    """
+    for model, field in ((Category, 'category_id'), (VideoAsset, 'video_id')):
+        old_id = previous[field] if previous else None
+        new_id = current[field] if current else None
+        old_published = bool(previous and previous['is_published'])
+        new_published = bool(current and current['is_published'])
+        if old_id == new_id:
+            if old_id is not None and old_published != new_published:
+                _shift(model.objects.filter(pk=old_id), published=new_published - old_published)
+            continue
+        if old_id is not None:
+            _shift(model.objects.filter(pk=old_id), total=-1, published=-old_published)
+        if new_id is not None:
+            _shift(model.objects.filter(pk=new_id), total=1, published=new_published)
+
+    # Los tags sólo cambian su contador de publicados (la membresía no cambia)
+    if previous and current and previous['is_published'] != current['is_published']:
+        delta = 1 if current['is_published'] else -1
+        tag_ids = list(TopicTag.objects.filter(topic_id=current['pk']).values_list('tag_id', flat=True))
+        _shift_tags(tag_ids, published=delta)
+
+
+def topic_deleted(previous, tag_ids):
+    """El topic ya se borró: descuenta su categoría, video y tags."""
+    topic_changed(previous, None)
+    _shift_tags(tag_ids, total=-1, published=-bool(previous['is_published']))
+
+
+def tags_linked(tag_ids, topic_ids, sign=1):
+    """
+    Se agregaron (sign=1) o quitaron (sign=-1) las relaciones tag x topic
+    indicadas. Una de las dos listas tiene un solo elemento (m2m add/remove).
+    """
+    if not tag_ids or not topic_ids:
+        return
+    published = Topic.objects.filter(pk__in=topic_ids, is_published=True).count()
+    if len(tag_ids) == 1:
+        _shift_tags(tag_ids, total=sign * len(topic_ids), published=sign * published)
+    else:
+        _shift_tags(tag_ids, total=sign, published=sign * published)
+
+
+def _count_subquery(filter_field, published=False):
+    topics = Topic.objects.filter(**{filter_field: OuterRef('pk')})
+    if published:
+        topics = topics.filter(is_published=True)
+    counts = topics.order_by().values(filter_field).annotate(c=Count('pk')).values('c')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+# Campo que relaciona cada modelo con Topic (desde Topic)
+COUNTED_MODELS = (
+    (Category, 'category'),
+    (VideoAsset, 'video'),
+    (Tag, 'tags'),
+)
+
+
+def recount(model, pks):
+    """Recuento exacto de las filas indicadas."""
+    field = dict(COUNTED_MODELS)[model]
+    model.objects.filter(pk__in=pks).update(
+        topic_count=_count_subquery(field),
+        published_topic_count=_count_subquery(field, published=True),
+    )
+    if model is Tag:
+        changelog.record('tag', pks)
+
+
+def reconcile():
+    """
+    Recalcula todos los contadores. Retorna {nombre del modelo: filas corregidas}.
+    """
+    fixed = {}
+    for model, field in COUNTED_MODELS:
+        drifted = model.objects.annotate(
+            expected_total=_count_subquery(field),
+            expected_published=_count_subquery(field, published=True),
+        ).filter(
+            ~Q(topic_count=F('expected_total')) | ~Q(published_topic_count=F('expected_published'))
+        ).values_list('pk', flat=True)
+        pks = list(drifted)
+        if pks:
+            recount(model, pks)
+        fixed[model._meta.verbose_name_plural] = len(pks)
+    return fixed
@@ -0,0 +1,193 @@
+"""
+Exportación del catálogo
+=========================
+Volcado completo de Category, VideoAsset, Topic, Tag y Quiz en JSONL o CSV,
+generado en streaming: los querysets se recorren con .iterator(chunk_size)
+(cursor del lado del servidor en PostgreSQL) y los prefetch se hacen por
+chunk, así la memoria no depende del tamaño del catálogo y el primer byte
+sale en cuanto llega el primer chunk.
+
+- JSONL: una línea por fila con la clave "model"; admite varios modelos.
+- CSV: un modelo por archivo. El CSV de topics usa las mismas columnas que
+  import_catalog (category = slug, external_id, platform, tags con '|').
+
+Lo usan el comando export_catalog y la vista CatalogExportView (sólo staff).
+"""
+
+import csv
+import json
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from .importer import TAG_SEPARATOR
+from .models import Category, Quiz, Tag, Topic, VideoAsset
+
+
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Filas por escritura: agrupar evita un write() por fila
+LINES_PER_WRITE = 200
+
+
+def get_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+def category_rows(chunk_size):
+    for category in Category.objects.order_by('pk').iterator(chunk_size=chunk_size):
+        yield {
+            'id': category.pk,
+            'name': category.name,
+            'slug': category.slug,
+            'icon': category.icon,
+            'description': category.description,
+            'order': category.order,
+            'topic_count': category.topic_count,
+            'published_topic_count': category.published_topic_count,
+            'updated_at': iso(category.updated_at),
+        }
+
+
+def video_rows(chunk_size):
+    for video in VideoAsset.objects.order_by('pk').iterator(chunk_size=chunk_size):
+        yield {
+            'id': video.pk,
+            'title': video.title,
+            'platform': video.platform,
+            'external_id': video.external_id,
+            'duration_seconds': video.duration_seconds,
+            'uploaded_date': iso(video.uploaded_date),
+            'embed_url': video.get_embed_url(),
+            'watch_url': video.get_watch_url(),
+            'topic_count': video.topic_count,
+            'published_topic_count': video.published_topic_count,
+            'created_at': iso(video.created_at),
+            'updated_at': iso(video.updated_at),
+        }
+
+
+def topic_rows(chunk_size):
+    topics = Topic.objects.in_course_order().select_related('category', 'video').prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('pk', 'name'))
+    )
+    for topic in topics.iterator(chunk_size=chunk_size):
+        yield {
+            'id': topic.pk,
+            'code': topic.code,
+            'title': topic.title,
+            'category': topic.category.slug,
+            'platform': topic.video.platform,
+            'external_id': topic.video.external_id,
+            'video_title': topic.video.title,
+            'start_seconds': topic.start_seconds,
+            'description': topic.description,
+            'location_tag': topic.location_tag,
+            'is_published': topic.is_published,
+            'tags': TAG_SEPARATOR.join(tag.name for tag in topic.tags.all()),
+            'embed_url': topic.video.get_embed_url(start_seconds=topic.start_seconds),
+            'watch_url': topic.video.get_watch_url(start_seconds=topic.start_seconds),
+            'created_at': iso(topic.created_at),
+            'updated_at': iso(topic.updated_at),
+        }
+
+
+def tag_rows(chunk_size):
+    for tag in Tag.objects.order_by('pk').iterator(chunk_size=chunk_size):
+        yield {
+            'id': tag.pk,
+            'name': tag.name,
+            'slug': tag.slug,
+            'topic_count': tag.topic_count,
+            'published_topic_count': tag.published_topic_count,
+            'updated_at': iso(tag.updated_at),
+        }
+
+
+def quiz_rows(chunk_size):
+    for quiz in Quiz.objects.order_by('pk').iterator(chunk_size=chunk_size):
+        yield {
+            'id': quiz.pk,
+            'title': quiz.title,
+            'description': quiz.description,
+            'passing_score': quiz.passing_score,
+            'time_limit_minutes': quiz.time_limit_minutes,
+            'is_active': quiz.is_active,
+            'topic_codes': TAG_SEPARATOR.join(quiz.get_topic_codes()),
+            'topic_count': quiz.stats_topic_count,
+            'total_duration_seconds': quiz.stats_total_duration_seconds,
+            'segment_seconds': quiz.stats_segment_seconds,
+            'created_at': iso(quiz.created_at),
+            'updated_at': iso(quiz.updated_at),
+        }
+
+
+# Orden de exportación: las dependencias primero
+EXPORTERS = {
+    'category': category_rows,
+    'video': video_rows,
+    'topic': topic_rows,
+    'tag': tag_rows,
+    'quiz': quiz_rows,
+}
+
+
+class _Echo:
+    """Buffer mínimo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def _grouped(lines):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= LINES_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _jsonl_lines(models, chunk_size):
+    for name in models:
+        for row in EXPORTERS[name](chunk_size):
+            yield json.dumps({'model': name, **row}, ensure_ascii=False) + '\n'
+
+
+def _csv_lines(model, chunk_size):
+    writer = csv.writer(_Echo())
+    header = None
+    for row in EXPORTERS[model](chunk_size):
+        if header is None:
+            header = list(row)
+            yield writer.writerow(header)
+        yield writer.writerow(['' if value is None else value for value in row.values()])
+
+
+def stream_catalog(models=None, fmt='jsonl', chunk_size=None):
+    """
+    Genera el volcado como trozos de texto. `models` es una lista de claves
+    de EXPORTERS (None: todos); CSV exige exactamente un modelo.
+    """
+    models = list(models or EXPORTERS)
+    unknown = [name for name in models if name not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"Modelo(s) desconocido(s): {', '.join(unknown)}")
+    if fmt not in FORMATS:
+        raise ValueError(f'Formato desconocido: {fmt}')
+    chunk_size = chunk_size or get_chunk_size()
+    if fmt == 'csv':
+        if len(models) != 1:
+            raise ValueError('El formato CSV exporta un solo modelo por archivo')
+        return _grouped(_csv_lines(models[0], chunk_size))
+    return _grouped(_jsonl_lines(models, chunk_size))
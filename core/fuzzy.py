@@ -0,0 +1,291 @@
+"""
+Búsqueda tolerante a errores
+=============================
+Cuando la búsqueda full-text (core.search) no encuentra nada ("eror 505",
+"saldo negatvo"), core.search.execute() recurre a este módulo: temas cuyo
+título, o el nombre de alguno de sus tags, se parece a la consulta,
+ordenados por similitud, más una sugerencia "¿Quisiste decir ...?".
+
+Similitud por trigramas, como pg_trgm: cada palabra se rellena con dos
+espacios al inicio y uno al final y se parte de a tres caracteres
+('505' -> '  5', ' 50', '505', '05 ').
+
+- Coincide un texto si contiene al menos FUZZY_SEARCH_THRESHOLD (0.6, el
+  word_similarity_threshold de pg_trgm) de los trigramas de la consulta.
+- Orden: esa fracción; a igualdad, la similitud del texto completo
+  (compartidos / unión), así el texto más corto y parecido va primero.
+
+Motores (`get_backend()`):
+- PostgresFuzzyBackend: extensión pg_trgm e índices GIN gin_trgm_ops sobre
+  core_topic.title y core_tag.name (migración 0014).
+- TrigramTableFuzzyBackend: tabla SearchTrigram, un trigrama por fila. Las
+  coincidencias se cuentan en SQL (índice por trigrama + GROUP BY), sólo
+  sobre las filas de los trigramas de la consulta. La mantienen
+  core.signals y el importador; rebuild_search_index la reconstruye.
+
+Ninguno compara la consulta fila por fila en Python: sólo la sugerencia se
+arma comparando palabras de los pocos textos mejor ubicados.
+"""
+
+import math
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max
+
+from .models import SearchTrigram, Tag, Topic
+
+
+TopicTag = Tag.topics.through
+
+# Tags parecidos que se consideran (cada uno aporta todos sus temas)
+MAX_TAGS = 20
+# Textos mejor ubicados de los que sale la sugerencia
+SUGGESTION_SOURCES = 5
+# Similitud mínima para reemplazar una palabra de la consulta en la sugerencia
+WORD_THRESHOLD = 0.4
+
+WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def unaccent(text):
+    """'Facturación' -> 'facturacion'."""
+    return unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+
+
+def words(text):
+    return WORD_RE.findall((text or '').lower())
+
+
+def trigrams(text):
+    """Conjunto de trigramas de un texto (sin tildes ni mayúsculas)."""
+    grams = set()
+    for word in words(unaccent(text)):
+        padded = f'  {word} '
+        grams.update(padded[start:start + 3] for start in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """Trigramas compartidos / trigramas de la unión."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    union = len(grams_a | grams_b)
+    return len(grams_a & grams_b) / union if union else 0.0
+
+
+def get_threshold():
+    return getattr(settings, 'FUZZY_SEARCH_THRESHOLD', 0.6)
+
+
+@dataclass
+class FuzzyMatch:
+    """Un tema o tag parecido: fracción de la consulta que contiene y similitud total."""
+    object_id: int
+    score: float
+    similarity: float
+
+    @property
+    def rank(self):
+        return (self.score, self.similarity)
+
+
+@dataclass
+class FuzzyResult:
+    """Temas parecidos ordenados por similitud y la consulta corregida ('' si no hay)."""
+    ids: list = field(default_factory=list)
+    suggestion: str = ''
+
+
+class BaseFuzzyBackend:
+    """
+    Interfaz común: match(kind, query, threshold, limit) -> [FuzzyMatch]
+    ordenados por rank descendente; kind es 'topic' (sólo publicados) o 'tag'.
+    """
+    # Si el motor necesita la tabla SearchTrigram al día
+    uses_table = False
+
+    def match(self, kind, query, threshold, limit):
+        raise NotImplementedError
+
+
+class PostgresFuzzyBackend(BaseFuzzyBackend):
+    """
+    pg_trgm: `consulta <% columna` usa el índice GIN y filtra por
+    pg_trgm.word_similarity_threshold (se fija en la sesión antes de buscar).
+    """
+    COLUMNS = {
+        'topic': ('core_topic', 'title', 'AND is_published'),
+        'tag': ('core_tag', 'name', ''),
+    }
+
+    def match(self, kind, query, threshold, limit):
+        table, column, condition = self.COLUMNS[kind]
+        sql = f"""
+            SELECT id, word_similarity(%s, {column}) AS score, similarity(%s, {column}) AS total
+            FROM {table}
+            WHERE %s <%% {column} {condition}
+            ORDER BY score DESC, total DESC, id
+            LIMIT %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)", [str(threshold)]
+            )
+            cursor.execute(sql, [query, query, query, limit])
+            return [FuzzyMatch(*row) for row in cursor.fetchall()]
+
+
+class TrigramTableFuzzyBackend(BaseFuzzyBackend):
+    """
+    Tabla SearchTrigram: por cada objeto que comparte algún trigrama con la
+    consulta, cuántos comparte (COUNT) y cuántos tiene (gram_count).
+    """
+    uses_table = True
+
+    def match(self, kind, query, threshold, limit):
+        grams = trigrams(query)
+        if not grams:
+            return []
+        rows = SearchTrigram.objects.filter(kind=kind, gram__in=grams).values('object_id').annotate(
+            shared=Count('*'), total=Max('gram_count'),
+        ).filter(shared__gte=math.ceil(len(grams) * threshold)).order_by('-shared', 'total', 'object_id')
+        return [
+            FuzzyMatch(
+                row['object_id'],
+                row['shared'] / len(grams),
+                row['shared'] / (row['total'] + len(grams) - row['shared']),
+            )
+            for row in rows[:limit]
+        ]
+
+
+_backend = None
+
+
+def get_backend():
+    """pg_trgm en PostgreSQL; la tabla de trigramas en los demás motores."""
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'postgresql':
+            _backend = PostgresFuzzyBackend()
+        else:
+            _backend = TrigramTableFuzzyBackend()
+    return _backend
+
+
+# ---------------------------------------------------------------------------
+# Mantenimiento de la tabla de trigramas
+# ---------------------------------------------------------------------------
+
+def build_rows(kind, object_id, text):
+    grams = trigrams(text)
+    return [
+        SearchTrigram(kind=kind, object_id=object_id, gram=gram, gram_count=len(grams))
+        for gram in sorted(grams)
+    ]
+
+
+def _index(kind, texts, object_ids):
+    SearchTrigram.objects.filter(kind=kind, object_id__in=object_ids).delete()
+    SearchTrigram.objects.bulk_create(
+        [row for object_id, text in texts for row in build_rows(kind, object_id, text)],
+        batch_size=1000,
+    )
+
+
+def index_topics(topic_ids, batch_size=500):
+    """Reindexa los títulos de esos temas (los no publicados o borrados salen)."""
+    if not get_backend().uses_table:
+        return
+    topic_ids = list(topic_ids)
+    for start in range(0, len(topic_ids), batch_size):
+        chunk = topic_ids[start:start + batch_size]
+        titles = Topic.objects.published().filter(pk__in=chunk).values_list('pk', 'title')
+        _index('topic', titles, chunk)
+
+
+def index_tags(tag_ids, batch_size=500):
+    """Reindexa los nombres de esos tags (los borrados salen)."""
+    if not get_backend().uses_table:
+        return
+    tag_ids = list(tag_ids)
+    for start in range(0, len(tag_ids), batch_size):
+        chunk = tag_ids[start:start + batch_size]
+        _index('tag', Tag.objects.filter(pk__in=chunk).values_list('pk', 'name'), chunk)
+
+
+def remove(kind, object_ids):
+    if get_backend().uses_table:
+        SearchTrigram.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()
+
+
+def rebuild_index(batch_size=500):
+    """Reconstruye toda la tabla. Retorna el número de filas (0 en PostgreSQL)."""
+    if not get_backend().uses_table:
+        return 0
+    SearchTrigram.objects.all().delete()
+    index_topics(Topic.objects.values_list('pk', flat=True), batch_size=batch_size)
+    index_tags(Tag.objects.values_list('pk', flat=True), batch_size=batch_size)
+    return SearchTrigram.objects.count()
+
+
+# ---------------------------------------------------------------------------
+# Búsqueda
+# ---------------------------------------------------------------------------
+
+def suggest(query, texts):
+    """
+    Consulta corregida: cada palabra se reemplaza por la más parecida de los
+    textos mejor ubicados (si se parece lo suficiente).
+    """
+    candidates = {word for text in texts for word in words(text)}
+    corrected = []
+    for word in words(query):
+        best, best_similarity = word, WORD_THRESHOLD
+        for candidate in sorted(candidates):
+            value = similarity(word, candidate)
+            if value > best_similarity:
+                best, best_similarity = candidate, value
+        corrected.append(best)
+    suggestion = ' '.join(corrected)
+    return suggestion if unaccent(suggestion) != unaccent(' '.join(words(query))) else ''
+
+
+def search(query, limit=None):
+    """Temas cuyo título o algún tag se parece a la consulta."""
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+    threshold = get_threshold()
+    backend = get_backend()
+    topic_matches = backend.match('topic', query, threshold, limit)
+    tag_matches = {match.object_id: match for match in backend.match('tag', query, threshold, MAX_TAGS)}
+
+    # Cada tema con su mejor coincidencia: por su título o por uno de sus tags
+    ranks = {match.object_id: match.rank for match in topic_matches}
+    for tag_id, topic_id in TopicTag.objects.filter(tag_id__in=tag_matches).values_list('tag_id', 'topic_id'):
+        ranks[topic_id] = max(ranks.get(topic_id, (0, 0)), tag_matches[tag_id].rank)
+    topics = dict(
+        Topic.objects.published().filter(pk__in=ranks).values_list('pk', 'code')
+    )
+    ids = sorted(topics, key=lambda pk: (-ranks[pk][0], -ranks[pk][1], topics[pk]))[:limit]
+    if not ids:
+        return FuzzyResult()
+
+    # La sugerencia sale de los textos que mejor coinciden
+    sources = sorted(
+        [(match.rank, 'topic', match.object_id) for match in topic_matches[:SUGGESTION_SOURCES]] +
+        [(match.rank, 'tag', match.object_id) for match in tag_matches.values()],
+        key=lambda source: source[0], reverse=True,
+    )[:SUGGESTION_SOURCES]
+    texts = {
+        ('topic', pk): title for pk, title in
+        Topic.objects.filter(pk__in=[pk for _, kind, pk in sources if kind == 'topic']).values_list('pk', 'title')
+    }
+    texts.update(
+        (('tag', pk), name) for pk, name in
+        Tag.objects.filter(pk__in=[pk for _, kind, pk in sources if kind == 'tag']).values_list('pk', 'name')
+    )
+    texts = [texts.get((kind, pk), '') for _, kind, pk in sources]
+    return FuzzyResult(ids=ids, suggestion=suggest(query, texts))
@@ -0,0 +1,401 @@
+"""
+Importación masiva del catálogo
+================================
+Carga temas (con sus videos y tags) desde CSV o JSONL exportados de hojas de
+cálculo, sin pasar por save() ni por los signals de cada fila:
+
+- La entrada se lee en streaming y se procesa en lotes de tamaño fijo; cada
+  lote es una transacción con un puñado de consultas (bulk_create /
+  bulk_update), así la memoria no crece con el tamaño del archivo.
+- Category se resuelve por slug (debe existir); VideoAsset por
+  (platform, external_id), creándolo si falta; Topic se actualiza o crea
+  por `code`; los tags se crean por nombre si no existen.
+- Al final se recalcula una sola vez lo que mantienen los signals: secuencia
+  del curso, contadores y versiones de caché. El índice de búsqueda (y sus
+  trigramas, core.fuzzy), los payloads de la API, las estadísticas de
+  quizzes y los capítulos de los videos se actualizan lote a lote; los
+  videos, tags y temas nuevos o modificados quedan en el registro de
+  cambios (core.changelog) también por lote.
+
+Columnas (CSV con encabezado, o claves de cada objeto JSONL):
+    code, title, category             obligatorias (category = slug)
+    external_id, platform             video (platform por defecto: youtube)
+    video_title, duration_seconds     sólo se usan al crear el video
+    start_seconds                     segundos o "mm:ss" / "hh:mm:ss"
+    description, location_tag, is_published
+    tags                              nombres separados por '|'; si la
+                                      columna está presente reemplaza los
+                                      tags del tema
+"""
+
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import chapters, changelog, counters, fuzzy, payloads, quiz_stats, search, sequence, snapshot
+from .cache import bump_version
+from .markup import render_description
+from .models import Category, Tag, Topic, VideoAsset, make_sort_key
+
+
+TopicTag = Tag.topics.through
+
+TAG_SEPARATOR = '|'
+TRUE_VALUES = {'1', 'true', 'si', 'sí', 'yes', 'x'}
+FALSE_VALUES = {'0', 'false', 'no', ''}
+
+# Campos que se sobrescriben al actualizar un Topic existente
+UPDATED_TOPIC_FIELDS = [
+    'title', 'sort_key', 'category', 'video', 'start_seconds', 'description',
+    'description_html', 'description_excerpt', 'location_tag', 'is_published', 'updated_at',
+]
+
+LOCATIONS = {value for value, _ in Topic.LOCATION_CHOICES}
+PLATFORMS = {value for value, _ in VideoAsset.PLATFORM_CHOICES}
+
+
+class RowError(ValueError):
+    """Fila inválida: se informa y se omite, el resto del lote sigue."""
+
+
+@dataclass
+class ImportRow:
+    line: int
+    code: str
+    title: str
+    category_slug: str
+    platform: str
+    external_id: str
+    video_title: str
+    duration_seconds: int
+    start_seconds: int
+    description: str
+    location_tag: str
+    is_published: bool
+    tags: list = None  # None: no tocar los tags del tema
+
+
+@dataclass
+class BatchReport:
+    number: int
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    videos_created: int = 0
+    tags_created: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class ImportReport:
+    batches: int = 0
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    videos_created: int = 0
+    tags_created: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    dry_run: bool = False
+    extra: dict = field(default_factory=dict)
+
+    def add(self, batch):
+        self.batches += 1
+        for name in ('rows', 'created', 'updated', 'videos_created', 'tags_created'):
+            setattr(self, name, getattr(self, name) + getattr(batch, name))
+
+
+# --- Lectura ------------------------------------------------------------------
+
+def read_rows(stream, fmt):
+    """Genera (número de línea, dict) sin cargar el archivo completo."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for data in reader:
+            yield reader.line_num, data
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield line_number, RowError(f'JSON inválido: {exc}')
+            continue
+        if not isinstance(data, dict):
+            yield line_number, RowError('cada línea debe ser un objeto JSON')
+            continue
+        yield line_number, data
+
+
+def parse_seconds(value, name):
+    """Segundos enteros, o "mm:ss" / "hh:mm:ss"."""
+    value = str(value if value is not None else '').strip()
+    if not value:
+        return 0
+    try:
+        seconds = 0
+        for part in value.split(':'):
+            seconds = seconds * 60 + int(part)
+    except ValueError:
+        raise RowError(f'{name} inválido: {value!r}')
+    if seconds < 0:
+        raise RowError(f'{name} no puede ser negativo')
+    return seconds
+
+
+def parse_bool(value, default=True):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False if text else default
+    raise RowError(f'is_published inválido: {value!r}')
+
+
+def tag_slug(name):
+    return slugify(name)[:100] or name[:100]
+
+
+def text(data, key, default=''):
+    value = data.get(key)
+    return default if value is None else str(value).strip()
+
+
+def clean_row(line, data):
+    """Valida y normaliza una fila. Lanza RowError."""
+    code = text(data, 'code')
+    title = text(data, 'title')
+    category_slug = text(data, 'category')
+    external_id = text(data, 'external_id')
+    if not code or not title or not category_slug or not external_id:
+        raise RowError('code, title, category y external_id son obligatorios')
+    if len(code) > Topic._meta.get_field('code').max_length:
+        raise RowError(f'código demasiado largo: {code!r}')
+    platform = text(data, 'platform', 'youtube').lower() or 'youtube'
+    if platform not in PLATFORMS:
+        raise RowError(f'plataforma desconocida: {platform!r}')
+    location_tag = text(data, 'location_tag')
+    if location_tag and location_tag not in LOCATIONS:
+        raise RowError(f'ubicación desconocida: {location_tag!r}')
+
+    tags = None
+    if 'tags' in data:
+        raw = data['tags']
+        names = raw if isinstance(raw, list) else str(raw or '').split(TAG_SEPARATOR)
+        tags = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+
+    duration = text(data, 'duration_seconds')
+    return ImportRow(
+        line=line,
+        code=code,
+        title=title,
+        category_slug=category_slug,
+        platform=platform,
+        external_id=external_id,
+        video_title=text(data, 'video_title') or external_id,
+        duration_seconds=parse_seconds(duration, 'duration_seconds') if duration else None,
+        start_seconds=parse_seconds(data.get('start_seconds'), 'start_seconds'),
+        description=text(data, 'description'),
+        location_tag=location_tag,
+        is_published=parse_bool(data.get('is_published')),
+        tags=tags,
+    )
+
+
+# --- Importación ----------------------------------------------------------------
+
+class CatalogImporter:
+    """
+    importer = CatalogImporter(batch_size=1000)
+    report = importer.run(read_rows(stream, 'csv'), on_batch=..., on_error=...)
+    """
+
+    def __init__(self, batch_size=1000, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.categories = dict(Category.objects.values_list('slug', 'pk'))
+
+    def run(self, rows, on_batch=None, on_error=None):
+        """Importa las filas de read_rows(). Retorna un ImportReport."""
+        report = ImportReport(dry_run=self.dry_run)
+        started = time.monotonic()
+        batch = []
+        for line, data in rows:
+            try:
+                if isinstance(data, RowError):
+                    raise data
+                batch.append(self.clean(line, data))
+            except RowError as exc:
+                report.errors += 1
+                if on_error:
+                    on_error(line, exc)
+            if len(batch) >= self.batch_size:
+                self._run_batch(batch, report, on_batch)
+                batch = []
+        if batch:
+            self._run_batch(batch, report, on_batch)
+        if report.rows and not self.dry_run:
+            self.finish(report)
+        report.seconds = time.monotonic() - started
+        return report
+
+    def clean(self, line, data):
+        row = clean_row(line, data)
+        if row.category_slug not in self.categories:
+            raise RowError(f'categoría inexistente: {row.category_slug!r}')
+        return row
+
+    def _run_batch(self, rows, report, on_batch):
+        batch = self.import_batch(rows, number=report.batches + 1)
+        report.add(batch)
+        if on_batch:
+            on_batch(batch)
+
+    def import_batch(self, rows, number=1):
+        """Un lote en una transacción (revertida en modo dry-run)."""
+        started = time.monotonic()
+        # Códigos repetidos dentro del lote: gana la última fila
+        rows = list({row.code: row for row in rows}.values())
+        batch = BatchReport(number=number, rows=len(rows))
+        with transaction.atomic():
+            videos = self._resolve_videos(rows, batch)
+            # Videos de los que salen temas: sus quizzes también cambian
+            video_ids = set(videos.values()) | set(
+                Topic.objects.filter(code__in=[row.code for row in rows]).values_list('video_id', flat=True)
+            )
+            topics = self._upsert_topics(rows, videos, batch)
+            self._link_tags(rows, topics, batch)
+            if self.dry_run:
+                transaction.set_rollback(True)
+            else:
+                topic_ids = [topic.pk for topic in topics.values()]
+                search.index_topics(topic_ids)
+                fuzzy.index_topics(topic_ids)
+                payloads.refresh_topics(topic_ids)
+                quiz_stats.refresh_quiz_stats(quiz_stats.quizzes_for_videos(video_ids))
+                chapters.refresh_videos(video_ids)
+        batch.seconds = time.monotonic() - started
+        return batch
+
+    def _resolve_videos(self, rows, batch):
+        """{(platform, external_id): video_id}, creando los que falten."""
+        keys = {(row.platform, row.external_id) for row in rows}
+        videos = {}
+        existing = VideoAsset.objects.filter(
+            external_id__in={external_id for _, external_id in keys}
+        ).order_by('pk').values_list('platform', 'external_id', 'pk')
+        for platform, external_id, pk in existing:
+            videos.setdefault((platform, external_id), pk)
+
+        missing = {}
+        for row in rows:
+            key = (row.platform, row.external_id)
+            if key not in videos and key not in missing:
+                missing[key] = VideoAsset(
+                    platform=row.platform,
+                    external_id=row.external_id,
+                    title=row.video_title[:200],
+                    duration_seconds=row.duration_seconds,
+                )
+        created = VideoAsset.objects.bulk_create(missing.values())
+        batch.videos_created += len(missing)
+        if created and created[0].pk is None:
+            # Motores sin RETURNING: volver a leer los ids
+            videos = self._resolve_videos(rows, batch)
+        else:
+            for key, video in missing.items():
+                videos[key] = video.pk
+        changelog.record('video', [videos[key] for key in missing])
+        return videos
+
+    def _upsert_topics(self, rows, videos, batch):
+        """{code: Topic} del lote, ya guardados."""
+        existing = Topic.objects.in_bulk([row.code for row in rows], field_name='code')
+        now = timezone.now()
+        to_create, to_update = [], []
+        for row in rows:
+            topic = existing.get(row.code) or Topic(code=row.code)
+            topic.title = row.title[:200]
+            topic.sort_key = make_sort_key(row.code)
+            topic.category_id = self.categories[row.category_slug]
+            topic.video_id = videos[(row.platform, row.external_id)]
+            topic.start_seconds = row.start_seconds
+            if topic.pk is None or topic.description != row.description:
+                topic.description = row.description
+                render_description(topic)
+            topic.location_tag = row.location_tag
+            topic.is_published = row.is_published
+            topic.updated_at = now
+            (to_update if topic.pk else to_create).append(topic)
+        Topic.objects.bulk_create(to_create)
+        Topic.objects.bulk_update(to_update, UPDATED_TOPIC_FIELDS)
+        batch.created += len(to_create)
+        batch.updated += len(to_update)
+        if to_create and to_create[0].pk is None:
+            return Topic.objects.in_bulk([row.code for row in rows], field_name='code')
+        return {topic.code: topic for topic in to_create + to_update}
+
+    def _link_tags(self, rows, topics, batch):
+        rows = [row for row in rows if row.tags is not None]
+        if not rows:
+            return
+        slugs = {}
+        for row in rows:
+            for name in row.tags:
+                slugs.setdefault(tag_slug(name), name[:100])
+        tags = dict(Tag.objects.filter(slug__in=slugs).values_list('slug', 'pk'))
+        missing = [Tag(name=name, slug=slug) for slug, name in slugs.items() if slug not in tags]
+        if missing:
+            # ignore_conflicts: un nombre ya usado con otro slug no aborta el lote
+            # (ese tag no se asigna)
+            Tag.objects.bulk_create(missing, ignore_conflicts=True)
+            known = set(tags.values())
+            tags = dict(Tag.objects.filter(slug__in=slugs).values_list('slug', 'pk'))
+            created = set(tags.values()) - known
+            batch.tags_created += len(created)
+            changelog.record('tag', sorted(created))
+            fuzzy.index_tags(created)
+
+        wanted = set()
+        for row in rows:
+            topic_id = topics[row.code].pk
+            for name in row.tags:
+                tag_id = tags.get(tag_slug(name))
+                if tag_id:
+                    wanted.add((tag_id, topic_id))
+        links = {
+            (tag_id, topic_id): pk
+            for pk, tag_id, topic_id in TopicTag.objects.filter(
+                topic_id__in=[topics[row.code].pk for row in rows]
+            ).values_list('pk', 'tag_id', 'topic_id')
+        }
+        current = set(links)
+        stale = [links[key] for key in current - wanted]
+        if stale:
+            TopicTag.objects.filter(pk__in=stale).delete()
+        TopicTag.objects.bulk_create(
+            [TopicTag(tag_id=tag_id, topic_id=topic_id) for tag_id, topic_id in wanted - current],
+            ignore_conflicts=True,
+        )
+
+    def finish(self, report):
+        """Lo que normalmente mantienen los signals, una sola vez."""
+        sequence.rebuild()
+        report.extra['counters'] = counters.reconcile()
+        bump_version('search')
+        bump_version('content')
+        snapshot.touch()
@@ -0,0 +1,34 @@
+"""
+Construye el snapshot del catálogo en memoria (ver core.snapshot) y muestra
+su tamaño: cuántos registros tiene, cuánto tardó y cuánta memoria ocupa
+aproximadamente en cada proceso.
+
+Uso:
+    python manage.py catalog_snapshot
+    python manage.py catalog_snapshot --touch   (sube la versión: los procesos reconstruyen)
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import snapshot
+
+
+class Command(BaseCommand):
+    help = 'Construye el snapshot del catálogo y muestra su tamaño y memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--touch',
+            action='store_true',
+            help='Subir la versión del catálogo para que los procesos reconstruyan su snapshot',
+        )
+
+    def handle(self, *args, **options):
+        if options['touch']:
+            snapshot.touch()
+        stats = snapshot.CatalogSnapshot.build().stats()
+        for name, value in stats.items():
+            if name == 'bytes':
+                value = f'{value / 1024 / 1024:.1f} MB'
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(self.style.SUCCESS(f"Snapshot versión {stats['version']}"))
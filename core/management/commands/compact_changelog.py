@@ -0,0 +1,29 @@
+"""
+Compacta el registro de cambios de la sincronización (core.changelog).
+
+Borra las entradas reemplazadas por otra más nueva del mismo objeto (con la
+misma ubicación/categoría). Ningún dispositivo ve una diferencia: el feed
+sólo devuelve la última entrada de cada objeto.
+
+Uso:
+    python manage.py compact_changelog
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import changelog
+
+
+class Command(BaseCommand):
+    help = 'Borra las entradas del registro de cambios que ya fueron reemplazadas'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        deleted = changelog.compact()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} entrada(s) borrada(s), versión actual {changelog.current_version()} '
+            f'({elapsed:.2f}s)'
+        ))
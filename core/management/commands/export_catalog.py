@@ -0,0 +1,49 @@
+"""
+Exporta el catálogo completo en JSONL o CSV (ver core.export).
+
+Uso:
+    python manage.py export_catalog > catalogo.jsonl
+    python manage.py export_catalog topic tag --output catalogo.jsonl
+    python manage.py export_catalog topic --format csv --output temas.csv
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import export
+
+
+class Command(BaseCommand):
+    help = 'Exporta categorías, videos, temas, tags y quizzes en streaming (JSONL o CSV)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            help=f"Modelos a exportar: {', '.join(export.EXPORTERS)} (default: todos; CSV admite uno)",
+        )
+        parser.add_argument('--format', choices=export.FORMATS, default='jsonl')
+        parser.add_argument('--output', default='-', help="Archivo de salida ('-' para stdout)")
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Filas leídas por consulta (default: settings.EXPORT_CHUNK_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export.stream_catalog(
+                options['models'], options['format'], options['chunk_size']
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        output = options['output']
+        if output == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(output, 'w', newline='', encoding='utf-8') as stream:
+            for chunk in chunks:
+                stream.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Catálogo exportado en {output}'))
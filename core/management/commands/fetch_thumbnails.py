@@ -0,0 +1,69 @@
+"""
+Descarga las miniaturas de los videos y genera sus variantes locales (ver
+core.thumbnails).
+
+Por defecto sólo las que faltan o fallaron la vez anterior. Las plataformas
+con cuadros por tiempo (Cloudflare) tienen además una por tema.
+
+Uso:
+    python manage.py fetch_thumbnails
+    python manage.py fetch_thumbnails --refresh
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import snapshot, thumbnails
+from core.cache import bump_version
+from core.models import Topic, VideoAsset, VideoThumbnail
+
+
+class Command(BaseCommand):
+    help = 'Descarga y redimensiona las miniaturas de los videos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--refresh',
+            action='store_true',
+            help='Vuelve a descargar también las que ya existen',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        done = set()
+        if not options['refresh']:
+            done = set(
+                VideoThumbnail.objects.exclude(digest='').values_list('video_id', 'start_seconds')
+            )
+        wanted = {(pk, 0) for pk in VideoAsset.objects.values_list('pk', flat=True)}
+        wanted.update(
+            Topic.objects.filter(video__platform__in=thumbnails.TIMED_PLATFORMS)
+            .values_list('video_id', 'start_seconds')
+        )
+        pending = sorted(wanted - done)
+        videos = VideoAsset.objects.in_bulk({video_id for video_id, _ in pending})
+
+        fetcher = thumbnails.get_fetcher()
+        changed, failed = set(), 0
+        for video_id, start_seconds in pending:
+            video = videos[video_id]
+            result = thumbnails.fetch_thumbnail(video, start_seconds, fetcher=fetcher)
+            if result.digest:
+                changed.add(video_id)
+            else:
+                failed += 1
+                self.stderr.write(self.style.WARNING(
+                    f'{video.platform}/{video.external_id} @ {start_seconds}s: {result.error}'
+                ))
+
+        if changed:
+            # Las páginas con miniaturas validan contra video.updated_at
+            VideoAsset.objects.filter(pk__in=changed).update(updated_at=timezone.now())
+            bump_version('content')
+            snapshot.touch()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(pending) - failed} miniatura(s) descargada(s), {failed} con error ({elapsed:.2f}s)'
+        ))
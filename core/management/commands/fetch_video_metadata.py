@@ -0,0 +1,120 @@
+"""
+Completa la duración y la fecha de subida de los videos consultando cada
+plataforma (ver core.video_metadata).
+
+Por defecto sólo consulta los videos a los que les falta algún dato y que no
+se consultaron en las últimas 24 horas, y sólo completa campos vacíos.
+
+Uso:
+    python manage.py fetch_video_metadata
+    python manage.py fetch_video_metadata --platform youtube --platform vimeo
+    python manage.py fetch_video_metadata --all --overwrite
+"""
+
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import VideoAsset
+from core.video_metadata import MetadataFetcher, apply_metadata, stale_videos
+
+
+class Command(BaseCommand):
+    help = 'Obtiene duración y fecha de subida de los videos desde su plataforma'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--platform',
+            action='append',
+            choices=[key for key, _ in VideoAsset.PLATFORM_CHOICES],
+            help='Sólo videos de esta plataforma (se puede repetir)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Incluye videos que ya tienen duración y fecha',
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Reemplaza valores ya cargados (por defecto sólo completa vacíos)',
+        )
+        parser.add_argument(
+            '--recheck-hours',
+            type=int,
+            default=24,
+            help='No reconsultar videos consultados hace menos de N horas (0: todos; default: 24)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Videos por lote (default: 200)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Requests simultáneas (default: VIDEO_METADATA_CONCURRENCY)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size debe ser mayor que 0')
+        started = time.monotonic()
+        videos = stale_videos(options['recheck_hours'], include_complete=options['all'])
+        if options['platform']:
+            videos = videos.filter(platform__in=options['platform'])
+        video_ids = list(videos.values_list('pk', flat=True))
+
+        fetcher = MetadataFetcher(concurrency=options['concurrency'])
+        skipped_platforms = {
+            name for name, provider in fetcher.providers.items() if not provider.is_configured()
+        }
+        totals = dict.fromkeys(('updated', 'unchanged', 'missing', 'errors', 'skipped', 'requests', 'cache_hits'), 0)
+        batch_size = options['batch_size']
+        for start in range(0, len(video_ids), batch_size):
+            batch = list(VideoAsset.objects.filter(pk__in=video_ids[start:start + batch_size]))
+            result = asyncio.run(fetcher.fetch([(video.platform, video.external_id) for video in batch]))
+            self.save_batch(batch, result, options['overwrite'], totals)
+            totals['requests'] += result.requests
+            totals['cache_hits'] += result.cache_hits
+
+        for platform in sorted(skipped_platforms):
+            self.stdout.write(self.style.WARNING(f'{platform}: sin credenciales configuradas, se omite'))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(video_ids)} video(s) consultado(s): {totals['updated']} actualizado(s), "
+            f"{totals['unchanged']} sin cambios, {totals['missing']} no encontrado(s), "
+            f"{totals['errors']} con error, {totals['skipped']} omitido(s); "
+            f"{totals['requests']} request(s), {totals['cache_hits']} desde caché, {elapsed:.2f}s"
+        ))
+
+    def save_batch(self, batch, result, overwrite, totals):
+        checked = []
+        for video in batch:
+            key = (video.platform, video.external_id)
+            if key in result.found:
+                changed = apply_metadata(video, result.found[key], overwrite=overwrite)
+                if changed:
+                    # save() para que los signals actualicen payloads y quizzes
+                    video.metadata_checked_at = timezone.now()
+                    video.save(update_fields=[*changed, 'metadata_checked_at', 'updated_at'])
+                    totals['updated'] += 1
+                else:
+                    checked.append(video.pk)
+                    totals['unchanged'] += 1
+            elif key in result.missing:
+                checked.append(video.pk)
+                totals['missing'] += 1
+                self.stderr.write(self.style.WARNING(f'{video.platform}/{video.external_id}: no encontrado'))
+            elif key in result.errors:
+                totals['errors'] += 1
+                self.stderr.write(self.style.WARNING(
+                    f'{video.platform}/{video.external_id}: {result.errors[key]}'
+                ))
+            else:
+                totals['skipped'] += 1
+        # Sin cambios de contenido: sólo la marca de consulta, sin signals
+        VideoAsset.objects.filter(pk__in=checked).update(metadata_checked_at=timezone.now())
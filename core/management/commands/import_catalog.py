@@ -0,0 +1,82 @@
+"""
+Importa temas, videos y tags desde CSV o JSONL (ver core.importer).
+
+Uso:
+    python manage.py import_catalog temas.csv
+    python manage.py import_catalog marcadores.jsonl --batch-size 2000
+    python manage.py import_catalog temas.csv --dry-run
+    cat temas.jsonl | python manage.py import_catalog - --format jsonl
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Importa (crea o actualiza por código) temas con sus videos y tags desde CSV/JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archivo CSV o JSONL ('-' para stdin)")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Formato de entrada (default: según la extensión del archivo)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Filas por lote/transacción (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valida e importa cada lote dentro de una transacción que se revierte',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            if path == '-':
+                raise CommandError('Con stdin hay que indicar --format')
+            fmt = 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size debe ser mayor que 0')
+
+        importer = CatalogImporter(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(f'No se pudo abrir {path}: {exc}')
+        with stream:
+            report = importer.run(
+                read_rows(stream, fmt),
+                on_batch=self.report_batch,
+                on_error=self.report_error,
+            )
+
+        mode = ' (dry-run: nada se guardó)' if report.dry_run else ''
+        rate = report.rows / report.seconds if report.seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.rows} filas en {report.batches} lote(s){mode}: '
+            f'{report.created} temas nuevos, {report.updated} actualizados, '
+            f'{report.videos_created} videos y {report.tags_created} tags nuevos, '
+            f'{report.errors} fila(s) con error; {report.seconds:.2f}s ({rate:.0f} filas/s)'
+        ))
+        for name, fixed in report.extra.get('counters', {}).items():
+            if fixed:
+                self.stdout.write(f'  contadores de {name}: {fixed} fila(s) recalculada(s)')
+
+    def report_batch(self, batch):
+        self.stdout.write(
+            f'Lote {batch.number}: {batch.rows} filas '
+            f'({batch.created} nuevas, {batch.updated} actualizadas) '
+            f'en {batch.seconds:.2f}s - {batch.rate:.0f} filas/s'
+        )
+
+    def report_error(self, line, error):
+        self.stderr.write(self.style.WARNING(f'Línea {line}: {error}'))
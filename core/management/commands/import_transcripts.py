@@ -0,0 +1,94 @@
+"""
+Importa transcripciones con tiempos desde archivos WebVTT (.vtt) o SRT (.srt)
+(ver core.transcripts). Reemplaza la transcripción del video en ese idioma.
+
+El video sale del nombre del archivo: <external_id>[.<idioma>].vtt|srt
+(ej: dQw4w9WgXcQ.es.vtt), o de --video si se importa un solo archivo. Se
+pueden pasar directorios: se importan todos los .vtt y .srt que contengan.
+
+Uso:
+    python manage.py import_transcripts subtitulos/
+    python manage.py import_transcripts clase-1.srt --video 12 --language es
+"""
+
+import re
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import transcripts
+from core.models import VideoAsset
+
+
+EXTENSIONS = ('.vtt', '.srt')
+# 'dQw4w9WgXcQ.es' / 'clase.pt-BR'
+LANGUAGE_SUFFIX = re.compile(r'\.([a-z]{2}(?:-[A-Za-z]{2})?)$')
+
+
+class Command(BaseCommand):
+    help = 'Importa transcripciones WebVTT/SRT de los videos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Archivos .vtt/.srt o directorios')
+        parser.add_argument('--video', type=int, help='ID del VideoAsset (sólo con un archivo)')
+        parser.add_argument(
+            '--language',
+            help='Idioma (default: el del nombre del archivo, o "es")',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        files = []
+        for raw in options['paths']:
+            path = Path(raw)
+            if path.is_dir():
+                files.extend(sorted(
+                    child for child in path.rglob('*') if child.suffix.lower() in EXTENSIONS
+                ))
+            elif path.is_file():
+                files.append(path)
+            else:
+                raise CommandError(f'No existe: {raw}')
+        if options['video'] and len(files) != 1:
+            raise CommandError('--video sólo se puede usar con un archivo')
+
+        imported, failed, segments = 0, 0, 0
+        for path in files:
+            try:
+                video, language = self.resolve(path, options)
+                transcript = transcripts.save_transcript(
+                    video, transcripts.read_captions(path), language=language, source_name=path.name,
+                )
+            except (transcripts.TranscriptError, VideoAsset.DoesNotExist,
+                    VideoAsset.MultipleObjectsReturned) as exc:
+                failed += 1
+                self.stderr.write(self.style.WARNING(f'{path}: {exc}'))
+                continue
+            imported += 1
+            segments += transcript.segment_count
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{imported} transcripción(es) importada(s) ({segments} segmentos), '
+            f'{failed} con error ({elapsed:.2f}s)'
+        ))
+
+    def resolve(self, path, options):
+        """(video, idioma) de un archivo."""
+        stem, language = path.stem, None
+        match = LANGUAGE_SUFFIX.search(stem)
+        if match:
+            stem, language = stem[:match.start()], match.group(1)
+        language = options['language'] or language or 'es'
+        if options['video']:
+            try:
+                return VideoAsset.objects.get(pk=options['video']), language
+            except VideoAsset.DoesNotExist:
+                raise VideoAsset.DoesNotExist(f'no existe el video {options["video"]}')
+        try:
+            return VideoAsset.objects.get(external_id=stem), language
+        except VideoAsset.DoesNotExist:
+            raise VideoAsset.DoesNotExist(f'no hay un video con external_id "{stem}"')
+        except VideoAsset.MultipleObjectsReturned:
+            raise VideoAsset.MultipleObjectsReturned(f'varios videos con external_id "{stem}": usar --video')
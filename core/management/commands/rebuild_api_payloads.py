@@ -0,0 +1,38 @@
+"""
+Regenera los payloads JSON de la API (TopicPayload) de todos los Topics.
+
+Los signals los mantienen al día; usar tras cambiar el formato del payload
+(core.payloads.build_payload) o cargas hechas con SQL directo.
+
+Uso:
+    python manage.py rebuild_api_payloads
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import payloads
+from core.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Regenera el JSON pre-serializado de la API para todos los temas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Topics por lote (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        changed = payloads.rebuild(batch_size=options['batch_size'])
+        if changed:
+            bump_version('content')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{changed} payload(s) regenerado(s) en {elapsed:.2f}s'
+        ))
@@ -0,0 +1,23 @@
+"""
+Recalcula el mapa de capítulos de todos los videos (ver core.chapters).
+Sólo escribe los que cambiaron.
+
+Uso:
+    python manage.py rebuild_chapter_maps
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import chapters, snapshot
+from core.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Recalcula inicio, fin y tema de los capítulos de cada video'
+
+    def handle(self, *args, **options):
+        changed = chapters.rebuild()
+        if changed:
+            bump_version('content')
+            snapshot.touch()
+        self.stdout.write(self.style.SUCCESS(f'{changed} video(s) con capítulos actualizados'))
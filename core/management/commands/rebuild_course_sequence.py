@@ -0,0 +1,21 @@
+"""
+Reconstruye la secuencia materializada del curso (CourseSequenceEntry).
+
+Normalmente se mantiene sola (signals + sequence.batch()); este comando sirve
+después de cargas con SQL directo o para reparar inconsistencias.
+
+Uso:
+    python manage.py rebuild_course_sequence
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import sequence
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la secuencia del curso (posición y vecinos de cada tema publicado)'
+
+    def handle(self, *args, **options):
+        total = sequence.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Secuencia reconstruida: {total} temas publicados'))
@@ -0,0 +1,35 @@
+"""
+Reconstruye el índice de búsqueda full-text de todos los Topics y, fuera de
+PostgreSQL, la tabla de trigramas de la búsqueda tolerante a errores
+(core.fuzzy).
+
+Uso:
+    python manage.py rebuild_search_index
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los documentos de búsqueda (SearchDocument) de todos los temas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Topics por lote (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        backend = type(search.get_backend()).__name__
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} temas indexados con {backend} en {elapsed:.2f}s'
+        ))
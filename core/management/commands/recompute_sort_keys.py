@@ -0,0 +1,42 @@
+"""
+Recalcula Topic.sort_key a partir de Topic.code.
+
+Necesario si se cambia make_sort_key o si se cargaron datos con
+queryset.update()/SQL directo (que no pasan por Topic.save()).
+
+Uso:
+    python manage.py recompute_sort_keys
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import snapshot
+from core.models import Topic, make_sort_key
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la clave de orden (sort_key) de todos los temas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Topics por lote (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        changed = []
+        for topic in Topic.objects.only('pk', 'code', 'sort_key').iterator(chunk_size=batch_size):
+            sort_key = make_sort_key(topic.code)
+            if topic.sort_key != sort_key:
+                topic.sort_key = sort_key
+                changed.append(topic)
+        with transaction.atomic():
+            Topic.objects.bulk_update(changed, ['sort_key'], batch_size=batch_size)
+        if changed:
+            # bulk_update no pasa por los signals
+            snapshot.touch()
+        self.stdout.write(self.style.SUCCESS(f'{len(changed)} claves de orden actualizadas'))
@@ -0,0 +1,26 @@
+"""
+Corrige los contadores desnormalizados de Category, VideoAsset y Tag.
+
+Los signals los mantienen al día, pero cargas con SQL directo, bulk_create o
+fallos a mitad de una transacción pueden desviarlos.
+
+Uso:
+    python manage.py reconcile_counters
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import counters, snapshot
+
+
+class Command(BaseCommand):
+    help = 'Recalcula topic_count y published_topic_count de categorías, videos y tags'
+
+    def handle(self, *args, **options):
+        fixes = counters.reconcile()
+        if any(fixes.values()):
+            # Los snapshots en memoria muestran los contadores
+            snapshot.touch()
+        for name, fixed in fixes.items():
+            style = self.style.WARNING if fixed else self.style.SUCCESS
+            self.stdout.write(style(f'{name}: {fixed} fila(s) corregida(s)'))
@@ -0,0 +1,18 @@
+"""
+Recalcula las estadísticas cacheadas de todos los quizzes.
+
+Uso:
+    python manage.py refresh_quiz_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import quiz_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula duración, temas y categorías cacheados de cada quiz'
+
+    def handle(self, *args, **options):
+        total = quiz_stats.refresh_all()
+        self.stdout.write(self.style.SUCCESS(f'{total} quizzes actualizados'))
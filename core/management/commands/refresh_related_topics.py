@@ -0,0 +1,32 @@
+"""
+Recalcula los temas relacionados ("Ver también", ver core.related).
+Sin opciones sólo recalcula lo que cambió desde la última pasada; con
+--full, todo el catálogo (pone al día el idf de todas las filas).
+Sólo escribe las listas que cambiaron.
+
+Uso:
+    python manage.py refresh_related_topics
+    python manage.py refresh_related_topics --full
+
+Ej. en cron: cada 10 minutos sin opciones y una vez por noche con --full.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import related, snapshot
+from core.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los temas relacionados de cada tema (sólo lo que cambió, o todo con --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recalcular todos los temas')
+
+    def handle(self, *args, **options):
+        changed = related.refresh(full=options['full'])
+        if changed:
+            # Las páginas cacheadas de los temas muestran la lista
+            bump_version('content')
+            snapshot.touch()
+        self.stdout.write(self.style.SUCCESS(f'{changed} tema(s) con relacionados actualizados'))
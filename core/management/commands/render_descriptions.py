@@ -0,0 +1,61 @@
+"""
+Vuelve a generar description_html y description_excerpt de todos los temas
+(ver core.markup).
+
+Topic.save() y el importador ya los mantienen; usar tras cambiar
+MARKDOWN_EXTENSIONS o las reglas de saneado. Sólo escribe (y marca como
+modificados) los temas cuyo resultado cambió.
+
+Uso:
+    python manage.py render_descriptions
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import snapshot
+from core.cache import bump_version
+from core.markup import render_description
+from core.models import Topic
+
+
+class Command(BaseCommand):
+    help = 'Regenera el HTML saneado y el extracto de las descripciones de los temas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Temas por lote (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        topics = Topic.objects.order_by('pk').only('pk', 'description', 'description_html', 'description_excerpt')
+        changed, pending = 0, []
+        for topic in topics.iterator(chunk_size=batch_size):
+            current = (topic.description_html, topic.description_excerpt)
+            render_description(topic)
+            if (topic.description_html, topic.description_excerpt) != current:
+                # updated_at alimenta el ETag de las páginas
+                topic.updated_at = timezone.now()
+                pending.append(topic)
+            if len(pending) >= batch_size:
+                changed += self.save(pending)
+                pending = []
+        changed += self.save(pending)
+        if changed:
+            bump_version('content')
+            snapshot.touch()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{changed} descripción(es) regenerada(s) en {elapsed:.2f}s'
+        ))
+
+    def save(self, topics):
+        Topic.objects.bulk_update(topics, ['description_html', 'description_excerpt', 'updated_at'])
+        return len(topics)
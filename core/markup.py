@@ -0,0 +1,118 @@
+"""
+Markdown de las descripciones
+==============================
+Topic.description se escribe en Markdown. Se convierte una sola vez, al
+guardar (Topic.save y el importador), y se guardan dos resultados:
+
+- description_html: HTML saneado que topic_detail.html muestra tal cual.
+- description_excerpt: texto plano corto para las tarjetas de los listados.
+
+Saneado: el HTML crudo dentro del Markdown se muestra como texto (no se
+interpreta), sólo quedan las etiquetas de ALLOWED_TAGS con sus atributos
+permitidos y los enlaces sólo pueden ser http(s), mailto o relativos.
+Los ids sólo se conservan en las notas al pie ('extra' incluye footnotes:
+fn:1 / fnref:1) y siempre con el prefijo ID_PREFIX, igual que los enlaces
+#fn:1 que apuntan a ellas: el texto del tema no puede pisar ids de la página.
+
+Si cambian MARKDOWN_EXTENSIONS o estas reglas, el comando
+render_descriptions vuelve a generar todo.
+"""
+
+import html
+import re
+from urllib.parse import urlsplit
+
+import markdown
+from django.conf import settings
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+from markdown.treeprocessors import Treeprocessor
+
+
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'strong', 'em', 'b', 'i', 'del', 'sup', 'sub', 'code', 'pre', 'blockquote',
+    'ul', 'ol', 'li', 'dl', 'dt', 'dd', 'a', 'abbr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td', 'div', 'span',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'code': {'class'},
+    'ol': {'start'},
+    'th': {'align'},
+    'td': {'align'},
+}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto'}
+# Notas al pie: <sup id="fnref:1">, <li id="fn:1"> y sus enlaces #fn:1 / #fnref:1
+ID_TAGS = {'sup', 'li', 'div'}
+FOOTNOTE_ID = re.compile(r'fn(?:ref)?:[\w.-]+\Z')
+ID_PREFIX = 'descripcion-'
+
+EXCERPT_WORDS = 30
+EXCERPT_MAX_LENGTH = 300
+
+
+class SanitizeProcessor(Treeprocessor):
+    """Limpia el árbol ya generado: etiquetas, atributos y URLs."""
+
+    def run(self, root):
+        for element in root.iter():
+            if element is root:
+                continue
+            if element.tag not in ALLOWED_TAGS:
+                # ej: imágenes (serían enlaces a terceros): queda su texto alternativo
+                if element.tag == 'img' and not element.text:
+                    element.text = element.get('alt', '')
+                element.tag = 'span'
+            footnote_id = element.get('id', '') if element.tag in ID_TAGS else ''
+            allowed = ALLOWED_ATTRIBUTES.get(element.tag, set())
+            for name in list(element.attrib):
+                if name not in allowed:
+                    del element.attrib[name]
+            if FOOTNOTE_ID.match(footnote_id):
+                element.set('id', ID_PREFIX + footnote_id)
+            href = element.get('href')
+            if href is not None and href.startswith('#') and FOOTNOTE_ID.match(href[1:]):
+                element.set('href', '#' + ID_PREFIX + href[1:])
+            elif href is not None:
+                scheme = url_scheme(href)
+                if scheme not in ALLOWED_SCHEMES:
+                    del element.attrib['href']
+                elif scheme:
+                    element.set('rel', 'noopener nofollow')
+
+
+def url_scheme(url):
+    """Esquema en minúsculas ('' si es relativa; None si no se puede leer)."""
+    try:
+        return urlsplit(html.unescape(url).strip()).scheme.lower()
+    except ValueError:
+        return None
+
+
+def get_extensions():
+    return getattr(settings, 'MARKDOWN_EXTENSIONS', ['extra', 'sane_lists', 'nl2br'])
+
+
+def render_markdown(text):
+    """Markdown -> HTML saneado."""
+    if not text or not text.strip():
+        return ''
+    md = markdown.Markdown(extensions=get_extensions(), output_format='html')
+    # El HTML crudo se escapa en vez de pasarse tal cual
+    md.preprocessors.deregister('html_block')
+    md.inlinePatterns.deregister('html')
+    md.treeprocessors.register(SanitizeProcessor(md), 'sanitize', 0)
+    return md.convert(text)
+
+
+def excerpt(rendered_html):
+    """Texto plano de las primeras EXCERPT_WORDS palabras."""
+    text = re.sub(r'\s+', ' ', html.unescape(strip_tags(rendered_html))).strip()
+    return Truncator(Truncator(text).words(EXCERPT_WORDS)).chars(EXCERPT_MAX_LENGTH)
+
+
+def render_description(topic):
+    """Actualiza description_html y description_excerpt del tema (sin guardar)."""
+    topic.description_html = render_markdown(topic.description)
+    topic.description_excerpt = excerpt(topic.description_html)
@@ -0,0 +1,116 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE core_searchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(code, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(title, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(tags, '')), 'C') ||
+        setweight(to_tsvector('spanish', coalesce(body, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX core_searchdocument_vector_gin ON core_searchdocument USING gin (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS core_searchdocument_vector_gin",
+    "ALTER TABLE core_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_searchdocument_fts USING fts5(
+        code, title, tags, body,
+        content='core_searchdocument', content_rowid='topic_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_ai AFTER INSERT ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(rowid, code, title, tags, body)
+        VALUES (new.topic_id, new.code, new.title, new.tags, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_ad AFTER DELETE ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, code, title, tags, body)
+        VALUES ('delete', old.topic_id, old.code, old.title, old.tags, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_au AFTER UPDATE ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, code, title, tags, body)
+        VALUES ('delete', old.topic_id, old.code, old.title, old.tags, old.body);
+        INSERT INTO core_searchdocument_fts(rowid, code, title, tags, body)
+        VALUES (new.topic_id, new.code, new.title, new.tags, new.body);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_searchdocument_au",
+    "DROP TRIGGER IF EXISTS core_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS core_searchdocument_ai",
+    "DROP TABLE IF EXISTS core_searchdocument_fts",
+]
+
+
+def run_vendor_sql(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+def backfill_documents(apps, schema_editor):
+    """Crea el documento de búsqueda de cada Topic existente."""
+    Topic = apps.get_model('core', 'Topic')
+    SearchDocument = apps.get_model('core', 'SearchDocument')
+    documents = [
+        SearchDocument(
+            topic_id=topic.pk,
+            code=topic.code,
+            title=topic.title,
+            tags=' '.join(tag.name for tag in topic.tags.all()),
+            body=topic.description,
+            is_published=topic.is_published,
+        )
+        for topic in Topic.objects.prefetch_related('tags').iterator(chunk_size=500)
+    ]
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_videoasset_platform'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='core.topic', verbose_name='Tema')),
+                ('code', models.CharField(max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('tags', models.TextField(blank=True)),
+                ('body', models.TextField(blank=True)),
+                ('is_published', models.BooleanField(db_index=True, default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Documento de Búsqueda',
+                'verbose_name_plural': 'Documentos de Búsqueda',
+            },
+        ),
+        migrations.RunPython(
+            run_vendor_sql({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run_vendor_sql({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:41
+
+import re
+
+from django.db import migrations, models
+
+
+SORT_KEY_SEGMENT_WIDTH = 6
+SORT_KEY_PART_RE = re.compile(r'\d+|\D+')
+
+
+def make_sort_key(code):
+    """
+    '1.2a' -> '000001.000002a'.
+
+    Copia CONGELADA de core.models.make_sort_key tal como era al crear esta
+    migración: si cambia el ancho de los segmentos, esta migración debe seguir
+    escribiendo las mismas claves (el comando recompute_sort_keys las
+    actualiza). SortKeyTests comprueba que hoy ambas dan el mismo resultado.
+    """
+    segments = []
+    for segment in code.strip().split('.'):
+        parts = SORT_KEY_PART_RE.findall(segment)
+        segments.append(''.join(
+            part.zfill(SORT_KEY_SEGMENT_WIDTH) if part.isdigit() else part.lower()
+            for part in parts
+        ))
+    return '.'.join(segments)
+
+
+def use_binary_collation(apps, schema_editor):
+    """
+    En PostgreSQL la collation por defecto (ej: es_CO.UTF-8) ignora la
+    puntuación al comparar; sort_key necesita orden byte a byte ("C") para
+    que el orden y los rangos de subárbol funcionen. SQLite ya usa BINARY.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE core_topic ALTER COLUMN sort_key TYPE varchar(160) COLLATE "C"'
+        )
+
+
+def backfill_sort_keys(apps, schema_editor):
+    Topic = apps.get_model('core', 'Topic')
+    topics = list(Topic.objects.only('pk', 'code'))
+    for topic in topics:
+        topic.sort_key = make_sort_key(topic.code)
+    Topic.objects.bulk_update(topics, ['sort_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='topic',
+            options={'ordering': ['sort_key', 'code'], 'verbose_name': 'Tema', 'verbose_name_plural': 'Temas'},
+        ),
+        migrations.RemoveIndex(
+            model_name='topic',
+            name='core_topic_code_78bca1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='topic',
+            name='core_topic_categor_969775_idx',
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='sort_key',
+            field=models.CharField(default='', editable=False, help_text='Derivada del código al guardar (ver make_sort_key)', max_length=160, verbose_name='Clave de orden'),
+        ),
+        migrations.RunPython(use_binary_collation, migrations.RunPython.noop),
+        migrations.RunPython(backfill_sort_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['sort_key', 'code'], name='core_topic_sort_ke_b6a3e3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['is_published', 'sort_key'], name='core_topic_is_publ_3c4bff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['category', 'sort_key'], name='core_topic_categor_a65e8e_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def use_binary_collation(apps, schema_editor):
+    """Mismo orden byte a byte que Topic.sort_key (ver migración 0004)."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE core_coursesequenceentry ALTER COLUMN sort_key TYPE varchar(160) COLLATE "C"'
+        )
+
+
+def build_sequence(apps, schema_editor):
+    """Construye la secuencia inicial (misma lógica que core.sequence.rebuild)."""
+    Topic = apps.get_model('core', 'Topic')
+    CourseSequenceEntry = apps.get_model('core', 'CourseSequenceEntry')
+    rows = Topic.objects.filter(is_published=True).order_by('sort_key', 'code').values_list(
+        'pk', 'category_id', 'sort_key', 'code'
+    )
+    entries = [
+        CourseSequenceEntry(topic_id=pk, category_id=category_id, sort_key=sort_key, code=code)
+        for pk, category_id, sort_key, code in rows
+    ]
+    by_category = {}
+    for entry in entries:
+        by_category.setdefault(entry.category_id, []).append(entry)
+
+    def link(items, position_field, prev_field, next_field):
+        for index, entry in enumerate(items):
+            setattr(entry, position_field, index + 1)
+            setattr(entry, prev_field, items[index - 1].topic_id if index else None)
+            setattr(entry, next_field, items[index + 1].topic_id if index + 1 < len(items) else None)
+
+    link(entries, 'position', 'prev_topic_id', 'next_topic_id')
+    for items in by_category.values():
+        link(items, 'category_position', 'category_prev_topic_id', 'category_next_topic_id')
+    CourseSequenceEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_topic_sort_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSequenceEntry',
+            fields=[
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sequence', serialize=False, to='core.topic', verbose_name='Tema')),
+                ('sort_key', models.CharField(max_length=160)),
+                ('code', models.CharField(max_length=20)),
+                ('position', models.PositiveIntegerField(verbose_name='Posición global')),
+                ('category_position', models.PositiveIntegerField(verbose_name='Posición en la categoría')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.category', verbose_name='Categoría')),
+                ('category_next_topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.topic')),
+                ('category_prev_topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.topic')),
+                ('next_topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.topic')),
+                ('prev_topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.topic')),
+            ],
+            options={
+                'verbose_name': 'Entrada de Secuencia',
+                'verbose_name_plural': 'Secuencia del Curso',
+                'ordering': ['position'],
+                'indexes': [models.Index(fields=['sort_key', 'code'], name='core_course_sort_ke_7b9190_idx'), models.Index(fields=['category', 'sort_key', 'code'], name='core_course_categor_5f8db1_idx'), models.Index(fields=['position'], name='core_course_positio_e356c5_idx'), models.Index(fields=['category', 'category_position'], name='core_course_categor_64eaa0_idx')],
+            },
+        ),
+        migrations.RunPython(use_binary_collation, migrations.RunPython.noop),
+        migrations.RunPython(build_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:44
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """Calcula los contadores iniciales (una UPDATE por modelo)."""
+    Topic = apps.get_model('core', 'Topic')
+
+    def count(field, published=False):
+        topics = Topic.objects.filter(**{field: OuterRef('pk')})
+        if published:
+            topics = topics.filter(is_published=True)
+        counts = topics.order_by().values(field).annotate(c=Count('pk')).values('c')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    for model_name, field in (('Category', 'category'), ('VideoAsset', 'video'), ('Tag', 'tags')):
+        apps.get_model('core', model_name).objects.update(
+            topic_count=count(field),
+            published_topic_count=count(field, published=True),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_coursesequenceentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_topic_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Contador mantenido por core.counters', verbose_name='Temas publicados'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='topic_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Contador mantenido por core.counters', verbose_name='Temas'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='published_topic_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Contador mantenido por core.counters', verbose_name='Temas publicados'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='topic_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Contador mantenido por core.counters', verbose_name='Temas'),
+        ),
+        migrations.AddField(
+            model_name='videoasset',
+            name='published_topic_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Contador mantenido por core.counters', verbose_name='Temas publicados'),
+        ),
+        migrations.AddField(
+            model_name='videoasset',
+            name='topic_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Contador mantenido por core.counters', verbose_name='Temas'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
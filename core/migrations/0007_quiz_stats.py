@@ -0,0 +1,85 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:48
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_stats(apps, schema_editor):
+    """
+    Estadísticas iniciales.
+
+    Copia CONGELADA de core.quiz_stats tal como era al crear esta migración:
+    usa los modelos históricos y no debe seguir los cambios del módulo.
+    QuizStatsTests comprueba que hoy ambas dan el mismo resultado.
+    """
+    Quiz = apps.get_model('core', 'Quiz')
+    Topic = apps.get_model('core', 'Topic')
+    starts = {}
+    for video_id, start in Topic.objects.values_list('video_id', 'start_seconds'):
+        starts.setdefault(video_id, []).append(start)
+    now = timezone.now()
+    quizzes = list(Quiz.objects.prefetch_related('topics__video'))
+    for quiz in quizzes:
+        topics = sorted(quiz.topics.all(), key=lambda topic: (topic.sort_key, topic.code))
+        videos = {topic.video_id: topic.video for topic in topics}
+        segments = 0
+        for topic in topics:
+            later = [start for start in starts[topic.video_id] if start > topic.start_seconds]
+            end = min(later) if later else topic.video.duration_seconds
+            if end is not None:
+                segments += max(end - topic.start_seconds, 0)
+        quiz.stats_total_duration_seconds = sum(video.duration_seconds or 0 for video in videos.values())
+        quiz.stats_segment_seconds = segments
+        quiz.stats_topic_count = len(topics)
+        quiz.stats_category_count = len({topic.category_id for topic in topics})
+        quiz.stats_topic_codes = ','.join(topic.code for topic in topics)
+        quiz.stats_updated_at = now
+    Quiz.objects.bulk_update(quizzes, [
+        'stats_total_duration_seconds', 'stats_segment_seconds', 'stats_topic_count',
+        'stats_category_count', 'stats_topic_codes', 'stats_updated_at',
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_topic_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='stats_category_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='stats_segment_seconds',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Suma de lo que dura cada tema dentro de su video', verbose_name='Duración de los segmentos (s)'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='stats_topic_codes',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='stats_topic_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='stats_total_duration_seconds',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Suma de la duración de los videos distintos de sus temas', verbose_name='Duración total de videos (s)'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='stats_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['video', 'start_seconds'], name='core_topic_video_i_046c69_idx'),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
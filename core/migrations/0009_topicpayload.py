@@ -0,0 +1,42 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def use_binary_collation(apps, schema_editor):
+    """Mismo orden byte a byte que Topic.sort_key (ver migración 0004)."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE core_topicpayload ALTER COLUMN sort_key TYPE varchar(160) COLLATE "C"'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_category_tag_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicPayload',
+            fields=[
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='core.topic', verbose_name='Tema')),
+                ('code', models.CharField(max_length=20)),
+                ('sort_key', models.CharField(max_length=160)),
+                ('is_published', models.BooleanField(default=True)),
+                ('data', models.TextField(verbose_name='JSON')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.category', verbose_name='Categoría')),
+            ],
+            options={
+                'verbose_name': 'Payload de la API',
+                'verbose_name_plural': 'Payloads de la API',
+                'indexes': [models.Index(fields=['is_published', 'sort_key', 'code'], name='core_topicp_is_publ_0ffa1e_idx'), models.Index(fields=['category', 'is_published', 'sort_key', 'code'], name='core_topicp_categor_a6b26e_idx')],
+            },
+        ),
+        # Los payloads se generan con el código actual de core.payloads en
+        # post_migrate (ver signals.fill_missing_payloads), no aquí.
+        migrations.RunPython(use_binary_collation, migrations.RunPython.noop),
+    ]
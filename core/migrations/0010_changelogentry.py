@@ -0,0 +1,52 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:06
+
+from django.db import migrations, models
+
+
+def log_existing_rows(apps, schema_editor):
+    """Versión inicial: un 'upsert' por cada fila existente."""
+    ChangeLogEntry = apps.get_model('core', 'ChangeLogEntry')
+    for model, name in (('Category', 'category'), ('VideoAsset', 'video'), ('Tag', 'tag'), ('Quiz', 'quiz')):
+        ids = apps.get_model('core', model).objects.values_list('pk', flat=True)
+        ChangeLogEntry.objects.bulk_create(
+            (ChangeLogEntry(model=name, object_id=pk) for pk in ids.iterator()), batch_size=1000
+        )
+    topics = apps.get_model('core', 'Topic').objects.filter(is_published=True).values_list(
+        'pk', 'location_tag', 'category_id'
+    )
+    ChangeLogEntry.objects.bulk_create(
+        (
+            ChangeLogEntry(model='topic', object_id=pk, location_tag=location, category_id=category)
+            for pk, location, category in topics.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_topicpayload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(choices=[('category', 'Categoría'), ('video', 'Video'), ('topic', 'Tema'), ('tag', 'Tag'), ('quiz', 'Quiz')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Creado/actualizado'), ('delete', 'Borrado')], default='upsert', max_length=6)),
+                ('location_tag', models.CharField(blank=True, max_length=20)),
+                ('category_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Cambio',
+                'verbose_name_plural': 'Registro de cambios',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['model', 'object_id'], name='core_change_model_af38b3_idx')],
+            },
+        ),
+        migrations.RunPython(log_existing_rows, migrations.RunPython.noop),
+    ]
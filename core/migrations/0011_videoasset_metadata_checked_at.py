@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_changelogentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoasset',
+            name='metadata_checked_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Última consulta a la plataforma (comando fetch_video_metadata)', null=True, verbose_name='Metadatos consultados'),
+        ),
+    ]
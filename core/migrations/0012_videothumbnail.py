@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_videoasset_metadata_checked_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoThumbnail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_seconds', models.PositiveIntegerField(default=0, verbose_name='Segundo')),
+                ('digest', models.CharField(blank=True, help_text='Hash del contenido (vacío si la descarga falló)', max_length=16, verbose_name='Hash')),
+                ('source_url', models.URLField(max_length=500, verbose_name='URL de origen')),
+                ('error', models.CharField(blank=True, max_length=200, verbose_name='Error')),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thumbnails', to='core.videoasset', verbose_name='Video')),
+            ],
+            options={
+                'verbose_name': 'Miniatura',
+                'verbose_name_plural': 'Miniaturas',
+                'unique_together': {('video', 'start_seconds')},
+            },
+        ),
+    ]
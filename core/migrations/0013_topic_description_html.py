@@ -0,0 +1,124 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:15
+
+import html
+import re
+from urllib.parse import urlsplit
+
+import markdown
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+from markdown.treeprocessors import Treeprocessor
+
+
+# Copia CONGELADA de core.markup tal como era al crear esta migración (con las
+# extensiones por defecto, sin leer settings): no debe seguir los cambios del
+# módulo ni importarlo, que carga los modelos actuales. Para regenerar con las
+# reglas vigentes está el comando render_descriptions. DescriptionMarkupTests
+# comprueba que hoy ambas dan el mismo resultado.
+
+EXTENSIONS = ['extra', 'sane_lists', 'nl2br']
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'strong', 'em', 'b', 'i', 'del', 'sup', 'sub', 'code', 'pre', 'blockquote',
+    'ul', 'ol', 'li', 'dl', 'dt', 'dd', 'a', 'abbr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td', 'div', 'span',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'code': {'class'},
+    'ol': {'start'},
+    'th': {'align'},
+    'td': {'align'},
+}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto'}
+ID_TAGS = {'sup', 'li', 'div'}
+FOOTNOTE_ID = re.compile(r'fn(?:ref)?:[\w.-]+\Z')
+ID_PREFIX = 'descripcion-'
+EXCERPT_WORDS = 30
+EXCERPT_MAX_LENGTH = 300
+
+
+def url_scheme(url):
+    try:
+        return urlsplit(html.unescape(url).strip()).scheme.lower()
+    except ValueError:
+        return None
+
+
+class SanitizeProcessor(Treeprocessor):
+
+    def run(self, root):
+        for element in root.iter():
+            if element is root:
+                continue
+            if element.tag not in ALLOWED_TAGS:
+                if element.tag == 'img' and not element.text:
+                    element.text = element.get('alt', '')
+                element.tag = 'span'
+            footnote_id = element.get('id', '') if element.tag in ID_TAGS else ''
+            allowed = ALLOWED_ATTRIBUTES.get(element.tag, set())
+            for name in list(element.attrib):
+                if name not in allowed:
+                    del element.attrib[name]
+            if FOOTNOTE_ID.match(footnote_id):
+                element.set('id', ID_PREFIX + footnote_id)
+            href = element.get('href')
+            if href is not None and href.startswith('#') and FOOTNOTE_ID.match(href[1:]):
+                element.set('href', '#' + ID_PREFIX + href[1:])
+            elif href is not None:
+                scheme = url_scheme(href)
+                if scheme not in ALLOWED_SCHEMES:
+                    del element.attrib['href']
+                elif scheme:
+                    element.set('rel', 'noopener nofollow')
+
+
+def render_markdown(text):
+    if not text or not text.strip():
+        return ''
+    md = markdown.Markdown(extensions=EXTENSIONS, output_format='html')
+    md.preprocessors.deregister('html_block')
+    md.inlinePatterns.deregister('html')
+    md.treeprocessors.register(SanitizeProcessor(md), 'sanitize', 0)
+    return md.convert(text)
+
+
+def render_description(topic):
+    topic.description_html = render_markdown(topic.description)
+    text = re.sub(r'\s+', ' ', html.unescape(strip_tags(topic.description_html))).strip()
+    topic.description_excerpt = Truncator(Truncator(text).words(EXCERPT_WORDS)).chars(EXCERPT_MAX_LENGTH)
+
+
+def render_existing(apps, schema_editor):
+    """HTML y extracto de las descripciones existentes."""
+    Topic = apps.get_model('core', 'Topic')
+    topics = []
+    for topic in Topic.objects.exclude(description='').only('pk', 'description').iterator(chunk_size=500):
+        render_description(topic)
+        topics.append(topic)
+        if len(topics) >= 500:
+            Topic.objects.bulk_update(topics, ['description_html', 'description_excerpt'])
+            topics = []
+    Topic.objects.bulk_update(topics, ['description_html', 'description_excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_videothumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='description_excerpt',
+            field=models.CharField(blank=True, editable=False, help_text='Texto plano para los listados (core.markup)', max_length=300, verbose_name='Extracto'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False, help_text='Markdown ya convertido y saneado (core.markup)', verbose_name='Descripción (HTML)'),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:23
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX core_topic_title_trgm ON core_topic USING gin (title gin_trgm_ops)",
+    "CREATE INDEX core_tag_name_trgm ON core_tag USING gin (name gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS core_tag_name_trgm",
+    "DROP INDEX IF EXISTS core_topic_title_trgm",
+]
+
+
+WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def trigrams(text):
+    """
+    Conjunto de trigramas de un texto (sin tildes ni mayúsculas).
+
+    Copia CONGELADA de core.fuzzy.trigrams tal como era al crear esta
+    migración: no debe seguir los cambios del módulo (ni importarlo, que
+    carga los modelos actuales). FuzzySearchTests comprueba que hoy ambas
+    dan el mismo resultado.
+    """
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    grams = set()
+    for word in WORD_RE.findall(text):
+        padded = f'  {word} '
+        grams.update(padded[start:start + 3] for start in range(len(padded) - 2))
+    return grams
+
+
+def run_vendor_sql(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+def backfill_trigrams(apps, schema_editor):
+    """Trigramas de los títulos publicados y de los tags (PostgreSQL usa pg_trgm)."""
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    SearchTrigram = apps.get_model('core', 'SearchTrigram')
+    Topic = apps.get_model('core', 'Topic')
+    Tag = apps.get_model('core', 'Tag')
+    sources = [
+        ('topic', Topic.objects.filter(is_published=True).values_list('pk', 'title')),
+        ('tag', Tag.objects.values_list('pk', 'name')),
+    ]
+    rows = []
+    for kind, texts in sources:
+        for object_id, text in texts.iterator(chunk_size=500):
+            grams = trigrams(text)
+            rows.extend(
+                SearchTrigram(kind=kind, object_id=object_id, gram=gram, gram_count=len(grams))
+                for gram in sorted(grams)
+            )
+            if len(rows) >= 5000:
+                SearchTrigram.objects.bulk_create(rows)
+                rows = []
+    SearchTrigram.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_topic_description_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('topic', 'Tema'), ('tag', 'Tag')], max_length=5)),
+                ('object_id', models.BigIntegerField()),
+                ('gram', models.CharField(max_length=3)),
+                ('gram_count', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Trigrama de búsqueda',
+                'verbose_name_plural': 'Trigramas de búsqueda',
+                'indexes': [models.Index(fields=['kind', 'gram', 'object_id', 'gram_count'], name='core_search_kind_27be43_idx'), models.Index(fields=['object_id', 'kind'], name='core_search_object__118710_idx')],
+            },
+        ),
+        migrations.RunPython(
+            run_vendor_sql({'postgresql': POSTGRES_FORWARD}),
+            run_vendor_sql({'postgresql': POSTGRES_REVERSE}),
+        ),
+        migrations.RunPython(backfill_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:31
+
+from django.db import migrations, models
+
+
+def build_map(rows, duration_seconds=None):
+    """
+    rows: (start_seconds, topic_id, code, title) ya ordenadas.
+
+    Copia CONGELADA de core.chapters.build_map tal como era al crear esta
+    migración: no debe seguir los cambios del módulo (ni importarlo, que
+    carga los modelos actuales). ChapterMapTests comprueba que hoy ambas dan
+    el mismo resultado.
+    """
+    starts = [start for start, _, _, _ in rows]
+    return {
+        'starts': starts,
+        'ends': (starts[1:] + [duration_seconds]) if starts else [],
+        'topics': [topic_id for _, topic_id, _, _ in rows],
+        'codes': [code for _, _, code, _ in rows],
+        'titles': [title for _, _, _, title in rows],
+    }
+
+
+def build_existing_maps(apps, schema_editor):
+    """Mapa de capítulos de cada video con sus temas publicados."""
+    VideoAsset = apps.get_model('core', 'VideoAsset')
+    Topic = apps.get_model('core', 'Topic')
+    rows = {}
+    topics = Topic.objects.filter(is_published=True).order_by(
+        'video_id', 'start_seconds', 'sort_key', 'code'
+    ).values_list('video_id', 'start_seconds', 'pk', 'code', 'title')
+    for video_id, *row in topics.iterator(chunk_size=2000):
+        rows.setdefault(video_id, []).append(tuple(row))
+    videos = []
+    for video in VideoAsset.objects.only('pk', 'duration_seconds').iterator(chunk_size=500):
+        video.chapter_map = build_map(rows.get(video.pk, []), video.duration_seconds)
+        videos.append(video)
+    VideoAsset.objects.bulk_update(videos, ['chapter_map'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_searchtrigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoasset',
+            name='chapter_map',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Inicio, fin y tema de cada capítulo, mantenido por core.chapters', verbose_name='Capítulos'),
+        ),
+        migrations.RunPython(build_existing_maps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE core_transcriptchunk ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('spanish', coalesce(text, ''))) STORED
+    """,
+    "CREATE INDEX core_transcriptchunk_vector_gin ON core_transcriptchunk USING gin (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS core_transcriptchunk_vector_gin",
+    "ALTER TABLE core_transcriptchunk DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_transcriptchunk_fts USING fts5(
+        text, content='core_transcriptchunk', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER core_transcriptchunk_ai AFTER INSERT ON core_transcriptchunk BEGIN
+        INSERT INTO core_transcriptchunk_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER core_transcriptchunk_ad AFTER DELETE ON core_transcriptchunk BEGIN
+        INSERT INTO core_transcriptchunk_fts(core_transcriptchunk_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER core_transcriptchunk_au AFTER UPDATE ON core_transcriptchunk BEGIN
+        INSERT INTO core_transcriptchunk_fts(core_transcriptchunk_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO core_transcriptchunk_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_transcriptchunk_au",
+    "DROP TRIGGER IF EXISTS core_transcriptchunk_ad",
+    "DROP TRIGGER IF EXISTS core_transcriptchunk_ai",
+    "DROP TABLE IF EXISTS core_transcriptchunk_fts",
+]
+
+
+def run_vendor_sql(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_videoasset_chapter_map'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transcript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(default='es', max_length=10, verbose_name='Idioma')),
+                ('starts', models.JSONField(default=list, verbose_name='Inicios (ms)')),
+                ('ends', models.JSONField(default=list, verbose_name='Fines (ms)')),
+                ('text', models.TextField(blank=True, verbose_name='Texto (un segmento por línea)')),
+                ('source_name', models.CharField(blank=True, max_length=255, verbose_name='Archivo de origen')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transcripts', to='core.videoasset', verbose_name='Video')),
+            ],
+            options={
+                'verbose_name': 'Transcripción',
+                'verbose_name_plural': 'Transcripciones',
+                'unique_together': {('video', 'language')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TranscriptChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_segment', models.PositiveIntegerField()),
+                ('text', models.TextField()),
+                ('transcript', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='core.transcript', verbose_name='Transcripción')),
+            ],
+            options={
+                'verbose_name': 'Bloque de transcripción',
+                'verbose_name_plural': 'Bloques de transcripción',
+                'unique_together': {('transcript', 'first_segment')},
+            },
+        ),
+        migrations.RunPython(
+            run_vendor_sql({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run_vendor_sql({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
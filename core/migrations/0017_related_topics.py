@@ -0,0 +1,27 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_transcripts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedTopicSet',
+            fields=[
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='related_set', serialize=False, to='core.topic', verbose_name='Tema')),
+                ('signature', models.CharField(max_length=32, verbose_name='Firma')),
+                ('neighbours', models.JSONField(default=dict, verbose_name='Temas relacionados')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculado')),
+            ],
+            options={
+                'verbose_name': 'Temas relacionados',
+                'verbose_name_plural': 'Temas relacionados',
+            },
+        ),
+    ]
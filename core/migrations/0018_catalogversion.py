@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:55
+
+from django.db import migrations, models
+
+
+def seed_version(apps, schema_editor):
+    """La fila que core.snapshot.touch() incrementa (pk=CATALOG_VERSION_PK)."""
+    CatalogVersion = apps.get_model('core', 'CatalogVersion')
+    CatalogVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_related_topics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Versión')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Versión del catálogo',
+                'verbose_name_plural': 'Versión del catálogo',
+            },
+        ),
+        migrations.RunPython(seed_version, migrations.RunPython.noop),
+    ]
@@ -9,10 +9,37 @@ Arquitectura de Datos:
 - Quiz: Evaluaciones que pueden agrupar múltiples Topics
 """
 
+import re
+
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.urls import reverse
 
+from .markup import render_description
+
+
+SORT_KEY_SEGMENT_WIDTH = 6
+SORT_KEY_PART_RE = re.compile(r'\d+|\D+')
+
+
+def make_sort_key(code):
+    """
+    Convierte un código jerárquico en una clave ordenable lexicográficamente.
+    Cada segmento numérico se rellena con ceros, así el orden de texto
+    coincide con el orden numérico:
+      '1.2'  -> '000001.000002'   (antes de '1.13' -> '000001.000013')
+      '10.1' -> '000010.000001'   (después de '2.1' -> '000002.000001')
+    Los segmentos no numéricos se conservan en minúsculas ('1.2a' -> '000001.000002a').
+    """
+    segments = []
+    for segment in code.strip().split('.'):
+        parts = SORT_KEY_PART_RE.findall(segment)
+        segments.append(''.join(
+            part.zfill(SORT_KEY_SEGMENT_WIDTH) if part.isdigit() else part.lower()
+            for part in parts
+        ))
+    return '.'.join(segments)
+
 
 class Category(models.Model):
     """
@@ -44,6 +71,19 @@ class Category(models.Model):
         help_text="Orden de visualización (menor = primero)",
         verbose_name="Orden"
     )
+    topic_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Temas",
+        help_text="Contador mantenido por core.counters"
+    )
+    published_topic_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Temas publicados",
+        help_text="Contador mantenido por core.counters"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Categoría"
@@ -97,6 +137,32 @@ class VideoAsset(models.Model):
         blank=True,
         verbose_name="Descripción del Video"
     )
+    topic_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Temas",
+        help_text="Contador mantenido por core.counters"
+    )
+    published_topic_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Temas publicados",
+        help_text="Contador mantenido por core.counters"
+    )
+    metadata_checked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Metadatos consultados",
+        help_text="Última consulta a la plataforma (comando fetch_video_metadata)"
+    )
+    chapter_map = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Capítulos",
+        help_text="Inicio, fin y tema de cada capítulo, mantenido por core.chapters"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -173,6 +239,42 @@ class VideoAsset(models.Model):
         return ""
 
 
+class CourseOrderQuerySet(models.QuerySet):
+    """
+    Orden de curso para modelos con sort_key, code e is_published
+    (Topic y sus tablas desnormalizadas).
+    """
+    
+    def published(self):
+        return self.filter(is_published=True)
+    
+    def in_course_order(self):
+        """Orden secuencial del curso (numérico por segmento)."""
+        return self.order_by('sort_key', 'code')
+    
+    def after(self, sort_key, code, inclusive=False):
+        """Filas posteriores a (sort_key, code) en orden de curso."""
+        lookup = 'code__gte' if inclusive else 'code__gt'
+        return self.filter(models.Q(sort_key__gt=sort_key) | models.Q(sort_key=sort_key, **{lookup: code}))
+    
+    def before(self, sort_key, code):
+        """Filas anteriores a (sort_key, code) en orden de curso."""
+        return self.filter(models.Q(sort_key__lt=sort_key) | models.Q(sort_key=sort_key, code__lt=code))
+
+
+class TopicQuerySet(CourseOrderQuerySet):
+    """QuerySet de Topic con consultas sobre la jerarquía de códigos."""
+    
+    def subtree(self, code):
+        """
+        El código y todos sus descendientes ("2" -> 2, 2.1, 2.15, 2.1.3...).
+        Es un único rango sobre el índice de sort_key: [clave, clave + '/'),
+        ya que '/' es el carácter siguiente a '.' en ASCII.
+        """
+        prefix = make_sort_key(code)
+        return self.filter(sort_key__gte=prefix, sort_key__lt=prefix + '/')
+
+
 class Topic(models.Model):
     """
     LA UNIDAD CENTRAL del sistema.
@@ -203,6 +305,13 @@ class Topic(models.Model):
         verbose_name="Código",
         help_text="Código del tema (ej: '1.13', '2.15') para ordenamiento secuencial"
     )
+    sort_key = models.CharField(
+        max_length=160,
+        editable=False,
+        default='',
+        verbose_name="Clave de orden",
+        help_text="Derivada del código al guardar (ver make_sort_key)"
+    )
     title = models.CharField(
         max_length=200,
         verbose_name="Título del Tema",
@@ -232,6 +341,19 @@ class Topic(models.Model):
         verbose_name="Descripción",
         help_text="Notas, instrucciones, contexto. Soporta Markdown."
     )
+    description_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Descripción (HTML)",
+        help_text="Markdown ya convertido y saneado (core.markup)"
+    )
+    description_excerpt = models.CharField(
+        max_length=300,
+        blank=True,
+        editable=False,
+        verbose_name="Extracto",
+        help_text="Texto plano para los listados (core.markup)"
+    )
     location_tag = models.CharField(
         max_length=20,
         choices=LOCATION_CHOICES,
@@ -247,18 +369,35 @@ class Topic(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TopicQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Tema"
         verbose_name_plural = "Temas"
-        ordering = ['code']
+        ordering = ['sort_key', 'code']
         indexes = [
-            models.Index(fields=['code']),
-            models.Index(fields=['category', 'code']),
+            models.Index(fields=['sort_key', 'code']),
+            models.Index(fields=['is_published', 'sort_key']),
+            models.Index(fields=['category', 'sort_key']),
+            models.Index(fields=['video', 'start_seconds']),
         ]
     
     def __str__(self):
         return f"{self.code} - {self.title}"
     
+    def save(self, *args, **kwargs):
+        self.sort_key = make_sort_key(self.code)
+        render_description(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'code' in update_fields:
+                update_fields.add('sort_key')
+            if 'description' in update_fields:
+                update_fields.update(('description_html', 'description_excerpt'))
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+    
     def get_absolute_url(self):
         """URL canónica del tema."""
         return reverse('topic_detail', kwargs={'code': self.code})
@@ -294,25 +433,13 @@ class Topic(models.Model):
         Obtiene el siguiente tema en el orden secuencial por código.
         Útil para navegación tipo curso.
         """
-        try:
-            return Topic.objects.filter(
-                code__gt=self.code,
-                is_published=True
-            ).order_by('code').first()
-        except Topic.DoesNotExist:
-            return None
+        return Topic.objects.published().after(self.sort_key, self.code).in_course_order().first()
     
     def get_previous_topic(self):
         """
         Obtiene el tema anterior en el orden secuencial por código.
         """
-        try:
-            return Topic.objects.filter(
-                code__lt=self.code,
-                is_published=True
-            ).order_by('-code').first()
-        except Topic.DoesNotExist:
-            return None
+        return Topic.objects.published().before(self.sort_key, self.code).order_by('-sort_key', '-code').first()
 
 
 class Tag(models.Model):
@@ -336,6 +463,19 @@ class Tag(models.Model):
         blank=True,
         verbose_name="Temas"
     )
+    topic_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Temas",
+        help_text="Contador mantenido por core.counters"
+    )
+    published_topic_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Temas publicados",
+        help_text="Contador mantenido por core.counters"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Tag"
@@ -346,8 +486,8 @@ class Tag(models.Model):
         return self.name
     
     def get_topic_count(self):
-        """Retorna el número de temas asociados a este tag."""
-        return self.topics.count()
+        """Retorna el número de temas asociados a este tag (contador desnormalizado)."""
+        return self.topic_count
 
 
 class Quiz(models.Model):
@@ -384,6 +524,25 @@ class Quiz(models.Model):
         default=True,
         verbose_name="Activo"
     )
+    
+    # Estadísticas cacheadas (las mantiene core.quiz_stats)
+    stats_total_duration_seconds = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Duración total de videos (s)",
+        help_text="Suma de la duración de los videos distintos de sus temas"
+    )
+    stats_segment_seconds = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Duración de los segmentos (s)",
+        help_text="Suma de lo que dura cada tema dentro de su video"
+    )
+    stats_topic_count = models.PositiveIntegerField(default=0, editable=False)
+    stats_category_count = models.PositiveIntegerField(default=0, editable=False)
+    stats_topic_codes = models.TextField(blank=True, editable=False)
+    stats_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -397,17 +556,353 @@ class Quiz(models.Model):
     
     def get_topic_codes(self):
         """
-        Retorna una lista de códigos de los temas asociados.
+        Retorna una lista de códigos de los temas asociados (cacheada).
         Ej: ['1.11', '1.12', '1.13']
         """
-        return list(self.topics.values_list('code', flat=True).order_by('code'))
+        return self.stats_topic_codes.split(',') if self.stats_topic_codes else []
     
     def get_total_duration_seconds(self):
         """
-        Calcula la duración total estimada basada en los videos de los topics.
+        Duración total estimada: suma de los videos distintos de sus temas
+        (un video compartido por varios temas cuenta una sola vez).
         """
-        total = 0
-        for topic in self.topics.all():
-            if topic.video.duration_seconds:
-                total += topic.video.duration_seconds
-        return total
+        return self.stats_total_duration_seconds
+
+
+class SearchDocument(models.Model):
+    """
+    Documento de búsqueda desnormalizado (uno por Topic).
+    Lo mantiene core.search; el índice full-text real vive en la base de datos:
+      - PostgreSQL: columna generada `search_vector` (tsvector) con índice GIN
+      - SQLite: tabla virtual FTS5 sincronizada por triggers
+    Pesos: code (A) > title (B) > tags (C) > body (D).
+    """
+    topic = models.OneToOneField(
+        Topic,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name="Tema"
+    )
+    code = models.CharField(max_length=20)
+    title = models.CharField(max_length=200)
+    tags = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    is_published = models.BooleanField(default=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Documento de Búsqueda"
+        verbose_name_plural = "Documentos de Búsqueda"
+    
+    def __str__(self):
+        return f"SearchDocument({self.code})"
+
+
+class CourseSequenceEntry(models.Model):
+    """
+    Secuencia materializada del curso: posición y vecinos (anterior/siguiente)
+    de cada Topic publicado, global y dentro de su Categoría.
+    La mantiene core.sequence; TopicDetailView la lee con select_related, así
+    la navegación prev/next no necesita consultas adicionales.
+    """
+    topic = models.OneToOneField(
+        Topic,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sequence',
+        verbose_name="Tema"
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Categoría"
+    )
+    sort_key = models.CharField(max_length=160)
+    code = models.CharField(max_length=20)
+    position = models.PositiveIntegerField(verbose_name="Posición global")
+    category_position = models.PositiveIntegerField(verbose_name="Posición en la categoría")
+    prev_topic = models.ForeignKey(
+        Topic, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    next_topic = models.ForeignKey(
+        Topic, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    category_prev_topic = models.ForeignKey(
+        Topic, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    category_next_topic = models.ForeignKey(
+        Topic, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Entrada de Secuencia"
+        verbose_name_plural = "Secuencia del Curso"
+        ordering = ['position']
+        indexes = [
+            models.Index(fields=['sort_key', 'code']),
+            models.Index(fields=['category', 'sort_key', 'code']),
+            models.Index(fields=['position']),
+            models.Index(fields=['category', 'category_position']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.position} {self.code}"
+
+
+class TopicPayload(models.Model):
+    """
+    Representación JSON pre-serializada de un Topic para la API (core.api).
+    La mantiene core.payloads al guardar el tema o lo que muestra (categoría,
+    video, tags); los listados concatenan `data` sin serializar nada.
+    Copia code, sort_key, categoría e is_published para filtrar y paginar
+    sin unir con Topic.
+    """
+    topic = models.OneToOneField(
+        Topic,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='payload',
+        verbose_name="Tema"
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Categoría"
+    )
+    code = models.CharField(max_length=20)
+    sort_key = models.CharField(max_length=160)
+    is_published = models.BooleanField(default=True)
+    data = models.TextField(verbose_name="JSON")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CourseOrderQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = "Payload de la API"
+        verbose_name_plural = "Payloads de la API"
+        indexes = [
+            models.Index(fields=['is_published', 'sort_key', 'code']),
+            models.Index(fields=['category', 'is_published', 'sort_key', 'code']),
+        ]
+    
+    def __str__(self):
+        return f"TopicPayload({self.code})"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Registro de cambios para la sincronización incremental (core.changelog).
+    El id autoincremental es la versión: un dispositivo pide los cambios con
+    id mayor que la última versión que vio. Los borrados quedan como
+    'delete' (tombstone). Para temas se guardan la ubicación y la categoría
+    del momento, y así filtrar el feed por dispositivo.
+    """
+    MODEL_CHOICES = [
+        ('category', 'Categoría'),
+        ('video', 'Video'),
+        ('topic', 'Tema'),
+        ('tag', 'Tag'),
+        ('quiz', 'Quiz'),
+    ]
+    ACTION_CHOICES = [
+        ('upsert', 'Creado/actualizado'),
+        ('delete', 'Borrado'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES, default='upsert')
+    # Sólo para temas (sin FK: el tombstone sobrevive al borrado)
+    location_tag = models.CharField(max_length=20, blank=True)
+    category_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Cambio"
+        verbose_name_plural = "Registro de cambios"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['model', 'object_id']),
+        ]
+    
+    def __str__(self):
+        return f"v{self.pk} {self.action} {self.model}#{self.object_id}"
+
+
+class VideoThumbnail(models.Model):
+    """
+    Miniatura descargada una vez de la plataforma del video (core.thumbnails).
+    Las variantes redimensionadas (WebP y JPEG) se guardan en MEDIA_ROOT con
+    el hash del contenido en el nombre, así se sirven como inmutables.
+    start_seconds es 0 para el póster del video; las plataformas que generan
+    cuadros por tiempo tienen además una fila por segundo de inicio de tema.
+    """
+    video = models.ForeignKey(
+        VideoAsset,
+        on_delete=models.CASCADE,
+        related_name='thumbnails',
+        verbose_name="Video"
+    )
+    start_seconds = models.PositiveIntegerField(default=0, verbose_name="Segundo")
+    digest = models.CharField(
+        max_length=16,
+        blank=True,
+        verbose_name="Hash",
+        help_text="Hash del contenido (vacío si la descarga falló)"
+    )
+    source_url = models.URLField(max_length=500, verbose_name="URL de origen")
+    error = models.CharField(max_length=200, blank=True, verbose_name="Error")
+    fetched_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Miniatura"
+        verbose_name_plural = "Miniaturas"
+        unique_together = ['video', 'start_seconds']
+    
+    def __str__(self):
+        return f"Miniatura de {self.video_id} @ {self.start_seconds}s"
+
+
+class SearchTrigram(models.Model):
+    """
+    Índice de trigramas para la búsqueda tolerante a errores (core.fuzzy) en
+    motores sin pg_trgm (SQLite): una fila por trigrama distinto del título
+    de cada tema o del nombre de cada tag. En PostgreSQL queda vacía (se usan
+    índices GIN gin_trgm_ops sobre las columnas originales).
+    """
+    KIND_CHOICES = [
+        ('topic', 'Tema'),
+        ('tag', 'Tag'),
+    ]
+    
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    # Sin FK: la misma tabla sirve para temas y tags (core.fuzzy borra las filas)
+    object_id = models.BigIntegerField()
+    gram = models.CharField(max_length=3)
+    # Trigramas distintos del texto (para calcular la similitud en SQL)
+    gram_count = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        verbose_name = "Trigrama de búsqueda"
+        verbose_name_plural = "Trigramas de búsqueda"
+        indexes = [
+            # Cubre la consulta de core.fuzzy (no lee la tabla)
+            models.Index(fields=['kind', 'gram', 'object_id', 'gram_count']),
+            models.Index(fields=['object_id', 'kind']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind}#{self.object_id} '{self.gram}'"
+
+
+class Transcript(models.Model):
+    """
+    Transcripción con tiempos de un video (core.transcripts), importada de
+    WebVTT o SRT. Compacta: el texto de los segmentos va en `text`, uno por
+    línea, y sus tiempos en dos arrays paralelos (milisegundos); el segmento
+    i es la línea i. Sin una fila por subtítulo.
+    """
+    video = models.ForeignKey(
+        VideoAsset,
+        on_delete=models.CASCADE,
+        related_name='transcripts',
+        verbose_name="Video"
+    )
+    language = models.CharField(max_length=10, default='es', verbose_name="Idioma")
+    starts = models.JSONField(default=list, verbose_name="Inicios (ms)")
+    ends = models.JSONField(default=list, verbose_name="Fines (ms)")
+    text = models.TextField(blank=True, verbose_name="Texto (un segmento por línea)")
+    source_name = models.CharField(max_length=255, blank=True, verbose_name="Archivo de origen")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Transcripción"
+        verbose_name_plural = "Transcripciones"
+        unique_together = ['video', 'language']
+    
+    def __str__(self):
+        return f"Transcripción {self.language} de {self.video_id}"
+    
+    @property
+    def segment_count(self):
+        return len(self.starts)
+
+
+class TranscriptChunk(models.Model):
+    """
+    Índice de búsqueda de las transcripciones: bloques de segmentos
+    consecutivos (CHUNK_SECONDS de core.transcripts). La mantiene
+    core.transcripts; el índice full-text vive en la base de datos como el
+    de SearchDocument (tsvector + GIN en PostgreSQL, FTS5 en SQLite).
+    """
+    transcript = models.ForeignKey(
+        Transcript,
+        on_delete=models.CASCADE,
+        related_name='chunks',
+        verbose_name="Transcripción"
+    )
+    first_segment = models.PositiveIntegerField()
+    text = models.TextField()
+    
+    class Meta:
+        verbose_name = "Bloque de transcripción"
+        verbose_name_plural = "Bloques de transcripción"
+        unique_together = ['transcript', 'first_segment']
+    
+    def __str__(self):
+        return f"{self.transcript_id}#{self.first_segment}"
+
+
+class RelatedTopicSet(models.Model):
+    """
+    "Ver también" de un Topic publicado: sus temas más parecidos en orden,
+    como arrays paralelos (con código y título, así la página no consulta
+    los temas):
+
+        {"topics": [14, 9], "codes": ["1.3", "2.1"],
+         "titles": ["Cierre", "Arqueo"], "scores": [0.61, 0.42]}
+
+    Lo calcula core.related (TF-IDF y tags que suelen ir juntos);
+    `signature` es la huella del texto y tags con que se calculó, para
+    recalcular sólo lo que cambió. TopicDetailView lo lee con select_related.
+    """
+    topic = models.OneToOneField(
+        Topic,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='related_set',
+        verbose_name="Tema"
+    )
+    signature = models.CharField(max_length=32, verbose_name="Firma")
+    neighbours = models.JSONField(default=dict, verbose_name="Temas relacionados")
+    computed_at = models.DateTimeField(verbose_name="Calculado")
+    
+    class Meta:
+        verbose_name = "Temas relacionados"
+        verbose_name_plural = "Temas relacionados"
+    
+    def __str__(self):
+        return f"Relacionados de {self.topic_id}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Sello de versión del catálogo publicado: una sola fila cuyo número sube
+    con cada cambio de contenido (core.snapshot.touch). Cada proceso lo
+    compara con el de su snapshot en memoria para saber si sigue al día.
+    """
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Versión")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Versión del catálogo"
+        verbose_name_plural = "Versión del catálogo"
+    
+    def __str__(self):
+        return f"Catálogo v{self.version}"
@@ -0,0 +1,170 @@
+"""
+Paginación por cursor (keyset)
+===============================
+Los listados en orden de curso se paginan buscando desde el último tema
+visto, sobre el índice (sort_key, code), en lugar de COUNT(*) + OFFSET n:
+cualquier página cuesta lo mismo que la primera.
+
+Parámetros de la URL:
+- ?after=<cursor>   página siguiente (temas posteriores al cursor)
+- ?before=<cursor>  página anterior (temas previos al cursor)
+- ?code=<código>    salta directamente al tema con ese código (o al siguiente)
+
+Los cursores son opacos (base64 de sort_key + code).
+
+Con el snapshot del catálogo (core.snapshot) los listados ya están en
+memoria y ordenados: SortedTopicsPaginator hace la misma búsqueda con
+bisect sobre sus claves, sin consultas.
+"""
+
+import base64
+import binascii
+import bisect
+
+from .models import make_sort_key
+from .snapshot import SortedTopics
+
+
+CURSOR_SEPARATOR = '\x1f'
+
+
+def encode_cursor(topic):
+    raw = f'{topic.sort_key}{CURSOR_SEPARATOR}{topic.code}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(sort_key, code) del cursor, o None si no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    sort_key, separator, code = raw.partition(CURSOR_SEPARATOR)
+    return (sort_key, code) if separator else None
+
+
+class KeysetPage:
+    """Una página de temas con los cursores de sus vecinas."""
+
+    def __init__(self, object_list, has_next, has_previous, total=None):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next_page else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous_page else None
+
+
+class KeysetPaginator:
+    """
+    Pagina un queryset de Topic en orden de curso. `total` es opcional y
+    aproximado (ej: contadores desnormalizados); nunca se hace COUNT(*).
+    """
+
+    def __init__(self, queryset, per_page, total=None):
+        self.queryset = queryset.order_by('sort_key', 'code')
+        self.per_page = per_page
+        self.total = total
+
+    def page(self, after=None, before=None, code=None):
+        """Una consulta (dos al saltar a un código: ¿hay temas antes?)."""
+        size = self.per_page
+        if before and (position := decode_cursor(before)):
+            return self._backwards(self.queryset.before(*position), has_next=True)
+
+        if code:
+            position = (make_sort_key(code), code)
+            rows = list(self.queryset.after(*position, inclusive=True)[:size + 1])
+            if not rows:
+                # El código está después del último tema: mostrar la última página
+                return self._backwards(self.queryset, has_next=False)
+            has_previous = self.queryset.before(*position).exists()
+        elif after and (position := decode_cursor(after)):
+            rows = list(self.queryset.after(*position)[:size + 1])
+            has_previous = True
+        else:
+            rows = list(self.queryset[:size + 1])
+            has_previous = False
+        return KeysetPage(rows[:size], len(rows) > size, has_previous, self.total)
+
+    def _backwards(self, queryset, has_next):
+        rows = list(queryset.order_by('-sort_key', '-code')[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        return KeysetPage(rows[:self.per_page][::-1], has_next, has_previous, self.total)
+
+
+class SortedTopicsPaginator:
+    """Igual que KeysetPaginator pero sobre un core.snapshot.SortedTopics."""
+
+    def __init__(self, topics, per_page, total=None):
+        self.topics = topics
+        self.per_page = per_page
+        self.total = len(topics) if total is None else total
+
+    def page(self, after=None, before=None, code=None):
+        size = self.per_page
+        keys = self.topics.keys
+        if before and (position := decode_cursor(before)):
+            end = bisect.bisect_left(keys, position)
+            return self._slice(max(0, end - size), end, has_next=True)
+
+        if code:
+            start = bisect.bisect_left(keys, (make_sort_key(code), code))
+            if start == len(keys):
+                # El código está después del último tema: mostrar la última página
+                return self._slice(max(0, start - size), start, has_next=False)
+        elif after and (position := decode_cursor(after)):
+            start = bisect.bisect_right(keys, position)
+        else:
+            start = 0
+        return self._slice(start, start + size, has_next=start + size < len(keys))
+
+    def _slice(self, start, end, has_next):
+        return KeysetPage(list(self.topics[start:end]), has_next, start > 0, self.total)
+
+
+class KeysetPaginationMixin:
+    """
+    Para ListView en orden de curso: reemplaza la paginación por offset.
+    El contexto conserva page_obj / is_paginated; `page_obj.total` es el
+    total aproximado de get_approximate_total().
+    """
+    paginator_class = KeysetPaginator
+
+    def get_approximate_total(self):
+        return None
+
+    def get_paginator_class(self, queryset):
+        return SortedTopicsPaginator if isinstance(queryset, SortedTopics) else self.paginator_class
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator_class = self.get_paginator_class(queryset)
+        paginator = paginator_class(queryset, page_size, total=self.get_approximate_total())
+        params = self.request.GET
+        page = paginator.page(
+            after=params.get('after'),
+            before=params.get('before'),
+            code=params.get('code', '').strip(),
+        )
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,122 @@
+"""
+Payloads JSON de Topic
+=======================
+Cada Topic tiene su representación para la API ya serializada en
+TopicPayload.data. La API arma los listados concatenando esos textos, sin
+serializar por request.
+
+- refresh_topics(ids): regenera los payloads indicados; sólo escribe (y
+  mueve updated_at, que alimenta el ETag) los que realmente cambiaron.
+- rebuild(): todos los topics (comando rebuild_api_payloads).
+- Los signals llaman a refresh_topics cuando cambia un Topic, su categoría,
+  su video o sus tags.
+- Cada payload que cambia queda en el registro de cambios (core.changelog),
+  con tombstone si el tema dejó de verse en su ubicación/categoría.
+"""
+
+import json
+
+from django.db.models import Prefetch
+from django.urls import reverse
+from django.utils import timezone
+
+from . import changelog
+from .models import Tag, Topic, TopicPayload
+
+
+PAYLOAD_FIELDS = (
+    'id', 'code', 'title', 'url', 'category', 'video', 'start_seconds', 'timestamp',
+    'embed_url', 'watch_url', 'location_tag', 'description', 'tags', 'is_published',
+    'updated_at',
+)
+
+
+def build_payload(topic):
+    """Dict del topic (con category, video y tags ya cargados)."""
+    video = topic.video
+    return {
+        'id': topic.pk,
+        'code': topic.code,
+        'title': topic.title,
+        'url': reverse('core:topic_detail', kwargs={'code': topic.code}),
+        'category': {'slug': topic.category.slug, 'name': topic.category.name},
+        'video': {
+            'platform': video.platform,
+            'external_id': video.external_id,
+            'title': video.title,
+            'duration_seconds': video.duration_seconds,
+        },
+        'start_seconds': topic.start_seconds,
+        'timestamp': topic.get_formatted_timestamp(),
+        'embed_url': video.get_embed_url(start_seconds=topic.start_seconds),
+        'watch_url': video.get_watch_url(start_seconds=topic.start_seconds),
+        'location_tag': topic.location_tag,
+        'description': topic.description,
+        'tags': sorted(tag.name for tag in topic.tags.all()),
+        'is_published': topic.is_published,
+        'updated_at': topic.updated_at.isoformat(),
+    }
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def sync_scope(location_tag, category_id, is_published):
+    """Ubicación y categoría con que el tema se sincroniza (None: no se publica)."""
+    return (location_tag, category_id) if is_published else None
+
+
+def refresh_topics(topic_ids, batch_size=500):
+    """Regenera los payloads de esos topics. Retorna cuántos cambiaron."""
+    topic_ids = list(topic_ids)
+    changed = 0
+    for start in range(0, len(topic_ids), batch_size):
+        chunk = topic_ids[start:start + batch_size]
+        topics = Topic.objects.filter(pk__in=chunk).select_related('category', 'video').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('pk', 'name'))
+        )
+        existing = TopicPayload.objects.in_bulk(chunk)
+        now = timezone.now()
+        to_create, to_update, logged = [], [], []
+        for topic in topics:
+            payload = TopicPayload(
+                topic_id=topic.pk,
+                category_id=topic.category_id,
+                code=topic.code,
+                sort_key=topic.sort_key,
+                is_published=topic.is_published,
+                data=dumps(build_payload(topic)),
+                updated_at=now,
+            )
+            current = existing.get(topic.pk)
+            scope = sync_scope(topic.location_tag, topic.category_id, topic.is_published)
+            if current is None:
+                to_create.append(payload)
+                logged.append((topic.pk, None, scope))
+            elif (current.data, current.category_id, current.is_published) != (
+                payload.data, payload.category_id, payload.is_published
+            ):
+                to_update.append(payload)
+                previous = sync_scope(
+                    json.loads(current.data)['location_tag'], current.category_id, current.is_published
+                )
+                logged.append((topic.pk, previous, scope))
+        TopicPayload.objects.bulk_create(to_create)
+        TopicPayload.objects.bulk_update(
+            to_update, ['category', 'code', 'sort_key', 'is_published', 'data', 'updated_at']
+        )
+        changelog.record_topics(logged)
+        changed += len(to_create) + len(to_update)
+    return changed
+
+
+def rebuild(batch_size=500):
+    """Regenera todos los payloads. Retorna cuántos cambiaron."""
+    return refresh_topics(Topic.objects.values_list('pk', flat=True), batch_size=batch_size)
+
+
+def select_fields(data, fields):
+    """Texto JSON de un payload reducido a `fields` (en ese orden)."""
+    payload = json.loads(data)
+    return dumps({name: payload[name] for name in fields})
@@ -0,0 +1,122 @@
+"""
+Estadísticas de Quiz
+=====================
+Calcula y cachea en cada Quiz (campos stats_*):
+
+- duración total: suma de `duration_seconds` de los videos DISTINTOS de sus temas
+- duración de segmentos: lo que dura cada tema dentro de su video
+  (hasta el siguiente tema del mismo video, o hasta el final del video)
+- número de temas, número de categorías y códigos en orden de curso
+
+Todo sale de un aggregate por lote de quizzes (más una consulta para los
+códigos), en lugar de recorrer topic.video en Python. El admin y cualquier
+listado leen los campos cacheados sin consultas adicionales.
+"""
+
+from collections import defaultdict
+
+from django.db.models import Count, Exists, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Quiz, Topic, VideoAsset
+
+
+QuizTopic = Quiz.topics.through
+
+STATS_FIELDS = [
+    'stats_total_duration_seconds',
+    'stats_segment_seconds',
+    'stats_topic_count',
+    'stats_category_count',
+    'stats_topic_codes',
+    'stats_updated_at',
+]
+
+
+def _sum_subquery(queryset, expression):
+    """SUM(expression) de un queryset como subconsulta escalar (0 si está vacío)."""
+    total = queryset.annotate(group=Value(1)).values('group').annotate(
+        total=Sum(expression)
+    ).values('total')
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+
+def segment_end():
+    """Inicio del siguiente tema del mismo video, o el final del video."""
+    next_start = Topic.objects.filter(
+        video=OuterRef('video'),
+        start_seconds__gt=OuterRef('start_seconds'),
+    ).order_by('start_seconds').values('start_seconds')[:1]
+    return Coalesce(
+        Subquery(next_start, output_field=IntegerField()),
+        F('video__duration_seconds'),
+        output_field=IntegerField(),
+    )
+
+
+def stats_queryset(quiz_ids):
+    """Un solo SELECT con todas las estadísticas numéricas de los quizzes."""
+    videos = VideoAsset.objects.filter(
+        Exists(QuizTopic.objects.filter(
+            quiz_id=OuterRef(OuterRef('pk')),
+            topic__video=OuterRef('pk'),
+        ))
+    )
+    segments = Topic.objects.filter(quizzes=OuterRef('pk')).annotate(
+        segment=Greatest(
+            ExpressionWrapper(segment_end() - F('start_seconds'), output_field=IntegerField()),
+            Value(0),
+        )
+    )
+    return Quiz.objects.filter(pk__in=quiz_ids).annotate(
+        total_duration=_sum_subquery(videos, 'duration_seconds'),
+        segment_duration=_sum_subquery(segments, 'segment'),
+        topic_total=Count('topics', distinct=True),
+        category_total=Count('topics__category', distinct=True),
+    ).values_list('pk', 'total_duration', 'segment_duration', 'topic_total', 'category_total')
+
+
+def refresh_quiz_stats(quiz_ids):
+    """Recalcula y guarda las estadísticas de los quizzes indicados."""
+    quiz_ids = list(set(quiz_ids))
+    if not quiz_ids:
+        return 0
+    codes = defaultdict(list)
+    rows = Topic.objects.filter(quizzes__in=quiz_ids).in_course_order().values_list(
+        'quizzes', 'code'
+    )
+    for quiz_id, code in rows:
+        codes[quiz_id].append(code)
+
+    now = timezone.now()
+    quizzes = []
+    for pk, total, segments, topic_total, category_total in stats_queryset(quiz_ids):
+        quizzes.append(Quiz(
+            pk=pk,
+            stats_total_duration_seconds=total,
+            stats_segment_seconds=segments,
+            stats_topic_count=topic_total,
+            stats_category_count=category_total,
+            stats_topic_codes=','.join(codes[pk]),
+            stats_updated_at=now,
+        ))
+    Quiz.objects.bulk_update(quizzes, STATS_FIELDS)
+    return len(quizzes)
+
+
+def quizzes_for_videos(video_ids):
+    """Ids de los quizzes con algún tema en esos videos."""
+    video_ids = [pk for pk in video_ids if pk is not None]
+    if not video_ids:
+        return []
+    return list(
+        QuizTopic.objects.filter(topic__video__in=video_ids)
+        .values_list('quiz_id', flat=True).distinct()
+    )
+
+
+def refresh_all():
+    """Recalcula todos los quizzes. Retorna cuántos se actualizaron."""
+    return refresh_quiz_stats(Quiz.objects.values_list('pk', flat=True))
+
@@ -0,0 +1,302 @@
+"""
+Temas relacionados ("Ver también")
+===================================
+Para cada Topic publicado, sus RELATED_TOPICS_LIMIT temas más parecidos,
+guardados en RelatedTopicSet (TopicDetailView lo lee con select_related).
+
+Cada tema es un vector disperso (scipy.sparse) con dos partes:
+
+- Texto: TF-IDF (tf logarítmico, idf suavizado) de las palabras del título
+  (peso TITLE_WEIGHT), de los nombres de sus tags (TAG_NAME_WEIGHT) y de la
+  descripción, sin tildes ni palabras vacías.
+- Tags que suelen ir juntos: la co-ocurrencia de tags (T'T, normalizada
+  como coseno y recortada a los CO_TAGS más cercanos de cada tag)
+  proyectada sobre los tags del tema. Dos temas sin tags en común pero con
+  tags que aparecen juntos en el catálogo también se parecen.
+
+Ambas partes se normalizan y se unen con pesos TEXT_WEIGHT / 1 - TEXT_WEIGHT,
+así el producto punto de dos filas es su similitud. Los vecinos salen por
+lotes de BATCH_SIZE filas: un producto de matrices dispersas contra todo el
+catálogo y argpartition por fila, sin comparar pares en Python.
+
+Las columnas de un solo tema o de más de MAX_DOC_FREQ temas (o MAX_DF del
+total) se descartan: no distinguen y son las que vuelven denso el producto.
+
+Recalcular (comando refresh_related_topics):
+- Completo (--full, de noche): todas las filas; se escriben sólo las que
+  cambiaron.
+- Incremental: sólo los temas cuya firma (huella de código, título,
+  descripción y tags) cambió y los que tenían en su lista un tema que
+  cambió, se borró o dejó de estar publicado. Los vectores se arman con
+  todo el catálogo (es lo barato); el idf de las demás filas se pone al día
+  en la siguiente pasada completa.
+"""
+
+import hashlib
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .fuzzy import unaccent, words
+from .models import RelatedTopicSet, Tag, Topic
+
+
+TopicTag = Tag.topics.through
+
+# Repeticiones de cada palabra según dónde aparece (la descripción cuenta 1)
+TITLE_WEIGHT = 3
+TAG_NAME_WEIGHT = 2
+# Columnas en más de esta fracción de temas, o de esta cantidad, se descartan
+MAX_DF = 0.5
+MAX_DOC_FREQ = 1000
+# Peso del texto frente a los tags que suelen ir juntos
+TEXT_WEIGHT = 0.7
+# Tags más cercanos que se conservan por tag en la co-ocurrencia
+CO_TAGS = 10
+# Similitud mínima para aparecer como relacionado
+MIN_SCORE = 0.05
+# Filas por producto de matrices
+BATCH_SIZE = 1000
+
+STOPWORDS = frozenset("""
+    a al algo como con cual cuando de del desde donde e el ella en entre era es esa ese eso esta
+    este esto fue ha hay la las le les lo los mas mi muy ni no nos o otra otro para pero por
+    porque que se ser si sin sobre son su sus tambien te tiene todo un una uno unos unas y ya
+""".split())
+
+
+def get_limit():
+    return getattr(settings, 'RELATED_TOPICS_LIMIT', 6)
+
+
+def tokens(text):
+    return [word for word in words(unaccent(text)) if len(word) > 1 and word not in STOPWORDS]
+
+
+def signature(code, title, description, tags):
+    """Huella de lo que entra al vector y a la lista de un tema (tags: (id, nombre) ordenados)."""
+    parts = [code, title, description, *(f'{tag_id}:{name}' for tag_id, name in tags)]
+    return hashlib.md5('\x1f'.join(parts).encode()).hexdigest()
+
+
+@dataclass
+class Corpus:
+    """Temas publicados, una fila por tema en orden de pk."""
+    ids: list
+    codes: list
+    titles: list
+    descriptions: list
+    tags: list          # [[(tag_id, nombre)]]
+    signatures: list
+
+    def documents(self):
+        """Palabras de cada tema, repetidas según su peso."""
+        tag_tokens = {}
+        for title, description, topic_tags in zip(self.titles, self.descriptions, self.tags):
+            names = []
+            for tag_id, name in topic_tags:
+                if tag_id not in tag_tokens:
+                    tag_tokens[tag_id] = tokens(name)
+                names.extend(tag_tokens[tag_id])
+            yield tokens(title) * TITLE_WEIGHT + names * TAG_NAME_WEIGHT + tokens(description)
+
+
+def load_corpus():
+    """Dos consultas: los temas publicados y sus tags."""
+    tags = defaultdict(list)
+    links = TopicTag.objects.filter(topic__is_published=True).order_by('topic_id', 'tag_id').values_list(
+        'topic_id', 'tag_id', 'tag__name'
+    )
+    for topic_id, tag_id, name in links.iterator(chunk_size=5000):
+        tags[topic_id].append((tag_id, name))
+
+    corpus = Corpus([], [], [], [], [], [])
+    topics = Topic.objects.published().order_by('pk').values_list('pk', 'code', 'title', 'description')
+    for pk, code, title, description in topics.iterator(chunk_size=2000):
+        topic_tags = tags.get(pk, [])
+        corpus.ids.append(pk)
+        corpus.codes.append(code)
+        corpus.titles.append(title)
+        corpus.descriptions.append(description)
+        corpus.tags.append(topic_tags)
+        corpus.signatures.append(signature(code, title, description, topic_tags))
+    return corpus
+
+
+# ---------------------------------------------------------------------------
+# Vectores
+# ---------------------------------------------------------------------------
+
+def csr_from_lists(lists):
+    """Matriz de conteos: fila i, una columna por valor distinto."""
+    mapping = {}
+    indptr = [0]
+    indices = []
+    for values in lists:
+        indices.extend(mapping.setdefault(value, len(mapping)) for value in values)
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices)), indices, indptr), shape=(len(indptr) - 1, len(mapping)),
+    )
+    matrix.sum_duplicates()
+    return matrix
+
+
+def document_frequency(matrix):
+    return np.bincount(matrix.indices, minlength=matrix.shape[1])
+
+
+def useful_columns(matrix):
+    """Sin las columnas de un solo tema ni las demasiado frecuentes."""
+    limit = max(2, min(MAX_DF * matrix.shape[0], MAX_DOC_FREQ))
+    df = document_frequency(matrix)
+    return matrix[:, np.flatnonzero((df >= 2) & (df <= limit))]
+
+
+def normalize_rows(matrix):
+    """Cada fila con norma 1 (las vacías quedan en cero)."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ matrix).tocsr()
+
+
+def text_matrix(documents):
+    counts = useful_columns(csr_from_lists(documents))
+    idf = np.log((1 + counts.shape[0]) / (1 + document_frequency(counts))) + 1
+    counts.data = (1 + np.log(counts.data)) * idf[counts.indices]
+    return normalize_rows(counts)
+
+
+def tag_matrix(tags):
+    links = csr_from_lists(tags)
+    co = (links.T @ links).tocsr()
+    # Coseno entre tags: co[i, j] / sqrt(temas de i * temas de j)
+    counts = co.diagonal()
+    rows = np.repeat(np.arange(co.shape[0]), np.diff(co.indptr))
+    co.data = co.data / np.sqrt(counts[rows] * counts[co.indices])
+    for row in range(co.shape[0]):
+        start, end = co.indptr[row], co.indptr[row + 1]
+        if end - start > CO_TAGS:
+            values = co.data[start:end]
+            values[values < np.partition(values, -CO_TAGS)[-CO_TAGS]] = 0
+    co.eliminate_zeros()
+    return normalize_rows(useful_columns((links @ co).tocsr()))
+
+
+def build_matrix(corpus):
+    """Vectores de texto y de tags unidos con sus pesos (float32, CSR)."""
+    return sparse.hstack([
+        text_matrix(corpus.documents()) * math.sqrt(TEXT_WEIGHT),
+        tag_matrix([tag_id for tag_id, _ in topic_tags] for topic_tags in corpus.tags) * math.sqrt(1 - TEXT_WEIGHT),
+    ]).tocsr().astype(np.float32)
+
+
+def neighbours(matrix, rows, limit):
+    """{fila: [(fila vecina, similitud)]} de esas filas, mejor primero."""
+    transposed = matrix.T.tocsr()
+    result = {}
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        scores = (matrix[batch] @ transposed).tocsr()
+        for offset, row in enumerate(batch):
+            begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+            columns, values = scores.indices[begin:end], scores.data[begin:end]
+            keep = (columns != row) & (values >= MIN_SCORE)
+            columns, values = columns[keep], values[keep]
+            if len(values) > limit:
+                top = np.argpartition(-values, limit - 1)[:limit]
+                columns, values = columns[top], values[top]
+            order = np.lexsort((columns, -values))
+            result[row] = list(zip(columns[order].tolist(), values[order].tolist()))
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Recalcular
+# ---------------------------------------------------------------------------
+
+def build_set(corpus, found):
+    return {
+        'topics': [corpus.ids[column] for column, _ in found],
+        'codes': [corpus.codes[column] for column, _ in found],
+        'titles': [corpus.titles[column] for column, _ in found],
+        'scores': [round(score, 4) for _, score in found],
+    }
+
+
+def in_chunks(values, size=500):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def refresh(full=False, batch_size=2000):
+    """
+    Recalcula los relacionados (todos con full=True, si no sólo lo que
+    cambió) y escribe sólo las listas distintas. Retorna cuántas escribió
+    o borró.
+    """
+    corpus = load_corpus()
+    position = {pk: row for row, pk in enumerate(corpus.ids)}
+    stored = {
+        topic_id: (signature, data)
+        for topic_id, signature, data in RelatedTopicSet.objects.values_list('topic_id', 'signature', 'neighbours')
+    }
+    # Temas despublicados: su lista sale
+    removed = [topic_id for topic_id in stored if topic_id not in position]
+    changed = [
+        row for row, pk in enumerate(corpus.ids)
+        if stored.get(pk, (None, None))[0] != corpus.signatures[row]
+    ]
+    if full:
+        rows = list(range(len(corpus.ids)))
+    else:
+        # ...y también las listas que mostraban un tema que cambió o ya no está
+        stale = {corpus.ids[row] for row in changed}.union(removed)
+        rows = sorted(set(changed) | {
+            position[topic_id] for topic_id, (_, data) in stored.items()
+            if topic_id in position and stale.intersection(data.get('topics', []))
+        })
+
+    now = timezone.now()
+    sets = []
+    if rows:
+        for row, found in neighbours(build_matrix(corpus), rows, get_limit()).items():
+            pk = corpus.ids[row]
+            data = build_set(corpus, found)
+            if stored.get(pk) != (corpus.signatures[row], data):
+                sets.append(RelatedTopicSet(
+                    topic_id=pk, signature=corpus.signatures[row], neighbours=data, computed_at=now,
+                ))
+    with transaction.atomic():
+        for chunk in in_chunks([*removed, *(entry.topic_id for entry in sets)]):
+            RelatedTopicSet.objects.filter(topic_id__in=chunk).delete()
+        RelatedTopicSet.objects.bulk_create(sets, batch_size=batch_size)
+    return len(sets) + len(removed)
+
+
+@dataclass(frozen=True)
+class Related:
+    """Un tema relacionado (para plantillas)."""
+    topic_id: int
+    code: str
+    title: str
+    score: float
+
+
+def related_topics(topic):
+    """Temas relacionados de un tema (sin consultas si se cargó con select_related)."""
+    try:
+        data = topic.related_set.neighbours
+    except RelatedTopicSet.DoesNotExist:
+        return []
+    return [
+        Related(*values)
+        for values in zip(data['topics'], data['codes'], data['titles'], data['scores'])
+    ]
@@ -0,0 +1,504 @@
+"""
+Motor de búsqueda full-text
+============================
+
+Una sola interfaz (`get_backend()`) con implementaciones por motor de base de datos:
+
+- PostgresSearchBackend: tsvector ponderado + índice GIN (producción)
+- SQLiteSearchBackend: tabla virtual FTS5 con bm25 (desarrollo)
+- BasicSearchBackend: icontains sobre SearchDocument (fallback para otros motores)
+
+El contenido indexado vive en `SearchDocument` (un documento por Topic). Los
+índices full-text de cada motor se mantienen dentro de la base de datos
+(columna generada en PostgreSQL, triggers en SQLite), así que basta con
+mantener actualizadas las filas de SearchDocument con `index_topics()`.
+
+Si una consulta no encuentra nada ("eror 505"), execute() recurre a la
+búsqueda por similitud de core.fuzzy y agrega una sugerencia.
+"""
+
+import re
+from dataclasses import dataclass, field
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef, Q, Value
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from . import fuzzy
+from .cache import make_key
+from .models import SearchDocument, Tag, Topic, VideoAsset
+
+
+# Marcadores de resaltado: caracteres de uso privado que nunca aparecen en el
+# contenido. Se insertan en el snippet, se escapa el texto y luego se
+# reemplazan por <mark>, así el HTML resultante siempre es seguro.
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_STOP = '\ue001'
+
+TOKEN_RE = re.compile(r'\w+(?:[.\-]\w+)*', re.UNICODE)
+
+# Filtros por facetas: parámetro de la URL -> lookup sobre Topic
+FILTERS = {
+    'category': 'category__slug',
+    'location': 'location_tag',
+    'tag': 'tags__slug',
+    'platform': 'video__platform',
+}
+# Tags con más temas que se muestran como faceta
+FACET_TAG_LIMIT = 20
+
+LOCATION_LABELS = dict(Topic.LOCATION_CHOICES)
+PLATFORM_LABELS = dict(VideoAsset.PLATFORM_CHOICES)
+
+TopicTag = Tag.topics.through
+
+
+@dataclass
+class SearchHit:
+    """Un resultado de búsqueda: id del Topic y su relevancia."""
+    topic_id: int
+    rank: float
+
+
+@dataclass
+class SearchResult:
+    """
+    Resultado completo de una búsqueda: ids ordenados por relevancia, total y
+    facetas. Es lo que se cachea, y lo comparten la paginación y el total.
+    `fuzzy` indica que son resultados aproximados (core.fuzzy),
+    `suggestion` la consulta corregida ("¿Quisiste decir ...?"), `filters`
+    los filtros aplicados (parse_filters) y `limited` que el motor encontró
+    más de SEARCH_MAX_RESULTS (total es entonces un mínimo).
+    """
+    query: str
+    ids: list = field(default_factory=list)
+    facets: dict = field(default_factory=dict)
+    fuzzy: bool = False
+    suggestion: str = ''
+    filters: dict = field(default_factory=dict)
+    limited: bool = False
+
+    @property
+    def total(self):
+        return len(self.ids)
+
+
+def tokenize(query):
+    """
+    Normaliza la consulta del usuario a una lista de tokens seguros.
+    Ej: 'Error 505!' -> ['error', '505'], '2.1' -> ['2.1']
+    """
+    return TOKEN_RE.findall(query.lower())
+
+
+def render_highlight(raw):
+    """Convierte un snippet con marcadores en HTML seguro con <mark>."""
+    if not raw:
+        return ''
+    html = escape(raw)
+    html = html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+    return mark_safe(html)
+
+
+class BaseSearchBackend:
+    """
+    Interfaz común de los motores de búsqueda.
+    """
+    def search(self, query, limit=None):
+        """Retorna una lista de SearchHit ordenada por relevancia."""
+        raise NotImplementedError
+
+    def highlight(self, query, topic_ids):
+        """Retorna {topic_id: snippet_html} para los ids indicados."""
+        raise NotImplementedError
+
+    def rebuild_storage(self):
+        """Reconstruye las estructuras internas del índice (si el motor las tiene)."""
+
+    def get_limit(self, limit):
+        return limit or getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Búsqueda con tsvector ponderado (columna generada `search_vector` + GIN).
+    La columna se crea en la migración 0003 sólo en PostgreSQL.
+    """
+    def build_tsquery(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        return ' & '.join(f"'{token}':*" for token in tokens)
+
+    # La misma expresión se usa en el WHERE (índice GIN) y en el ranking
+    TSQUERY_SQL = "(to_tsquery('spanish', %s) || to_tsquery('simple', %s))"
+
+    def search(self, query, limit=None):
+        tsquery = self.build_tsquery(query)
+        if not tsquery:
+            return []
+        sql = f"""
+            SELECT topic_id, ts_rank_cd(search_vector, {self.TSQUERY_SQL}) AS rank
+            FROM core_searchdocument
+            WHERE is_published AND search_vector @@ {self.TSQUERY_SQL}
+            ORDER BY rank DESC, code
+            LIMIT %s
+        """
+        params = [tsquery, tsquery, tsquery, tsquery, self.get_limit(limit)]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [SearchHit(topic_id, rank) for topic_id, rank in cursor.fetchall()]
+
+    def highlight(self, query, topic_ids):
+        tsquery = self.build_tsquery(query)
+        if not tsquery or not topic_ids:
+            return {}
+        sql = f"""
+            SELECT topic_id,
+                   ts_headline('spanish', title || ' — ' || body, {self.TSQUERY_SQL}, %s)
+            FROM core_searchdocument
+            WHERE topic_id = ANY(%s)
+        """
+        options = (
+            f'StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_STOP}", '
+            'MaxWords=30, MinWords=10, MaxFragments=2'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tsquery, tsquery, options, list(topic_ids)])
+            return {topic_id: render_highlight(raw) for topic_id, raw in cursor.fetchall()}
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    Búsqueda con FTS5 (tabla externa `core_searchdocument_fts`).
+    bm25 con pesos por columna: code, title, tags, body.
+    """
+    WEIGHTS = '10.0, 5.0, 3.0, 1.0'
+
+    def build_match(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        # Cada token entre comillas (sin operadores FTS5) y con prefijo
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, query, limit=None):
+        match = self.build_match(query)
+        if not match:
+            return []
+        sql = f"""
+            SELECT d.topic_id, bm25(core_searchdocument_fts, {self.WEIGHTS}) AS rank
+            FROM core_searchdocument_fts
+            JOIN core_searchdocument d ON d.topic_id = core_searchdocument_fts.rowid
+            WHERE core_searchdocument_fts MATCH %s AND d.is_published
+            ORDER BY rank, d.code
+            LIMIT %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, self.get_limit(limit)])
+            # bm25 es "menor = mejor"; se invierte para que rank alto = relevante
+            return [SearchHit(topic_id, -rank) for topic_id, rank in cursor.fetchall()]
+
+    def rebuild_storage(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO core_searchdocument_fts(core_searchdocument_fts) VALUES ('rebuild')"
+            )
+
+    def highlight(self, query, topic_ids):
+        match = self.build_match(query)
+        if not match or not topic_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(topic_ids))
+        sql = f"""
+            SELECT rowid,
+                   snippet(core_searchdocument_fts, -1, %s, %s, '…', 24)
+            FROM core_searchdocument_fts
+            WHERE core_searchdocument_fts MATCH %s AND rowid IN ({placeholders})
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [HIGHLIGHT_START, HIGHLIGHT_STOP, match, *topic_ids])
+            return {topic_id: render_highlight(raw) for topic_id, raw in cursor.fetchall()}
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """
+    Fallback sin índice full-text: icontains sobre SearchDocument.
+    Sólo para motores sin soporte (ej: SQLite compilado sin FTS5).
+    """
+    def search(self, query, limit=None):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        documents = SearchDocument.objects.filter(is_published=True)
+        for token in tokens:
+            documents = documents.filter(
+                Q(code__icontains=token) | Q(title__icontains=token) |
+                Q(tags__icontains=token) | Q(body__icontains=token)
+            )
+        ids = documents.order_by('code').values_list('topic_id', flat=True)
+        return [SearchHit(topic_id, 0.0) for topic_id in ids[:self.get_limit(limit)]]
+
+    def highlight(self, query, topic_ids):
+        return {}
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Retorna el motor de búsqueda configurado.
+    settings.SEARCH_BACKEND (ruta importable) tiene prioridad; si no, se elige
+    según el motor de la conexión por defecto.
+    """
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        elif connection.vendor == 'sqlite' and sqlite_has_fts5():
+            _backend = SQLiteSearchBackend()
+        else:
+            _backend = BasicSearchBackend()
+    return _backend
+
+
+def sqlite_has_fts5():
+    """Comprueba si la tabla FTS5 existe (la crea la migración 0003)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'core_searchdocument_fts'"
+        )
+        return cursor.fetchone() is not None
+
+
+# ---------------------------------------------------------------------------
+# Mantenimiento del índice
+# ---------------------------------------------------------------------------
+
+def build_document(topic):
+    """Construye (sin guardar) el SearchDocument de un Topic con sus tags precargados."""
+    return SearchDocument(
+        topic_id=topic.pk,
+        code=topic.code,
+        title=topic.title,
+        tags=' '.join(tag.name for tag in topic.tags.all()),
+        body=topic.description,
+        is_published=topic.is_published,
+    )
+
+
+def index_topics(topic_ids, batch_size=500):
+    """
+    Crea o actualiza los SearchDocument de los topics indicados.
+    Los ids que ya no existen simplemente se ignoran (su documento se borra en cascada).
+    """
+    topic_ids = list(topic_ids)
+    for start in range(0, len(topic_ids), batch_size):
+        chunk = topic_ids[start:start + batch_size]
+        topics = Topic.objects.filter(pk__in=chunk).prefetch_related('tags')
+        documents = [build_document(topic) for topic in topics]
+        existing = set(
+            SearchDocument.objects.filter(pk__in=chunk).values_list('pk', flat=True)
+        )
+        SearchDocument.objects.bulk_create(
+            [doc for doc in documents if doc.pk not in existing]
+        )
+        SearchDocument.objects.bulk_update(
+            [doc for doc in documents if doc.pk in existing],
+            ['code', 'title', 'tags', 'body', 'is_published'],
+        )
+
+
+def rebuild_index(batch_size=500):
+    """Reconstruye todos los documentos. Retorna el número de topics indexados."""
+    topic_ids = list(Topic.objects.values_list('pk', flat=True))
+    index_topics(topic_ids, batch_size=batch_size)
+    get_backend().rebuild_storage()
+    fuzzy.rebuild_index(batch_size=batch_size)
+    return len(topic_ids)
+
+
+# ---------------------------------------------------------------------------
+# Ejecución cacheada
+# ---------------------------------------------------------------------------
+
+def normalize_query(query):
+    """'  Error   505 ' y 'error 505' comparten resultado (y entrada de caché)."""
+    return ' '.join(tokenize(query))
+
+
+def parse_filters(params):
+    """
+    Filtros de request.GET: {'category': ('caja',), 'tag': ('error-505',)}.
+    Cada parámetro se puede repetir (valores alternativos); los distintos
+    parámetros se combinan (todos deben cumplirse).
+    """
+    filters = {}
+    for name in FILTERS:
+        values = sorted({value.strip() for value in params.getlist(name) if value.strip()})
+        if values:
+            filters[name] = tuple(values)
+    return filters
+
+
+def apply_filters(ids, filters):
+    """Los ids (en su orden) que cumplen los filtros, con una consulta."""
+    if not filters or not ids:
+        return list(ids)
+    topics = Topic.objects.filter(pk__in=ids)
+    for name, values in filters.items():
+        topics = topics.filter(**{f'{FILTERS[name]}__in': values})
+    matching = set(topics.values_list('pk', flat=True))
+    return [pk for pk in ids if pk in matching]
+
+
+def compute_facets(ids, filters=None):
+    """
+    Facetas de categoría, ubicación, plataforma y tag de los ids (el
+    resultado SIN filtrar), con conteos. Cada faceta cuenta con todos los
+    filtros aplicados menos el suyo: así sus otras opciones muestran cuántos
+    resultados habría al cambiar o sumar un valor, en vez de cero.
+
+    Las tres primeras salen de un único aggregate agrupado por las tres
+    columnas y por si el tema cumple el filtro de tags (una fila por
+    combinación presente); cada faceta suma las filas que cumplen los demás
+    filtros. Los tags, que son varios por tema, salen de otro aggregate sobre
+    la tabla intermedia con los demás filtros en el WHERE. Siempre dos
+    consultas, sin importar cuántas categorías, tags o filtros haya.
+    """
+    if not ids:
+        return {}
+    filters = filters or {}
+    tagged = Value(True)
+    if 'tag' in filters:
+        tagged = Exists(TopicTag.objects.filter(topic=OuterRef('pk'), tag__slug__in=filters['tag']))
+    rows = Topic.objects.filter(pk__in=ids).annotate(tagged=tagged).values(
+        'category__slug', 'category__name', 'location_tag', 'video__platform', 'tagged'
+    ).annotate(count=Count('pk')).order_by()
+
+    counts = {name: {} for name in ('category', 'location', 'platform')}
+    for row in rows:
+        values = {
+            'category': (row['category__slug'], row['category__name']),
+            'location': (row['location_tag'], LOCATION_LABELS.get(row['location_tag'])),
+            'platform': (row['video__platform'], PLATFORM_LABELS.get(row['video__platform'])),
+        }
+        # Filtros que la fila no cumple: si son dos o más no cuenta en ninguna faceta
+        failed = {
+            name for name, (value, _) in values.items() if name in filters and value not in filters[name]
+        }
+        if not row['tagged']:
+            failed.add('tag')
+        for name, (value, label) in values.items():
+            if value and failed <= {name}:
+                total = counts[name].get(value, (label or value, 0))[1]
+                counts[name][value] = (label or value, total + row['count'])
+
+    facets = {
+        name: [
+            {'value': value, 'label': label, 'count': count, 'selected': value in filters.get(name, ())}
+            for value, (label, count) in sorted(values.items(), key=lambda item: (-item[1][1], item[1][0]))
+        ]
+        for name, values in counts.items()
+    }
+    links = TopicTag.objects.filter(topic_id__in=ids)
+    for name, values in filters.items():
+        if name != 'tag':
+            links = links.filter(**{f'topic__{FILTERS[name]}__in': values})
+    tags = links.values('tag__slug', 'tag__name').annotate(
+        count=Count('pk')
+    ).order_by('-count', 'tag__name')[:FACET_TAG_LIMIT]
+    facets['tag'] = [
+        {
+            'value': row['tag__slug'], 'label': row['tag__name'], 'count': row['count'],
+            'selected': row['tag__slug'] in filters.get('tag', ()),
+        }
+        for row in tags
+    ]
+    return {name: values for name, values in facets.items() if values}
+
+
+def execute(query, filters=None):
+    """
+    Ejecuta la búsqueda y retorna un SearchResult.
+    Se cachea bajo la consulta normalizada y la versión del namespace
+    'search' (core.signals la incrementa cuando cambia un Topic o Tag), así la
+    página 2 de una búsqueda popular no vuelve a tocar la base de datos.
+    Con filtros (parse_filters) se parte del resultado sin filtrar (también
+    cacheado) y se cachea aparte el resultado acotado.
+    """
+    normalized = normalize_query(query)
+    if not normalized:
+        return SearchResult(query=normalized)
+    filters = filters or {}
+    key = make_key('search', normalized, urlencode(sorted(filters.items()), doseq=True))
+    result = cache.get(key)
+    if result is None:
+        if filters:
+            base = execute(normalized)
+            ids = apply_filters(base.ids, filters)
+            result = SearchResult(
+                query=normalized, ids=ids, fuzzy=base.fuzzy, suggestion=base.suggestion, filters=filters,
+                limited=base.limited,
+            )
+        else:
+            # Uno más que el límite: así se sabe si hubo más resultados
+            backend = get_backend()
+            limit = backend.get_limit(None)
+            ids = [hit.topic_id for hit in backend.search(normalized, limit + 1)]
+            result = SearchResult(query=normalized, ids=ids[:limit], limited=len(ids) > limit)
+            if not ids:
+                # Sin coincidencias: temas parecidos por título o tag (errores de tipeo)
+                similar = fuzzy.search(normalized)
+                result = SearchResult(
+                    query=normalized, ids=similar.ids, fuzzy=bool(similar.ids), suggestion=similar.suggestion,
+                )
+        # Las facetas parten del resultado sin filtrar (cada una ignora su filtro)
+        result.facets = compute_facets(base.ids if filters else result.ids, filters)
+        cache.set(key, result, getattr(settings, 'SEARCH_CACHE_TIMEOUT', 600))
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Resultados paginables
+# ---------------------------------------------------------------------------
+
+class TopicHitList:
+    """
+    Secuencia perezosa de resultados para el Paginator de Django.
+    len() es gratis (los ids ya están en el SearchResult) y cada página carga
+    sólo sus Topics, con el snippet resaltado adjunto en `topic.search_snippet`.
+    """
+    def __init__(self, result):
+        # Resultados aproximados: se resalta lo que coincide con la sugerencia
+        self.query = result.suggestion or result.query
+        self.ids = result.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = self.ids[index]
+        topics = Topic.objects.filter(pk__in=ids).select_related(
+            'category', 'video'
+        ).prefetch_related('tags').in_bulk()
+        snippets = get_backend().highlight(self.query, ids)
+        page = []
+        for topic_id in ids:
+            topic = topics.get(topic_id)
+            if topic is None:
+                continue
+            topic.search_snippet = snippets.get(topic_id, '')
+            page.append(topic)
+        return page
@@ -0,0 +1,207 @@
+"""
+Secuencia del curso
+====================
+Mantiene CourseSequenceEntry: la posición y los vecinos (anterior/siguiente)
+de cada Topic publicado, global y por Categoría.
+
+- sync_topic() / remove_topic(): reenlace incremental de un solo tema
+  (publicar, despublicar, cambiar código o categoría, borrar). Cuesta un
+  número fijo de consultas sin importar el tamaño del catálogo, aunque
+  correr las posiciones es un UPDATE sobre todas las entradas posteriores
+  (en todo el curso y en la categoría). Se serializa con un lock (ver
+  _lock): dos saves simultáneos leerían los mismos vecinos y dejarían
+  enlaces y posiciones rotos.
+- batch(): agrupa cambios masivos (list_editable del admin, acciones,
+  importaciones) en una única reconstrucción al final.
+- rebuild(): reconstrucción completa con dos consultas y un bulk_create.
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import CourseSequenceEntry, Topic
+
+
+# (campo de posición, campo anterior, campo siguiente, ¿acotado a la categoría?)
+SCOPES = (
+    ('position', 'prev_topic_id', 'next_topic_id', False),
+    ('category_position', 'category_prev_topic_id', 'category_next_topic_id', True),
+)
+
+# Clave del advisory lock de PostgreSQL (cualquier entero fijo de la app)
+ADVISORY_LOCK_KEY = 72_500_004
+
+_state = threading.local()
+
+
+@contextmanager
+def batch():
+    """
+    Difiere el mantenimiento de la secuencia hasta el final del bloque:
+
+        with sequence.batch():
+            for topic in topics:
+                topic.save()
+
+    Si algún cambio la afectó, se reconstruye una sola vez al salir, también
+    si el bloque lanza una excepción: en autocommit los cambios anteriores ya
+    quedaron guardados. La reconstrucción se agenda con on_commit, así que si
+    el bloque está dentro de una transacción que se revierte no se hace.
+    Los bloques se pueden anidar; sólo el más externo reconstruye.
+    """
+    depth = getattr(_state, 'depth', 0)
+    _state.depth = depth + 1
+    try:
+        yield
+    finally:
+        _state.depth = depth
+        if depth == 0 and _state.__dict__.pop('dirty', False):
+            transaction.on_commit(rebuild)
+
+
+def _deferred():
+    """True (y marca la secuencia como sucia) si hay un batch() activo."""
+    if getattr(_state, 'depth', 0):
+        _state.dirty = True
+        return True
+    return False
+
+
+def sync_topic(topic):
+    """Ajusta la secuencia tras guardar un Topic."""
+    if _deferred():
+        return
+    with transaction.atomic():
+        _lock()
+        entry = CourseSequenceEntry.objects.filter(pk=topic.pk).first()
+        if entry is not None:
+            unchanged = (
+                topic.is_published
+                and entry.sort_key == topic.sort_key
+                and entry.code == topic.code
+                and entry.category_id == topic.category_id
+            )
+            if unchanged:
+                return
+            _unlink(entry)
+        if topic.is_published:
+            _link(topic)
+
+
+def remove_topic(topic):
+    """Saca un Topic de la secuencia (antes de borrarlo)."""
+    if _deferred():
+        return
+    with transaction.atomic():
+        _lock()
+        entry = CourseSequenceEntry.objects.filter(pk=topic.pk).first()
+        if entry is not None:
+            _unlink(entry)
+
+
+def _lock():
+    """
+    Toma, hasta el fin de la transacción, el lock de la secuencia antes de
+    leer vecinos y posiciones:
+    - PostgreSQL: pg_advisory_xact_lock (no bloquea lecturas de la tabla).
+    - SQLite: un UPDATE vacío toma el lock de escritura de la base (BEGIN
+      es diferido: sin esto dos conexiones leerían el mismo estado).
+    - Otros motores: SELECT ... FOR UPDATE de la primera entrada.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ADVISORY_LOCK_KEY])
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {CourseSequenceEntry._meta.db_table} SET position = position WHERE 0')
+    else:
+        list(CourseSequenceEntry.objects.select_for_update().order_by('position')[:1])
+
+
+def _scope(category_id=None):
+    entries = CourseSequenceEntry.objects.all()
+    if category_id is not None:
+        entries = entries.filter(category_id=category_id)
+    return entries
+
+
+def _unlink(entry):
+    now = timezone.now()
+    for position_field, prev_field, next_field, by_category in SCOPES:
+        entries = _scope(entry.category_id if by_category else None)
+        prev_id = getattr(entry, prev_field)
+        next_id = getattr(entry, next_field)
+        if prev_id:
+            entries.filter(pk=prev_id).update(**{next_field: next_id, 'updated_at': now})
+        if next_id:
+            entries.filter(pk=next_id).update(**{prev_field: prev_id, 'updated_at': now})
+        entries.filter(**{f'{position_field}__gt': getattr(entry, position_field)}).update(
+            **{position_field: F(position_field) - 1}
+        )
+    entry.delete()
+
+
+def _link(topic):
+    entry = CourseSequenceEntry(
+        topic=topic,
+        category_id=topic.category_id,
+        sort_key=topic.sort_key,
+        code=topic.code,
+    )
+    before = Q(sort_key__lt=topic.sort_key) | Q(sort_key=topic.sort_key, code__lt=topic.code)
+    now = timezone.now()
+    for position_field, prev_field, next_field, by_category in SCOPES:
+        entries = _scope(topic.category_id if by_category else None)
+        prev = entries.filter(before).order_by('-sort_key', '-code').first()
+        following = entries.exclude(before).order_by('sort_key', 'code').first()
+        position = getattr(prev, position_field) + 1 if prev else 1
+        entries.filter(**{f'{position_field}__gte': position}).update(
+            **{position_field: F(position_field) + 1}
+        )
+        setattr(entry, position_field, position)
+        setattr(entry, prev_field, prev.pk if prev else None)
+        setattr(entry, next_field, following.pk if following else None)
+        if prev:
+            entries.filter(pk=prev.pk).update(**{next_field: topic.pk, 'updated_at': now})
+        if following:
+            entries.filter(pk=following.pk).update(**{prev_field: topic.pk, 'updated_at': now})
+    entry.save()
+
+
+def _link_neighbours(entries, position_field, prev_field, next_field):
+    for index, entry in enumerate(entries):
+        setattr(entry, position_field, index + 1)
+        setattr(entry, prev_field, entries[index - 1].topic_id if index else None)
+        setattr(entry, next_field, entries[index + 1].topic_id if index + 1 < len(entries) else None)
+
+
+def rebuild():
+    """Reconstruye la secuencia completa. Retorna el número de entradas."""
+    with transaction.atomic():
+        # Con el lock tomado antes de leer: un reenlace concurrente no se pierde
+        _lock()
+        rows = Topic.objects.published().in_course_order().values_list(
+            'pk', 'category_id', 'sort_key', 'code'
+        )
+        entries = [
+            CourseSequenceEntry(topic_id=pk, category_id=category_id, sort_key=sort_key, code=code)
+            for pk, category_id, sort_key, code in rows
+        ]
+        by_category = defaultdict(list)
+        for entry in entries:
+            by_category[entry.category_id].append(entry)
+
+        _link_neighbours(entries, 'position', 'prev_topic_id', 'next_topic_id')
+        for category_entries in by_category.values():
+            _link_neighbours(
+                category_entries, 'category_position', 'category_prev_topic_id', 'category_next_topic_id'
+            )
+
+        CourseSequenceEntry.objects.all().delete()
+        CourseSequenceEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
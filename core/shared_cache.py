@@ -0,0 +1,386 @@
+"""
+Caché compartido entre procesos (SQLite en modo WAL)
+=====================================================
+Backend de CACHES para varios workers de gunicorn en el mismo servidor sin
+Redis ni memcached: todos leen y escriben el mismo archivo SQLite, así que
+una página cacheada por un worker la sirven los demás, bump_version() llega
+a todos y el contenido sobrevive al reciclado de workers y a los deploys.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.shared_cache.SharedCache',
+        'LOCATION': '/ruta/cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 256 * 1024 * 1024},
+    }}
+
+- WAL: las lecturas no bloquean ni son bloqueadas por la escritura (hay un
+  solo escritor a la vez; busy_timeout espera su turno). Una conexión por
+  hilo y proceso.
+- Enteros como INTEGER de SQLite: incr()/decr() son un solo UPDATE atómico
+  (las versiones de core.cache no pierden incrementos entre workers). El
+  resto de los valores va con pickle, comprimido con zlib desde
+  COMPRESS_MIN_SIZE bytes.
+- LRU: cada fila guarda cuándo se leyó por última vez (se actualiza a lo
+  sumo cada ACCESS_RESOLUTION segundos, para no escribir en cada lectura).
+  Al pasar MAX_ENTRIES filas o MAX_SIZE bytes se borran primero las
+  vencidas y luego las menos usadas, hasta quedar 1/CULL_FREQUENCY por
+  debajo del límite.
+- Cantidad de filas y bytes se mantienen con triggers (sin COUNT/SUM);
+  aciertos y fallos se acumulan en cada proceso y se suman al archivo cada
+  STATS_FLUSH_SECONDS. stats() los reporta (vista cache_stats).
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+DEFAULT_COMPRESS_MIN_SIZE = 4096
+DEFAULT_ACCESS_RESOLUTION = 1.0
+DEFAULT_STATS_FLUSH_SECONDS = 1.0
+DEFAULT_BUSY_TIMEOUT = 5.0
+
+# Claves por sentencia en get_many/delete_many (límite de parámetros de SQLite)
+CHUNK_SIZE = 500
+
+# Enteros que caben en un INTEGER de SQLite (los demás van con pickle)
+MIN_INTEGER = -2 ** 63
+MAX_INTEGER = 2 ** 63 - 1
+
+# Prefijo de los valores serializados
+PICKLED = b'p'
+COMPRESSED = b'z'
+
+STAT_NAMES = ('entries', 'bytes', 'hits', 'misses', 'evictions')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    value BLOB
+);
+CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed);
+CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires) WHERE expires IS NOT NULL;
+CREATE TABLE IF NOT EXISTS cache_stat (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stat (name, value) VALUES {', '.join(f"('{name}', 0)" for name in STAT_NAMES)};
+CREATE TRIGGER IF NOT EXISTS cache_entry_insert AFTER INSERT ON cache_entry BEGIN
+    UPDATE cache_stat SET value = value + 1 WHERE name = 'entries';
+    UPDATE cache_stat SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_delete AFTER DELETE ON cache_entry BEGIN
+    UPDATE cache_stat SET value = value - 1 WHERE name = 'entries';
+    UPDATE cache_stat SET value = value - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_resize AFTER UPDATE OF size ON cache_entry BEGIN
+    UPDATE cache_stat SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+END;
+"""
+
+# Sin vencer: expires NULL (para siempre) o en el futuro
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+def in_chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class SharedCache(BaseCache):
+    """Caché en un archivo SQLite compartido por todos los procesos del servidor."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = str(location)
+        self._max_entries = int(params.get('max_entries', options.get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES)))
+        self.max_size = int(options.get('MAX_SIZE', DEFAULT_MAX_SIZE))
+        self.compress_min_size = int(options.get('COMPRESS_MIN_SIZE', DEFAULT_COMPRESS_MIN_SIZE))
+        self.access_resolution = float(options.get('ACCESS_RESOLUTION', DEFAULT_ACCESS_RESOLUTION))
+        self.stats_flush_seconds = float(options.get('STATS_FLUSH_SECONDS', DEFAULT_STATS_FLUSH_SECONDS))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', DEFAULT_BUSY_TIMEOUT))
+        self._local = threading.local()
+        self._counts = Counter()
+        self._counts_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    # --- Conexión -------------------------------------------------------------
+
+    @property
+    def connection(self):
+        """Conexión del hilo actual (una nueva tras un fork)."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def close(self, **kwargs):
+        # Las conexiones duran lo que el hilo (se reabren sólo tras un fork)
+        pass
+
+    # --- Valores --------------------------------------------------------------
+
+    def encode(self, value):
+        """(valor para SQLite, bytes que ocupa)."""
+        if type(value) is int and MIN_INTEGER <= value <= MAX_INTEGER:
+            return value, 8
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) >= self.compress_min_size:
+            data = COMPRESSED + zlib.compress(data, 1)
+        else:
+            data = PICKLED + data
+        return data, len(data)
+
+    def decode(self, value):
+        if isinstance(value, int):
+            return value
+        data = bytes(value)
+        if data[:1] == COMPRESSED:
+            return pickle.loads(zlib.decompress(data[1:]))
+        return pickle.loads(data[1:])
+
+    # --- API de Django ----------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self.connection.execute(
+            f'SELECT value, accessed FROM cache_entry WHERE key = ? AND {ALIVE}', (key, now)
+        ).fetchone()
+        if row is None:
+            self.count('misses')
+            return default
+        value, accessed = row
+        if now - accessed >= self.access_resolution:
+            self.connection.execute('UPDATE cache_entry SET accessed = ? WHERE key = ?', (now, key))
+        self.count('hits')
+        return self.decode(value)
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        now = time.time()
+        found = {}
+        stale = []
+        for chunk in in_chunks(keys):
+            rows = self.connection.execute(
+                f'SELECT key, value, accessed FROM cache_entry '
+                f'WHERE key IN ({", ".join("?" * len(chunk))}) AND {ALIVE}',
+                (*chunk, now),
+            )
+            for key, value, accessed in rows:
+                found[keys[key]] = self.decode(value)
+                if now - accessed >= self.access_resolution:
+                    stale.append(key)
+        for chunk in in_chunks(stale):
+            self.connection.execute(
+                f'UPDATE cache_entry SET accessed = ? WHERE key IN ({", ".join("?" * len(chunk))})',
+                (now, *chunk),
+            )
+        self.count('hits', len(found))
+        self.count('misses', len(keys) - len(found))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write([(key, value)], timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(
+            [(self.make_and_validate_key(key, version=version), value) for key, value in data.items()],
+            timeout,
+        )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Sólo si no existe (o venció), en una sentencia."""
+        key = self.make_and_validate_key(key, version=version)
+        value, size = self.encode(value)
+        now = time.time()
+        cursor = self.connection.execute(
+            'INSERT INTO cache_entry (key, size, expires, accessed, value) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET size = excluded.size, expires = excluded.expires, '
+            'accessed = excluded.accessed, value = excluded.value '
+            'WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= ?',
+            (key, size, self.get_backend_timeout(timeout), now, value, now),
+        )
+        added = cursor.rowcount > 0
+        if added:
+            self._cull_if_needed()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self.connection.execute(
+            f'UPDATE cache_entry SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        """Atómico entre procesos: un UPDATE sobre el INTEGER guardado."""
+        key = self.make_and_validate_key(key, version=version)
+        rows = self.connection.execute(
+            f"UPDATE cache_entry SET value = value + ? "
+            f"WHERE key = ? AND typeof(value) = 'integer' AND {ALIVE} RETURNING value",
+            (delta, key, time.time()),
+        ).fetchall()
+        if not rows:
+            raise ValueError(f"Key '{key}' not found")
+        return rows[0][0]
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self.connection.execute(
+            f'SELECT 1 FROM cache_entry WHERE key = ? AND {ALIVE}', (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.connection.execute('DELETE FROM cache_entry WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        for chunk in in_chunks(keys):
+            self.connection.execute(
+                f'DELETE FROM cache_entry WHERE key IN ({", ".join("?" * len(chunk))})', chunk
+            )
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache_entry')
+
+    # --- Escritura y desalojo ---------------------------------------------------
+
+    def _write(self, items, timeout):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in items:
+            value, size = self.encode(value)
+            rows.append((key, size, expires, now, value))
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO cache_entry (key, size, expires, accessed, value) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET size = excluded.size, expires = excluded.expires, '
+                'accessed = excluded.accessed, value = excluded.value',
+                rows,
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._cull_if_needed()
+
+    def _totals(self):
+        return dict(self.connection.execute(
+            "SELECT name, value FROM cache_stat WHERE name IN ('entries', 'bytes')"
+        ))
+
+    def _cull_if_needed(self):
+        totals = self._totals()
+        if totals['entries'] > self._max_entries or totals['bytes'] > self.max_size:
+            self._cull()
+
+    def _cull(self):
+        """Vencidas primero; después las menos usadas hasta 1/CULL_FREQUENCY bajo los límites."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            before = self._totals()['entries']
+            connection.execute('DELETE FROM cache_entry WHERE expires <= ?', (time.time(),))
+            totals = self._totals()
+            keep = 1 - 1 / self._cull_frequency if self._cull_frequency else 0
+            if totals['entries'] > self._max_entries:
+                connection.execute(
+                    'DELETE FROM cache_entry WHERE key IN '
+                    '(SELECT key FROM cache_entry ORDER BY accessed LIMIT ?)',
+                    (totals['entries'] - int(self._max_entries * keep),),
+                )
+                totals = self._totals()
+            if totals['bytes'] > self.max_size:
+                # Los más viejos hasta liberar lo que sobra (suma acumulada en orden de uso)
+                excess = totals['bytes'] - int(self.max_size * keep)
+                connection.execute(
+                    'DELETE FROM cache_entry WHERE key IN ('
+                    '  SELECT key FROM ('
+                    '    SELECT key, SUM(size) OVER (ORDER BY accessed, key) - size AS freed'
+                    '    FROM cache_entry'
+                    '  ) WHERE freed < ?'
+                    ')',
+                    (excess,),
+                )
+            evicted = before - self._totals()['entries']
+            connection.execute(
+                "UPDATE cache_stat SET value = value + ? WHERE name = 'evictions'", (evicted,)
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    # --- Estadísticas -----------------------------------------------------------
+
+    def count(self, name, amount=1):
+        """Acumula aciertos/fallos en el proceso; se suman al archivo cada tanto."""
+        if not amount:
+            return
+        with self._counts_lock:
+            self._counts[name] += amount
+            if time.monotonic() - self._flushed_at < self.stats_flush_seconds:
+                return
+            counts, self._counts = self._counts, Counter()
+            self._flushed_at = time.monotonic()
+        self.flush_stats(counts)
+
+    def flush_stats(self, counts=None):
+        if counts is None:
+            with self._counts_lock:
+                counts, self._counts = self._counts, Counter()
+                self._flushed_at = time.monotonic()
+        if counts:
+            self.connection.executemany(
+                'UPDATE cache_stat SET value = value + ? WHERE name = ?',
+                [(amount, name) for name, amount in counts.items()],
+            )
+
+    def stats(self):
+        """Filas, bytes, límites, aciertos/fallos de todos los procesos y tamaño del archivo."""
+        self.flush_stats()
+        stats = dict(self.connection.execute('SELECT name, value FROM cache_stat'))
+        lookups = stats['hits'] + stats['misses']
+        files = (self.path, f'{self.path}-wal')
+        stats.update({
+            'hit_ratio': stats['hits'] / lookups if lookups else 0.0,
+            'max_entries': self._max_entries,
+            'max_size': self.max_size,
+            'file_bytes': sum(os.path.getsize(path) for path in files if os.path.exists(path)),
+            'location': self.path,
+        })
+        return stats
+
+    def reset_stats(self):
+        with self._counts_lock:
+            self._counts = Counter()
+        self.connection.execute("UPDATE cache_stat SET value = 0 WHERE name IN ('hits', 'misses', 'evictions')")
@@ -0,0 +1,487 @@
+"""
+Signals de Core
+================
+Mantienen sincronizados los datos derivados cuando cambia el contenido.
+Se conectan en CoreConfig.ready().
+"""
+
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import chapters, changelog, counters, fuzzy, payloads, quiz_stats, search, sequence, snapshot
+from .cache import bump_version
+from .models import Category, Quiz, Tag, Topic, VideoAsset
+
+
+TopicTag = Tag.topics.through
+
+# Campos de Topic cuyo valor anterior necesitan los handlers
+TRACKED_TOPIC_FIELDS = (
+    'pk', 'code', 'title', 'category_id', 'video_id', 'is_published', 'location_tag', 'start_seconds',
+)
+
+
+def topic_state(topic):
+    return {field: getattr(topic, field) for field in TRACKED_TOPIC_FIELDS}
+
+
+def send_tag_changes(topic, added, removed):
+    """
+    La tabla intermedia Tag.topics es auto-creada: Django no emite signals de
+    save/delete para sus filas, así que los cambios hechos con TagInline (que
+    edita filas directamente) no disparan m2m_changed. TopicAdmin calcula la
+    diferencia y la notifica por aquí como si fuera topic.tags.add/remove.
+    """
+    for action, pk_set in (('post_add', added), ('post_remove', removed)):
+        if pk_set:
+            m2m_changed.send(
+                sender=TopicTag, instance=topic, action=action, reverse=True,
+                model=Tag, pk_set=set(pk_set), using=topic._state.db,
+            )
+
+
+# --- Estado previo ----------------------------------------------------------
+
+@receiver(pre_save, sender=Topic)
+def remember_topic_state(sender, instance, raw=False, **kwargs):
+    """Guarda en `_previous_state` los valores en base de datos antes del save."""
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = Topic.objects.filter(pk=instance.pk).values(
+            *TRACKED_TOPIC_FIELDS
+        ).first()
+
+
+@receiver(pre_delete, sender=Topic)
+def remember_deleted_topic(sender, instance, **kwargs):
+    instance._previous_state = topic_state(instance)
+    instance._tag_ids = list(instance.tags.values_list('pk', flat=True))
+    instance._quiz_ids = quiz_stats.quizzes_for_videos([instance.video_id])
+
+
+# --- Índice de búsqueda -------------------------------------------------------
+
+@receiver(post_save, sender=Topic)
+def index_topic_on_save(sender, instance, raw=False, **kwargs):
+    """Reindexa el topic guardado."""
+    if raw:
+        return
+    search.index_topics([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+def index_tag_topics_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """Un tag renombrado cambia el documento de todos sus topics."""
+    if raw or created:
+        return
+    search.index_topics(instance.topics.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tag_topics(sender, instance, **kwargs):
+    instance._topic_ids = list(instance.topics.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def index_tag_topics_on_delete(sender, instance, **kwargs):
+    search.index_topics(getattr(instance, '_topic_ids', []))
+
+
+@receiver(m2m_changed, sender=TopicTag)
+def index_topics_on_tag_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    tag.topics.add(...) (reverse=False) o topic.tags.add(...) (reverse=True).
+    En 'clear' pk_set es None, por eso se capturan los ids en pre_clear.
+    """
+    if action == 'pre_clear':
+        if isinstance(instance, Tag):
+            instance._cleared_topic_ids = list(instance.topics.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Topic):
+        topic_ids = [instance.pk]
+    elif action == 'post_clear':
+        topic_ids = getattr(instance, '_cleared_topic_ids', [])
+    else:
+        topic_ids = pk_set or []
+    search.index_topics(topic_ids)
+
+
+# --- Trigramas (búsqueda tolerante a errores) --------------------------------
+
+@receiver(post_save, sender=Topic)
+def index_topic_trigrams(sender, instance, raw=False, **kwargs):
+    """Título nuevo o cambio de publicación (los no publicados no se indexan)."""
+    if not raw:
+        fuzzy.index_topics([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+def index_tag_trigrams(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fuzzy.index_tags([instance.pk])
+
+
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=Tag)
+def remove_trigrams(sender, instance, **kwargs):
+    fuzzy.remove('topic' if sender is Topic else 'tag', [instance.pk])
+
+
+# --- Caché de resultados de búsqueda ------------------------------------------
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_search_cache(sender, raw=False, **kwargs):
+    if not raw:
+        bump_version('search')
+
+
+@receiver(m2m_changed, sender=TopicTag)
+def invalidate_search_cache_on_tag_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version('search')
+
+
+# --- Secuencia del curso -----------------------------------------------------
+
+@receiver(post_save, sender=Topic)
+def sync_course_sequence(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sequence.sync_topic(instance)
+
+
+@receiver(pre_delete, sender=Topic)
+def unlink_course_sequence(sender, instance, **kwargs):
+    sequence.remove_topic(instance)
+
+
+# --- Contadores de Category / VideoAsset / Tag -------------------------------
+
+@receiver(post_save, sender=Topic)
+def count_topic_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        counters.topic_changed(getattr(instance, '_previous_state', None), topic_state(instance))
+
+
+@receiver(post_delete, sender=Topic)
+def count_topic_on_delete(sender, instance, **kwargs):
+    counters.topic_deleted(instance._previous_state, instance._tag_ids)
+
+
+@receiver(m2m_changed, sender=TopicTag)
+def count_tag_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    En remove/clear pk_set puede incluir relaciones inexistentes (o ser None),
+    así que las relaciones reales se consultan en la fase pre_*.
+    """
+    if isinstance(instance, Topic):
+        filter_field, other_field = 'topic_id', 'tag_id'
+    else:
+        filter_field, other_field = 'tag_id', 'topic_id'
+    if action in ('pre_remove', 'pre_clear'):
+        links = TopicTag.objects.filter(**{filter_field: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{f'{other_field}__in': pk_set})
+        instance._unlinked_ids = list(links.values_list(other_field, flat=True))
+        return
+    if action == 'post_add':
+        other_ids = list(pk_set)
+        sign = 1
+    elif action in ('post_remove', 'post_clear'):
+        # Sin fase pre_* (ver send_tag_changes) pk_set ya es exacto
+        other_ids = instance.__dict__.pop('_unlinked_ids', pk_set or [])
+        sign = -1
+    else:
+        return
+    if isinstance(instance, Topic):
+        counters.tags_linked(other_ids, [instance.pk], sign)
+    else:
+        counters.tags_linked([instance.pk], other_ids, sign)
+
+
+# --- Estadísticas de Quiz ----------------------------------------------------
+
+QuizTopic = Quiz.topics.through
+QUIZ_STATS_TOPIC_FIELDS = ('code', 'category_id', 'video_id', 'start_seconds')
+
+
+@receiver(m2m_changed, sender=QuizTopic)
+def refresh_quiz_stats_on_topics_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """quiz.topics.add(...) (reverse=False) o topic.quizzes.add(...) (reverse=True)."""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_quiz_ids = list(instance.quizzes.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        quiz_ids = [instance.pk]
+    elif action == 'post_clear':
+        quiz_ids = getattr(instance, '_cleared_quiz_ids', [])
+    else:
+        quiz_ids = pk_set or []
+    quiz_stats.refresh_quiz_stats(quiz_ids)
+
+
+@receiver(post_save, sender=Topic)
+def refresh_quiz_stats_on_topic_save(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Mover un tema (de video o de segundo) cambia también el segmento de sus
+    vecinos en el video, así que se recalculan los quizzes de ambos videos.
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    if created or previous is None:
+        video_ids = [instance.video_id]
+    elif any(previous[field] != getattr(instance, field) for field in QUIZ_STATS_TOPIC_FIELDS):
+        video_ids = [previous['video_id'], instance.video_id]
+    else:
+        return
+    quiz_stats.refresh_quiz_stats(quiz_stats.quizzes_for_videos(set(video_ids)))
+
+
+@receiver(post_delete, sender=Topic)
+def refresh_quiz_stats_on_topic_delete(sender, instance, **kwargs):
+    quiz_stats.refresh_quiz_stats(getattr(instance, '_quiz_ids', []))
+
+
+@receiver(post_save, sender=VideoAsset)
+def refresh_quiz_stats_on_video_save(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        quiz_stats.refresh_quiz_stats(quiz_stats.quizzes_for_videos([instance.pk]))
+
+
+# --- Capítulos de los videos -------------------------------------------------
+
+CHAPTER_TOPIC_FIELDS = ('code', 'title', 'video_id', 'start_seconds', 'is_published')
+
+
+@receiver(post_save, sender=Topic)
+def refresh_chapters_on_topic_save(sender, instance, created=False, raw=False, **kwargs):
+    """Sólo si cambió algo del mapa; un tema movido cambia el de ambos videos."""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    if created or previous is None:
+        chapters.refresh_videos([instance.video_id])
+    elif any(previous[field] != getattr(instance, field) for field in CHAPTER_TOPIC_FIELDS):
+        chapters.refresh_videos([previous['video_id'], instance.video_id])
+
+
+@receiver(post_delete, sender=Topic)
+def refresh_chapters_on_topic_delete(sender, instance, **kwargs):
+    chapters.refresh_videos([instance.video_id])
+
+
+@receiver(post_save, sender=VideoAsset)
+def refresh_chapters_on_video_save(sender, instance, created=False, raw=False, **kwargs):
+    """La duración es el fin del último capítulo (sólo escribe si cambió)."""
+    if not raw and not created:
+        chapters.refresh_videos([instance.pk])
+
+
+# --- Marcas de tiempo (validadores de GET condicional) ------------------------
+# Los cambios de relaciones no pasan por Topic.save(): se actualiza
+# updated_at de los topics afectados para que su ETag cambie.
+
+def touch_topics(topic_ids):
+    topic_ids = [pk for pk in topic_ids if pk is not None]
+    if topic_ids:
+        Topic.objects.filter(pk__in=topic_ids).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=TopicTag)
+@receiver(m2m_changed, sender=QuizTopic)
+def touch_topics_on_relation_change(sender, instance, action, pk_set, **kwargs):
+    if isinstance(instance, Topic):
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_topics([instance.pk])
+        return
+    if action == 'pre_clear':
+        instance._touched_topic_ids = list(
+            sender.objects.filter(**{f'{instance._meta.model_name}_id': instance.pk})
+            .values_list('topic_id', flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        touch_topics(pk_set or [])
+    elif action == 'post_clear':
+        touch_topics(instance.__dict__.pop('_touched_topic_ids', []))
+
+
+@receiver(pre_delete, sender=Quiz)
+def remember_quiz_topics(sender, instance, **kwargs):
+    instance._topic_ids = list(instance.topics.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Quiz)
+def touch_topics_on_delete(sender, instance, **kwargs):
+    touch_topics(getattr(instance, '_topic_ids', []))
+
+
+# --- Payloads de la API ------------------------------------------------------
+
+@receiver(post_save, sender=Topic)
+def refresh_payload_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        payloads.refresh_topics([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=VideoAsset)
+@receiver(post_save, sender=Tag)
+def refresh_payloads_of_related(sender, instance, created=False, raw=False, **kwargs):
+    """El payload incluye el nombre de la categoría, los datos del video y los tags."""
+    if not raw and not created:
+        payloads.refresh_topics(instance.topics.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def refresh_payloads_on_tag_delete(sender, instance, **kwargs):
+    payloads.refresh_topics(getattr(instance, '_topic_ids', []))
+
+
+@receiver(m2m_changed, sender=TopicTag)
+def refresh_payloads_on_tag_change(sender, instance, action, pk_set, **kwargs):
+    if action == 'pre_clear' and isinstance(instance, Tag):
+        instance._payload_topic_ids = list(instance.topics.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Topic):
+        topic_ids = [instance.pk]
+    elif action == 'post_clear':
+        topic_ids = instance.__dict__.pop('_payload_topic_ids', [])
+    else:
+        topic_ids = pk_set or []
+    payloads.refresh_topics(topic_ids)
+
+
+@receiver(post_migrate)
+def fill_missing_payloads(sender, app_config=None, **kwargs):
+    """Tras migrar, genera los payloads que falten (ej: la primera vez)."""
+    if app_config is not None and app_config.label == 'core':
+        payloads.refresh_topics(
+            Topic.objects.filter(payload__isnull=True).values_list('pk', flat=True)
+        )
+
+
+# --- Registro de cambios (sincronización incremental) ------------------------
+# Los temas se registran desde payloads.refresh_topics (ver arriba); aquí
+# quedan sus borrados y los demás modelos.
+
+CHANGELOG_MODELS = {Category: 'category', VideoAsset: 'video', Tag: 'tag', Quiz: 'quiz'}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=VideoAsset)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Quiz)
+def log_change_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Un quiz inactivo desaparece de los dispositivos
+    action = 'delete' if sender is Quiz and not instance.is_active else 'upsert'
+    changelog.record(CHANGELOG_MODELS[sender], [instance.pk], action=action)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=VideoAsset)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Quiz)
+def log_change_on_delete(sender, instance, **kwargs):
+    changelog.record(CHANGELOG_MODELS[sender], [instance.pk], action='delete')
+
+
+@receiver(pre_delete, sender=Topic)
+def remember_topic_quizzes(sender, instance, **kwargs):
+    instance._changelog_quiz_ids = list(instance.quizzes.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Topic)
+def log_topic_delete(sender, instance, **kwargs):
+    previous = instance._previous_state
+    changelog.record_topics([(
+        instance.pk,
+        payloads.sync_scope(previous['location_tag'], previous['category_id'], previous['is_published']),
+        None,
+    )])
+    # topic_codes de sus quizzes
+    changelog.record('quiz', instance._changelog_quiz_ids)
+
+
+@receiver(post_save, sender=Topic)
+def log_quizzes_on_code_change(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+    if not raw and previous is not None and previous['code'] != instance.code:
+        changelog.record('quiz', instance.quizzes.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=QuizTopic)
+def log_quizzes_on_topics_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._changelog_cleared_quiz_ids = list(instance.quizzes.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        quiz_ids = [instance.pk]
+    elif action == 'post_clear':
+        quiz_ids = instance.__dict__.pop('_changelog_cleared_quiz_ids', [])
+    else:
+        quiz_ids = pk_set or []
+    changelog.record('quiz', quiz_ids)
+
+
+# --- Snapshot del catálogo ---------------------------------------------------
+# Sube el sello de versión que los procesos comparan para reconstruir su
+# snapshot en memoria (core.snapshot); mismos modelos que la caché de páginas.
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=VideoAsset)
+@receiver(post_delete, sender=VideoAsset)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def touch_catalog_snapshot(sender, **kwargs):
+    snapshot.touch()
+
+
+@receiver(m2m_changed, sender=TopicTag)
+@receiver(m2m_changed, sender=QuizTopic)
+def touch_catalog_snapshot_on_relation_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        snapshot.touch()
+
+
+# --- Caché de páginas públicas -----------------------------------------------
+# Cualquier cambio de contenido invalida todas las páginas cacheadas (incluso
+# con raw=True: loaddata también cambia lo que se muestra).
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=VideoAsset)
+@receiver(post_delete, sender=VideoAsset)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_page_cache(sender, **kwargs):
+    bump_version('content')
+
+
+@receiver(m2m_changed, sender=TopicTag)
+@receiver(m2m_changed, sender=QuizTopic)
+def invalidate_page_cache_on_relation_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version('content')
@@ -0,0 +1,426 @@
+"""
+Snapshot del catálogo en memoria
+=================================
+El catálogo publicado (categorías, videos, temas, tags y los quizzes activos
+de cada tema) es chico frente al tráfico de lectura que recibe. Con
+CATALOG_SNAPSHOT=True las vistas públicas (inicio, categoría, modo curso y
+detalle del tema) lo leen de un snapshot inmutable por proceso, sin
+consultas a la base de datos.
+
+- Registros compactos con __slots__ (sin instancias de modelos ni
+  QuerySets), que exponen lo que usan las plantillas (get_embed_url,
+  get_formatted_timestamp, ...).
+- Índices: códigos ordenados (bisect), el orden de curso global y el de cada
+  categoría con sus claves (sort_key, code) para la paginación por cursor,
+  categorías y tags por slug, y postings por tag (array de posiciones en el
+  orden de curso).
+- Versión: CatalogVersion es una fila en la base de datos (pk=1, la crea la
+  migración 0018) cuyo número sube con cada cambio de contenido (touch(),
+  desde core.signals y los comandos que cambian lo que muestran las
+  páginas). Cada proceso la consulta a lo
+  sumo cada CATALOG_SNAPSHOT_CHECK_SECONDS; si cambió, construye un snapshot
+  nuevo y lo reemplaza de una vez (mientras tanto las demás requests siguen
+  con el anterior).
+- stats() informa tamaño y memoria aproximada (comando catalog_snapshot).
+"""
+
+import bisect
+import sys
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F, Max
+from django.utils import timezone
+
+from . import related, thumbnails
+from .models import (
+    CatalogVersion, Category, Quiz, RelatedTopicSet, Tag, Topic, VideoAsset, VideoThumbnail,
+)
+
+
+TopicTag = Tag.topics.through
+QuizTopic = Quiz.topics.through
+
+LOCATION_LABELS = dict(Topic.LOCATION_CHOICES)
+PLATFORM_LABELS = dict(VideoAsset.PLATFORM_CHOICES)
+
+CATALOG_VERSION_PK = 1
+
+
+def is_enabled():
+    return getattr(settings, 'CATALOG_SNAPSHOT', False)
+
+
+def get_check_interval():
+    return getattr(settings, 'CATALOG_SNAPSHOT_CHECK_SECONDS', 5)
+
+
+# ---------------------------------------------------------------------------
+# Sello de versión
+# ---------------------------------------------------------------------------
+
+def touch():
+    """
+    El contenido cambió: sube la versión del catálogo. Un solo UPDATE (la
+    fila la crea la migración 0018), seguro dentro de cualquier transacción.
+    """
+    CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK).update(
+        version=F('version') + 1, updated_at=timezone.now(),
+    )
+
+
+def current_version():
+    version = CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK).values_list('version', flat=True).first()
+    return version or 0
+
+
+# ---------------------------------------------------------------------------
+# Registros
+# ---------------------------------------------------------------------------
+
+class Record:
+    """Registro inmutable: los valores van en el orden de __slots__."""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} es de solo lectura')
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.pk}>'
+
+
+class CategoryRecord(Record):
+    __slots__ = ('pk', 'name', 'slug', 'icon', 'description', 'published_topic_count', 'topics')
+
+
+class VideoRecord(Record):
+    __slots__ = ('pk', 'title', 'platform', 'external_id', 'duration_seconds', 'chapter_map')
+
+    get_embed_url = VideoAsset.get_embed_url
+    get_watch_url = VideoAsset.get_watch_url
+
+    def get_platform_display(self):
+        return PLATFORM_LABELS.get(self.platform, self.platform)
+
+
+class TagRecord(Record):
+    __slots__ = ('pk', 'name', 'slug', 'published_topic_count')
+
+
+class QuizRecord(Record):
+    __slots__ = ('pk', 'title', 'description', 'passing_score', 'time_limit_minutes')
+
+
+class RecordTuple(tuple):
+    """Tupla con .all(), como un related manager (las plantillas usan topic.tags.all)."""
+    __slots__ = ()
+
+    def all(self):
+        return self
+
+
+class TopicRecord(Record):
+    __slots__ = (
+        'pk', 'code', 'sort_key', 'title', 'start_seconds', 'description_html', 'description_excerpt',
+        'location_tag', 'category', 'video', 'position', 'tags', 'quizzes', 'related', 'thumbnail',
+    )
+
+    get_formatted_timestamp = Topic.get_formatted_timestamp
+    get_embed_url_with_timestamp = Topic.get_embed_url_with_timestamp
+    get_video_url_with_timestamp = Topic.get_video_url_with_timestamp
+
+    def get_location_tag_display(self):
+        return LOCATION_LABELS.get(self.location_tag, self.location_tag)
+
+
+class SortedTopics:
+    """Temas en orden de curso con sus claves (sort_key, code) para bisect (core.pagination)."""
+    __slots__ = ('items', 'keys')
+
+    def __init__(self, items):
+        self.items = tuple(items)
+        self.keys = [(topic.sort_key, topic.code) for topic in self.items]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+
+# ---------------------------------------------------------------------------
+# Snapshot
+# ---------------------------------------------------------------------------
+
+def deep_size(root):
+    """Bytes aproximados de un objeto y todo lo que alcanza (cada objeto una vez)."""
+    seen = set()
+    total = 0
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif isinstance(obj, (str, bytes, int, float, bool, array)) or obj is None:
+            continue
+        else:
+            for cls in type(obj).__mro__:
+                pending.extend(getattr(obj, name) for name in getattr(cls, '__slots__', ()) if hasattr(obj, name))
+            if hasattr(obj, '__dict__'):
+                pending.append(vars(obj))
+    return total
+
+
+class CatalogSnapshot:
+    """Catálogo publicado de una versión; no cambia una vez construido."""
+
+    def __init__(self, version, modified_at, categories, videos, course, tags, postings, quiz_count, build_seconds):
+        self.version = version
+        self.modified_at = modified_at
+        self.categories = categories                                    # (CategoryRecord,) en orden
+        self.videos = videos                                            # {pk: VideoRecord}
+        self.course = course                                            # SortedTopics de todos
+        self.tags = tags                                                # {slug: TagRecord}
+        self.postings = postings                                        # {tag pk: array de posiciones}
+        self.quiz_count = quiz_count
+        self.build_seconds = build_seconds
+        self.built_at = timezone.now()
+        by_code = sorted(course, key=lambda topic: topic.code)
+        self.codes = [topic.code for topic in by_code]
+        self.by_code = tuple(by_code)
+        self.by_slug = {category.slug: category for category in categories}
+        self._footprint = None
+
+    # --- Consultas -----------------------------------------------------------
+
+    def topic(self, code):
+        """El tema publicado con ese código, o None."""
+        index = bisect.bisect_left(self.codes, code)
+        if index < len(self.codes) and self.codes[index] == code:
+            return self.by_code[index]
+        return None
+
+    def category(self, slug):
+        return self.by_slug.get(slug)
+
+    def neighbours(self, topic):
+        """(anterior, siguiente) en el orden de curso."""
+        position = topic.position
+        previous = self.course[position - 1] if position > 0 else None
+        following = self.course[position + 1] if position + 1 < len(self.course) else None
+        return previous, following
+
+    def topics_with_tag(self, slug):
+        """Temas publicados con ese tag, en orden de curso."""
+        tag = self.tags.get(slug)
+        if tag is None:
+            return []
+        return [self.course[position] for position in self.postings.get(tag.pk, ())]
+
+    # --- Tamaño ---------------------------------------------------------------
+
+    def memory_footprint(self):
+        """Bytes aproximados del snapshot (se calcula una vez)."""
+        if self._footprint is None:
+            self._footprint = deep_size([
+                self.categories, self.videos, self.course, self.tags, self.postings,
+                self.codes, self.by_code, self.by_slug,
+            ])
+        return self._footprint
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'built_at': self.built_at.isoformat(),
+            'build_seconds': round(self.build_seconds, 3),
+            'categories': len(self.categories),
+            'videos': len(self.videos),
+            'topics': len(self.course),
+            'tags': len(self.tags),
+            'quizzes': self.quiz_count,
+            'bytes': self.memory_footprint(),
+        }
+
+    # --- Construcción ---------------------------------------------------------
+
+    @classmethod
+    def build(cls):
+        """Una consulta por tipo de registro."""
+        started = time.monotonic()
+        # Versión antes de leer: un cambio concurrente provoca otra construcción
+        version = current_version()
+        modified = []
+
+        videos = {}
+        published_videos = Topic.objects.published().values('video_id')
+        for pk, *values, updated_at in VideoAsset.objects.filter(pk__in=published_videos).values_list(
+            'pk', 'title', 'platform', 'external_id', 'duration_seconds', 'chapter_map', 'updated_at'
+        ).iterator(chunk_size=2000):
+            videos[pk] = VideoRecord(pk, *values)
+            modified.append(updated_at)
+
+        tags = {}
+        published_tags = TopicTag.objects.filter(topic__is_published=True).values('tag_id')
+        for pk, name, slug, count in Tag.objects.filter(pk__in=published_tags).values_list(
+            'pk', 'name', 'slug', 'published_topic_count'
+        ):
+            tags[pk] = TagRecord(pk, name, slug, count)
+        modified.append(Tag.objects.aggregate(latest=Max('updated_at'))['latest'])
+        topic_tags = {}
+        for topic_id, tag_id in TopicTag.objects.filter(topic__is_published=True).order_by(
+            'topic_id', 'tag__name'
+        ).values_list('topic_id', 'tag_id').iterator(chunk_size=5000):
+            # (un cambio entre consultas sube la versión: el próximo snapshot lo incluye)
+            if tag_id in tags:
+                topic_tags.setdefault(topic_id, []).append(tags[tag_id])
+
+        quizzes = {}
+        for pk, *values in Quiz.objects.filter(is_active=True).values_list(
+            'pk', 'title', 'description', 'passing_score', 'time_limit_minutes'
+        ):
+            quizzes[pk] = QuizRecord(pk, *values)
+        modified.append(Quiz.objects.aggregate(latest=Max('updated_at'))['latest'])
+        topic_quizzes = {}
+        for topic_id, quiz_id in QuizTopic.objects.filter(
+            quiz__is_active=True, topic__is_published=True,
+        ).order_by('-quiz__created_at').values_list('topic_id', 'quiz_id').iterator(chunk_size=5000):
+            if quiz_id in quizzes:
+                topic_quizzes.setdefault(topic_id, []).append(quizzes[quiz_id])
+
+        neighbours = dict(RelatedTopicSet.objects.filter(topic__is_published=True).values_list(
+            'topic_id', 'neighbours'
+        ).iterator(chunk_size=2000))
+        digests = {
+            (video_id, seconds): digest
+            for video_id, seconds, digest in VideoThumbnail.objects.exclude(digest='').values_list(
+                'video_id', 'start_seconds', 'digest'
+            ).iterator(chunk_size=2000)
+        }
+
+        category_records = {}
+        for pk, *values, updated_at in Category.objects.values_list(
+            'pk', 'name', 'slug', 'icon', 'description', 'published_topic_count', 'updated_at'
+        ):
+            # Sus temas se asignan al final (necesitan el registro de la categoría)
+            category_records[pk] = CategoryRecord(pk, *values, None)
+            modified.append(updated_at)
+
+        rows = [
+            row for row in Topic.objects.published().in_course_order().values_list(
+                'pk', 'code', 'sort_key', 'title', 'start_seconds', 'description_html', 'description_excerpt',
+                'location_tag', 'category_id', 'video_id', 'updated_at',
+            ).iterator(chunk_size=2000)
+            if row[8] in category_records and row[9] in videos
+        ]
+        published = {row[1] for row in rows}
+        course = []
+        by_category = {pk: [] for pk in category_records}
+        postings = {}
+        for position, row in enumerate(rows):
+            pk, code, sort_key, title, start_seconds, html, excerpt, location_tag, category_id, video_id, _ = row
+            video = videos[video_id]
+            digest = digests.get((video_id, thumbnails.thumbnail_seconds(video, start_seconds)))
+            topic = TopicRecord(
+                pk, code, sort_key, title, start_seconds, html, excerpt, sys.intern(location_tag),
+                category_records[category_id], video, position,
+                RecordTuple(topic_tags.get(pk, ())), RecordTuple(topic_quizzes.get(pk, ())),
+                related_records(neighbours.get(pk), published),
+                thumbnails.Thumbnail(digest) if digest else None,
+            )
+            course.append(topic)
+            by_category[category_id].append(topic)
+            for tag in topic.tags:
+                postings.setdefault(tag.pk, array('I')).append(position)
+            modified.append(row[-1])
+        for pk, category in category_records.items():
+            object.__setattr__(category, 'topics', SortedTopics(by_category[pk]))
+
+        return cls(
+            version=version,
+            modified_at=max((value for value in modified if value is not None), default=None),
+            categories=tuple(category_records.values()),
+            videos=videos,
+            course=SortedTopics(course),
+            tags={tag.slug: tag for tag in tags.values()},
+            postings=postings,
+            quiz_count=len(quizzes),
+            build_seconds=time.monotonic() - started,
+        )
+
+
+def related_records(data, published):
+    """Los relacionados precalculados (core.related) que siguen publicados."""
+    if not data:
+        return ()
+    return tuple(
+        related.Related(*values)
+        for values in zip(data['topics'], data['codes'], data['titles'], data['scores'])
+        if values[1] in published
+    )
+
+
+# ---------------------------------------------------------------------------
+# Snapshot del proceso
+# ---------------------------------------------------------------------------
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_snapshot():
+    """
+    Snapshot al día del proceso. Consulta la versión a lo sumo cada
+    CATALOG_SNAPSHOT_CHECK_SECONDS; mientras un hilo reconstruye, los demás
+    siguen con el snapshot anterior.
+    """
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < get_check_interval():
+        return snapshot
+    if not _lock.acquire(blocking=snapshot is None):
+        return snapshot
+    try:
+        if _snapshot is None or time.monotonic() - _checked_at >= get_check_interval():
+            if _snapshot is None or _snapshot.version != current_version():
+                _snapshot = CatalogSnapshot.build()
+            _checked_at = time.monotonic()
+        return _snapshot
+    finally:
+        _lock.release()
+
+
+def reset():
+    """Descarta el snapshot del proceso (tests)."""
+    global _snapshot, _checked_at
+    with _lock:
+        _snapshot = None
+        _checked_at = 0.0
+
+
+def warm_up():
+    """Construye el snapshot al arrancar el proceso (si está activado y hay base)."""
+    if not is_enabled():
+        return
+    try:
+        get_snapshot()
+    except DatabaseError:
+        # Sin base (ej: antes de migrar): se construirá en la primera request
+        pass
@@ -0,0 +1,43 @@
+"""
+Capítulos en plantillas (core.chapters)
+========================================
+    {% load video_chapters %}
+    {% chapter_map topic.video as chapters %}
+    {% active_chapter topic.video 125 as chapter %}
+    {{ chapter.duration|clock }}
+"""
+
+from django import template
+
+from core import chapters as chapter_maps
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def chapter_map(video):
+    """ChapterMap del video (iterable de Chapter), sin consultas."""
+    return chapter_maps.get_map(video)
+
+
+@register.simple_tag
+def active_chapter(video, seconds):
+    """Chapter que se reproduce en ese segundo (búsqueda binaria), o None."""
+    try:
+        seconds = float(seconds)
+    except (TypeError, ValueError):
+        return None
+    return chapter_maps.get_map(video).active(seconds)
+
+
+@register.filter
+def clock(seconds):
+    """125 -> '02:05', 3665 -> '01:01:05' (vacío si no hay valor)."""
+    if seconds is None or seconds == '':
+        return ''
+    seconds = int(seconds)
+    hours, minutes = seconds // 3600, (seconds % 3600) // 60
+    if hours > 0:
+        return f"{hours:02d}:{minutes:02d}:{seconds % 60:02d}"
+    return f"{minutes:02d}:{seconds % 60:02d}"
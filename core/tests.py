@@ -1,3 +1,1860 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .admin import TopicAdmin
+from .cache import get_version, page_cache_stats
+from .importer import CatalogImporter, read_rows
+from .markup import render_description, render_markdown
+from .models import (
+    Category, ChangeLogEntry, CourseSequenceEntry, Quiz, RelatedTopicSet, SearchDocument, SearchTrigram, Tag, Topic,
+    VideoAsset, VideoThumbnail, make_sort_key,
+)
+from . import chapters, counters, fuzzy, quiz_stats, related, search, sequence, snapshot, transcripts, typeahead
+from .shared_cache import SharedCache
+from .signals import send_tag_changes
+from .thumbnails import ThumbnailError
+
+
+# Caché en memoria del proceso de tests: cache.clear() no vacía el archivo
+# compartido de los workers (var/cache.sqlite3, ver core.shared_cache)
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests'},
+}
+
+# El manifest de whitenoise sólo existe tras collectstatic
+PLAIN_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CoreTestCase(TestCase):
+    """Base de los tests de core: caché aislado del que usa el servidor."""
+
+
+class SearchIndexTests(CoreTestCase):
+    """El índice de búsqueda sigue a los temas y sus tags en los dos motores de SQLite."""
+    BACKENDS = (search.SQLiteSearchBackend, search.BasicSearchBackend)
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Caja', slug='caja')
+        video = VideoAsset.objects.create(title='Video', external_id='vid')
+        cls.topic = Topic.objects.create(
+            code='1.1', title='Apertura de caja', description='Contar la base', category=category, video=video,
+        )
+        cls.tag = Tag.objects.create(name='Datáfono', slug='datafono')
+
+    def assertFound(self, query, expected):
+        for backend in self.BACKENDS:
+            with self.subTest(backend=backend.__name__, query=query):
+                hits = [hit.topic_id for hit in backend().search(query)]
+                self.assertEqual(hits, expected)
+
+    def test_topic_edit_and_delete(self):
+        self.assertFound('apertura', [self.topic.pk])
+        self.topic.title = 'Cierre de caja'
+        self.topic.save()
+        self.assertFound('apertura', [])
+        self.assertFound('cierre', [self.topic.pk])
+        self.topic.is_published = False
+        self.topic.save()
+        self.assertFound('cierre', [])
+        self.topic.delete()
+        self.assertFalse(SearchDocument.objects.exists())
+        self.assertFound('caja', [])
+
+    def test_tag_add_remove_rename(self):
+        self.topic.tags.add(self.tag)
+        self.assertFound('datáfono', [self.topic.pk])
+        self.tag.name = 'Lector de tarjetas'
+        self.tag.save()
+        self.assertFound('tarjetas', [self.topic.pk])
+        self.tag.topics.remove(self.topic)
+        self.assertFound('tarjetas', [])
+        self.tag.topics.add(self.topic)
+        self.tag.delete()
+        self.assertFound('tarjetas', [])
+
+    def test_admin_tag_inline(self):
+        """TagInline escribe la tabla intermedia sin m2m_changed: save_related lo notifica."""
+        link = Tag.topics.through
+
+        class InlineFormset:
+            def save(self):
+                link.objects.create(topic=topic, tag=tag)
+
+        topic, tag = self.topic, self.tag
+        form = mock.Mock(instance=topic)
+        TopicAdmin(Topic, admin.site).save_related(None, form, [InlineFormset()], change=True)
+        self.assertFound('datáfono', [self.topic.pk])
+
+    def test_results_over_limit_are_flagged(self):
+        with override_settings(SEARCH_MAX_RESULTS=1):
+            Topic.objects.create(
+                code='1.2', title='Apertura de bodega', category=self.topic.category, video=self.topic.video,
+            )
+            result = search.execute('apertura')
+            self.assertEqual(len(result.ids), 1)
+            self.assertTrue(result.limited)
+            self.assertFalse(search.execute('bodega').limited)
+            response = self.client.get(reverse('core:search'), {'q': 'apertura'})
+            self.assertContains(response, 'más de 1 resultados')
+
+
+class SearchCacheTests(CoreTestCase):
+    """execute() se cachea por consulta; cualquier cambio de temas o tags lo invalida."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Caja', slug='caja')
+        video = VideoAsset.objects.create(title='Video', external_id='vid')
+        cls.topics = [
+            Topic.objects.create(code=f'1.{i}', title=f'Error {i} de caja', category=category, video=video)
+            for i in range(1, 26)
+        ]
+        cls.tag = Tag.objects.create(name='Impresora', slug='impresora')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_page_does_not_search_again(self):
+        url = reverse('core:search')
+        self.assertEqual(len(self.client.get(url, {'q': 'error caja'}).context['results']), 20)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'q': 'error caja', 'page': 2})
+        self.assertEqual(len(response.context['results']), 5)
+        self.assertEqual(response.context['total_results'], 25)
+        # Ni la consulta rankeada ni un COUNT: ids y total salen del SearchResult cacheado
+        self.assertFalse([
+            query for query in queries.captured_queries if 'bm25(' in query['sql'] or 'COUNT(' in query['sql']
+        ])
+
+    def test_content_changes_bump_version(self):
+        topic = self.topics[0]
+        changes = [
+            ('topic save', topic.save),
+            ('tag save', self.tag.save),
+            ('tag add', lambda: topic.tags.add(self.tag)),
+            ('tag remove', lambda: self.tag.topics.remove(topic)),
+            ('tag clear', lambda: (topic.tags.add(self.tag), self.tag.topics.clear())),
+            ('admin inline', lambda: send_tag_changes(topic, added={self.tag.pk}, removed=set())),
+            ('tag delete', self.tag.delete),
+            ('topic delete', self.topics[1].delete),
+        ]
+        for name, change in changes:
+            with self.subTest(change=name):
+                before = get_version('search')
+                change()
+                self.assertGreater(get_version('search'), before)
+
+    def test_cached_result_follows_changes(self):
+        self.assertEqual(search.execute('impresora').ids, [])
+        self.tag.topics.add(self.topics[0])
+        self.assertEqual(search.execute('impresora').ids, [self.topics[0].pk])
+
+
+class SortKeyTests(CoreTestCase):
+    """Orden de curso numérico por segmento (sort_key) y rangos de subárbol."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Caja', slug='caja')
+        video = VideoAsset.objects.create(title='Video', external_id='vid')
+        for code in ('10.1', '2.1', '1.13', '1.2', '1.2a', '2', '2.15', '2.1.3', '20.1'):
+            Topic.objects.create(code=code, title=f'Tema {code}', category=category, video=video)
+
+    def codes(self, topics):
+        return list(topics.values_list('code', flat=True))
+
+    def test_natural_order(self):
+        self.assertLess(make_sort_key('1.2'), make_sort_key('1.13'))
+        self.assertLess(make_sort_key('2.1'), make_sort_key('10.1'))
+        self.assertEqual(make_sort_key(' 1.2A '), make_sort_key('1.2a'))
+        self.assertEqual(
+            self.codes(Topic.objects.in_course_order()),
+            ['1.2', '1.2a', '1.13', '2', '2.1', '2.1.3', '2.15', '10.1', '20.1'],
+        )
+
+    def test_previous_and_next(self):
+        topic = Topic.objects.get(code='2.15')
+        self.assertEqual(topic.get_previous_topic().code, '2.1.3')
+        self.assertEqual(topic.get_next_topic().code, '10.1')
+        Topic.objects.filter(code='10.1').update(is_published=False)
+        self.assertEqual(topic.get_next_topic().code, '20.1')
+        self.assertIsNone(Topic.objects.get(code='1.2').get_previous_topic())
+
+    def test_subtree(self):
+        self.assertEqual(self.codes(Topic.objects.subtree('2').in_course_order()), ['2', '2.1', '2.1.3', '2.15'])
+        self.assertEqual(self.codes(Topic.objects.subtree('2.1').in_course_order()), ['2.1', '2.1.3'])
+        # Un rango por segmentos: '1' no incluye '10.1'
+        self.assertEqual(self.codes(Topic.objects.subtree('1').in_course_order()), ['1.2', '1.2a', '1.13'])
+
+    def test_backfill_and_recompute(self):
+        expected = {topic.pk: topic.sort_key for topic in Topic.objects.all()}
+        Topic.objects.update(sort_key='')
+        migration = importlib.import_module('core.migrations.0004_topic_sort_key')
+        migration.backfill_sort_keys(django_apps, None)
+        self.assertEqual(dict(Topic.objects.values_list('pk', 'sort_key')), expected)
+
+        Topic.objects.filter(code__startswith='2').update(sort_key='x')
+        out = io.StringIO()
+        call_command('recompute_sort_keys', stdout=out)
+        self.assertIn('5 claves de orden actualizadas', out.getvalue())
+        self.assertEqual(dict(Topic.objects.values_list('pk', 'sort_key')), expected)
+
+
+class CourseSequenceTests(CoreTestCase):
+    """El reenlace incremental de la secuencia deja lo mismo que rebuild()."""
+    FIELDS = (
+        'topic_id', 'category_id', 'sort_key', 'code', 'position', 'category_position',
+        'prev_topic_id', 'next_topic_id', 'category_prev_topic_id', 'category_next_topic_id',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.caja = Category.objects.create(name='Caja', slug='caja')
+        cls.bodega = Category.objects.create(name='Bodega', slug='bodega')
+        cls.video = VideoAsset.objects.create(title='Video', external_id='vid')
+        cls.topics = {
+            code: Topic.objects.create(
+                code=code, title=f'Tema {code}', category=category, video=cls.video, is_published=published,
+            )
+            for code, category, published in [
+                ('1.1', cls.caja, True), ('1.2', cls.bodega, True), ('1.3', cls.caja, False),
+                ('1.10', cls.caja, True), ('2.1', cls.bodega, True), ('2.2', cls.caja, True),
+            ]
+        }
+
+    def state(self):
+        return list(CourseSequenceEntry.objects.order_by('topic_id').values_list(*self.FIELDS))
+
+    def assertMatchesRebuild(self):
+        incremental = self.state()
+        sequence.rebuild()
+        self.assertEqual(incremental, self.state())
+
+    def test_publish_and_unpublish(self):
+        self.assertMatchesRebuild()
+        Topic.objects.create(code='1.4', title='Nuevo', category=self.bodega, video=self.video)
+        self.assertMatchesRebuild()
+        hidden = self.topics['1.3']
+        hidden.is_published = True
+        hidden.save()
+        self.assertMatchesRebuild()
+        for code in ('1.1', '2.2', '1.10'):  # primero, último y del medio
+            topic = self.topics[code]
+            topic.is_published = False
+            topic.save()
+            self.assertMatchesRebuild()
+
+    def test_recode_and_category_move(self):
+        topic = self.topics['1.2']
+        topic.code = '2.5'
+        topic.save()
+        self.assertMatchesRebuild()
+        topic.code = '0.1'
+        topic.save()
+        self.assertMatchesRebuild()
+        topic.category = self.caja
+        topic.save()
+        self.assertMatchesRebuild()
+        topic.code, topic.category = '1.11', self.bodega
+        topic.save()
+        self.assertMatchesRebuild()
+
+    def test_delete(self):
+        self.topics['1.10'].delete()
+        self.assertMatchesRebuild()
+        self.topics['1.3'].delete()
+        self.assertMatchesRebuild()
+        self.topics['1.1'].delete()
+        self.assertMatchesRebuild()
+        entry = CourseSequenceEntry.objects.get(topic=self.topics['1.2'])
+        self.assertEqual((entry.position, entry.prev_topic_id), (1, None))
+
+    def test_batch_rebuilds_once(self):
+        with mock.patch.object(sequence, 'rebuild', wraps=sequence.rebuild) as rebuild:
+            with self.captureOnCommitCallbacks(execute=True), sequence.batch():
+                for code in ('1.1', '1.2', '2.1'):
+                    topic = self.topics[code]
+                    topic.code = f'9.{code}'
+                    topic.save()
+        rebuild.assert_called_once()
+        self.assertEqual(
+            list(CourseSequenceEntry.objects.values_list('code', flat=True)),
+            ['1.10', '2.2', '9.1.1', '9.1.2', '9.2.1'],
+        )
+
+    def test_batch_rebuilds_after_an_error(self):
+        # Lo guardado antes del error queda (autocommit): la secuencia debe seguirlo
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with sequence.batch():
+                topic = self.topics['1.1']
+                topic.is_published = False
+                topic.save()
+                raise RuntimeError('falla a mitad del lote')
+        self.assertFalse(CourseSequenceEntry.objects.filter(topic=topic).exists())
+        self.assertMatchesRebuild()
+
+        # Dentro de una transacción revertida no hay nada que reconstruir
+        deleted = self.topics['1.2'].pk
+        with self.captureOnCommitCallbacks() as callbacks, self.assertRaises(RuntimeError):
+            with transaction.atomic(), sequence.batch():
+                self.topics['1.2'].delete()
+                raise RuntimeError('falla a mitad del lote')
+        self.assertEqual(callbacks, [])
+        self.assertTrue(CourseSequenceEntry.objects.filter(topic_id=deleted).exists())
+
+    def test_relink_takes_lock_before_reading(self):
+        topic = self.topics['2.1']
+        topic.code = '0.5'
+        with CaptureQueriesContext(connection) as queries:
+            sequence.sync_topic(topic)
+        statements = [query['sql'] for query in queries.captured_queries]
+        lock = next(index for index, sql in enumerate(statements) if 'SET position = position WHERE 0' in sql)
+        first_read = next(index for index, sql in enumerate(statements) if 'FROM "core_coursesequenceentry"' in sql)
+        self.assertLess(lock, first_read)
+
+
+class CounterTests(CoreTestCase):
+    """Los deltas de los signals dejan los contadores igual que reconcile()."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.caja = Category.objects.create(name='Caja', slug='caja')
+        cls.bodega = Category.objects.create(name='Bodega', slug='bodega')
+        cls.video = VideoAsset.objects.create(title='Video', external_id='vid')
+        cls.other_video = VideoAsset.objects.create(title='Otro', external_id='otro')
+        cls.tags = [Tag.objects.create(name=f'Tag {i}', slug=f'tag-{i}') for i in range(3)]
+
+    def create_topic(self, code, published=True):
+        return Topic.objects.create(
+            code=code, title=f'Tema {code}', category=self.caja, video=self.video, is_published=published,
+        )
+
+    def assertInSync(self):
+        self.assertEqual(set(counters.reconcile().values()), {0})
+
+    def test_topic_changes(self):
+        topic = self.create_topic('1.1')
+        draft = self.create_topic('1.2', published=False)
+        self.assertInSync()
+        self.caja.refresh_from_db()
+        self.assertEqual((self.caja.topic_count, self.caja.published_topic_count), (2, 1))
+
+        topic.tags.add(*self.tags[:2])
+        for change in (
+            lambda: setattr(topic, 'is_published', False),
+            lambda: setattr(topic, 'is_published', True),
+            lambda: setattr(topic, 'category', self.bodega),
+            lambda: setattr(topic, 'video', self.other_video),
+            lambda: (setattr(draft, 'category', self.bodega), draft.save()),
+        ):
+            change()
+            topic.save()
+            self.assertInSync()
+
+        topic.delete()
+        self.assertInSync()
+        draft.delete()
+        self.assertInSync()
+        self.bodega.refresh_from_db()
+        self.assertEqual((self.bodega.topic_count, self.bodega.published_topic_count), (0, 0))
+
+    def test_tag_changes(self):
+        topic = self.create_topic('1.1')
+        draft = self.create_topic('1.2', published=False)
+        first, second, third = self.tags
+        first.topics.add(topic, draft)
+        self.assertInSync()
+        topic.tags.add(second, third)
+        self.assertInSync()
+        # Quitar relaciones inexistentes no descuenta nada
+        second.topics.remove(topic, draft)
+        self.assertInSync()
+        first.topics.clear()
+        self.assertInSync()
+        topic.tags.clear()
+        self.assertInSync()
+        # Inline del admin: filas escritas a mano + send_tag_changes
+        Tag.topics.through.objects.create(tag=third, topic=draft)
+        send_tag_changes(draft, added={third.pk}, removed=set())
+        self.assertInSync()
+        third.delete()
+        self.assertInSync()
+
+    def test_reconcile_fixes_drift(self):
+        self.create_topic('1.1').tags.add(self.tags[0])
+        Category.objects.filter(pk=self.caja.pk).update(topic_count=7)
+        Tag.objects.filter(pk=self.tags[0].pk).update(published_topic_count=0)
+        out = io.StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('categorías: 1 fila(s) corregida(s)', out.getvalue().lower())
+        self.assertInSync()
+        self.assertEqual(Tag.objects.get(pk=self.tags[0].pk).published_topic_count, 1)
+
+
+class QuizStatsTests(CoreTestCase):
+    """Las estadísticas cacheadas de Quiz siguen a sus temas y videos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Caja', slug='caja')
+        long_video = VideoAsset.objects.create(title='Largo', external_id='largo', duration_seconds=600)
+        short_video = VideoAsset.objects.create(title='Corto', external_id='corto', duration_seconds=300)
+        unknown = VideoAsset.objects.create(title='Sin duración', external_id='nada')
+        topics = {}
+        for code, video, start in [
+            ('1.1', long_video, 0), ('1.2', long_video, 100), ('1.3', long_video, 400),
+            ('2.1', short_video, 50), ('3.1', unknown, 10),
+        ]:
+            topics[code] = Topic.objects.create(
+                code=code, title=f'Tema {code}', category=category, video=video, start_seconds=start,
+            )
+        cls.long_video, cls.topics = long_video, topics
+        cls.quiz = Quiz.objects.create(title='Quiz')
+        cls.quiz.topics.add(topics['1.3'], topics['2.1'], topics['1.2'], topics['3.1'])
+
+    def stats(self):
+        quiz = Quiz.objects.get(pk=self.quiz.pk)
+        return (
+            quiz.stats_total_duration_seconds, quiz.stats_segment_seconds,
+            quiz.stats_topic_count, quiz.stats_category_count, quiz.stats_topic_codes,
+        )
+
+    def test_refresh_quiz_stats(self):
+        Quiz.objects.update(stats_total_duration_seconds=0, stats_segment_seconds=0, stats_topic_codes='')
+        self.assertEqual(quiz_stats.refresh_quiz_stats([self.quiz.pk, self.quiz.pk]), 1)
+        # Un video repetido suma una vez; el último segmento llega al final del video
+        # y un video sin duración no aporta: (400-100) + (600-400) + (300-50)
+        self.assertEqual(self.stats(), (900, 750, 4, 1, '1.2,1.3,2.1,3.1'))
+
+    def test_signals_keep_stats_fresh(self):
+        self.long_video.duration_seconds = 700
+        self.long_video.save()
+        self.assertEqual(self.stats()[:2], (1000, 850))
+        # El siguiente tema del video acota el segmento aunque no esté en el quiz
+        topic = self.topics['1.1']
+        topic.start_seconds = 200
+        topic.save()
+        self.assertEqual(self.stats()[:2], (1000, 650))
+        self.quiz.topics.remove(self.topics['2.1'])
+        self.assertEqual(self.stats(), (700, 400, 3, 1, '1.2,1.3,3.1'))
+
+    def test_migration_backfill_matches(self):
+        expected = self.stats()
+        Quiz.objects.update(stats_total_duration_seconds=0, stats_segment_seconds=0, stats_topic_codes='')
+        migration = importlib.import_module('core.migrations.0007_quiz_stats')
+        migration.backfill_stats(django_apps, None)
+        self.assertEqual(self.stats(), expected)
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class AdminChangelistQueryBudgetTests(CoreTestCase):
+    """
+    Cada changelist del admin debe costar un número fijo de consultas,
+    sin importar cuántas filas tenga la página (sin N+1).
+    """
+    ROWS = 100  # list_per_page por defecto
+
+    # Máximo de consultas por changelist: sesión, usuario, conteos del
+    # paginador, opciones de filtros, la página y sus prefetch.
+    BUDGETS = {
+        'category': 6,
+        'videoasset': 6,
+        'topic': 8,
+        'tag': 7,
+        'quiz': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        categories = [
+            Category.objects.create(name=f'Categoría {i}', slug=f'categoria-{i}', order=i)
+            for i in range(cls.ROWS)
+        ]
+        videos = [
+            VideoAsset.objects.create(title=f'Video {i}', external_id=f'vid{i}', duration_seconds=600)
+            for i in range(cls.ROWS)
+        ]
+        topics = [
+            Topic.objects.create(
+                code=f'{i // 10 + 1}.{i % 10 + 1}',
+                title=f'Tema {i}',
+                category=categories[i],
+                video=videos[i],
+                start_seconds=i,
+            )
+            for i in range(cls.ROWS)
+        ]
+        for i in range(cls.ROWS):
+            tag = Tag.objects.create(name=f'Error {i}', slug=f'error-{i}')
+            tag.topics.add(*topics[i:i + 7])
+            quiz = Quiz.objects.create(title=f'Quiz {i}')
+            quiz.topics.add(*topics[i:i + 4])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_changelist_queries(self, model_name, rows=ROWS):
+        url = reverse(f'admin:core_{model_name}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), rows)
+        return len(queries)
+
+    def test_changelists_stay_within_query_budget(self):
+        for model_name, budget in self.BUDGETS.items():
+            with self.subTest(model=model_name):
+                self.assertLessEqual(self.count_changelist_queries(model_name), budget)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        full_page = {name: self.count_changelist_queries(name) for name in self.BUDGETS}
+        # Dejar 10 filas por modelo (borrar categorías/videos arrastra sus temas)
+        for model in (Quiz, Tag, Category, VideoAsset):
+            keep = model.objects.order_by('pk').values_list('pk', flat=True)[:10]
+            model.objects.exclude(pk__in=list(keep)).delete()
+        for name, queries in full_page.items():
+            with self.subTest(model=name):
+                self.assertEqual(self.count_changelist_queries(name, rows=10), queries)
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class PageCacheTests(CoreTestCase):
+    """Las páginas públicas se sirven del caché hasta que cambia el contenido."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Errores', slug='errores')
+        video = VideoAsset.objects.create(title='Video', external_id='vid', duration_seconds=600)
+        cls.topic = Topic.objects.create(
+            code='1.1', title='Tema original', category=category, video=video, is_published=True
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_second_request_skips_the_database(self):
+        url = reverse('core:course_mode')
+        first, _ = self.get(url)
+        second, queries = self.get(url)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(queries, 0)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(page_cache_stats()['hit'], 1)
+
+    def test_query_string_is_part_of_the_key(self):
+        self.get(reverse('core:course_mode'))
+        response, _ = self.get(reverse('core:course_mode') + '?page=1')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+
+    def test_content_change_invalidates(self):
+        url = reverse('core:topic_detail', args=[self.topic.code])
+        self.get(url)
+        self.topic.title = 'Tema editado'
+        self.topic.save()
+        response, _ = self.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Tema editado')
+
+    def test_authenticated_users_bypass_the_cache(self):
+        self.client.force_login(User.objects.create_user('editor', password='editor'))
+        url = reverse('core:home')
+        self.get(url)
+        response, _ = self.get(url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class ConditionalGetTests(CoreTestCase):
+    """Las visitas repetidas se responden con 304 sin renderizar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Errores', slug='errores')
+        video = VideoAsset.objects.create(title='Video', external_id='vid', duration_seconds=600)
+        cls.topic = Topic.objects.create(
+            code='1.1', title='Tema', category=cls.category, video=video, is_published=True
+        )
+        cls.tag = Tag.objects.create(name='Error 505', slug='error-505')
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, etag):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, len(queries)
+
+    def test_not_modified_without_rendering(self):
+        for url in (
+            reverse('core:home'),
+            reverse('core:topic_detail', args=[self.topic.code]),
+            reverse('core:category_list', args=[self.category.slug]),
+            reverse('core:course_mode'),
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                etag = self.client.get(url)['ETag']
+                response, _ = self.revalidate(url, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                # Sin cambios de contenido el validador sale del caché
+                _, queries = self.revalidate(url, etag)
+                self.assertEqual(queries, 0)
+
+    def test_if_modified_since(self):
+        url = reverse('core:topic_detail', args=[self.topic.code])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_tag_change_changes_topic_etag(self):
+        url = reverse('core:topic_detail', args=[self.topic.code])
+        etag = self.client.get(url)['ETag']
+        self.tag.topics.add(self.topic)
+        response, _ = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Error 505')
+
+    def test_deleting_a_topic_changes_listing_etag(self):
+        other = Topic.objects.create(
+            code='1.2', title='Otro', category=self.category, video=self.topic.video, is_published=True
+        )
+        url = reverse('core:course_mode')
+        etag = self.client.get(url)['ETag']
+        other.delete()
+        response, _ = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleting_an_older_topic_moves_last_modified(self):
+        Topic.objects.create(
+            code='1.2', title='Otro', category=self.category, video=self.topic.video, is_published=True
+        )
+        url = reverse('core:course_mode')
+        last_modified = self.client.get(url)['Last-Modified']
+        # La fila más nueva sigue ahí: sin ajuste la fecha no cambiaría
+        self.topic.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([topic.code for topic in response.context['page_obj']], ['1.2'])
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(STORAGES=PLAIN_STORAGES, PAGE_CACHE_TIMEOUT=0)
+class KeysetPaginationTests(CoreTestCase):
+    """CourseView recorre el curso por cursor; cualquier página cuesta lo mismo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Errores', slug='errores')
+        video = VideoAsset.objects.create(title='Video', external_id='vid', duration_seconds=600)
+        for major in range(1, 6):
+            for minor in range(1, 26):
+                Topic.objects.create(
+                    code=f'{major}.{minor}', title=f'Tema {major}.{minor}',
+                    category=category, video=video, is_published=True,
+                )
+        cls.expected = list(Topic.objects.in_course_order().values_list('code', flat=True))
+
+    def get_page(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('core:course_mode'), params)
+        page = response.context['page_obj']
+        return page, [topic.code for topic in page], len(queries)
+
+    def test_walks_the_whole_course_in_both_directions(self):
+        page, codes, first_queries = self.get_page()
+        seen = list(codes)
+        while page.has_next():
+            page, codes, queries = self.get_page(after=page.next_cursor)
+            self.assertEqual(queries, first_queries)
+            seen += codes
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(page.total, len(self.expected))
+
+        back = list(codes)
+        while page.has_previous():
+            page, codes, _ = self.get_page(before=page.previous_cursor)
+            back = codes + back
+        self.assertEqual(back, self.expected)
+
+    def test_jump_to_code(self):
+        page, codes, _ = self.get_page(code='3.10')
+        self.assertEqual(codes[0], '3.10')
+        self.assertTrue(page.has_previous())
+        page, codes, _ = self.get_page(code='9.1')
+        self.assertEqual(codes[-1], '5.25')
+        self.assertFalse(page.has_next())
+
+    def test_invalid_cursor_starts_from_the_beginning(self):
+        _, codes, _ = self.get_page(after='no-es-un-cursor')
+        self.assertEqual(codes[0], '1.1')
+
+
+class CatalogImportTests(CoreTestCase):
+    """import_catalog: upsert por código en lotes, sin signals por fila."""
+
+    CSV = (
+        'code,title,category,platform,external_id,start_seconds,tags\n'
+        '1.10,Facturación,ventas,youtube,vid1,1:30,Error 505|Caja\n'
+        '1.2,Clientes,ventas,youtube,vid1,0,Caja\n'
+        '2.1,Sin categoría,no-existe,youtube,vid2,0,\n'
+        '1.3,Recepción,ventas,vimeo,vid1,abc,\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ventas', slug='ventas')
+
+    def run_import(self, data, **kwargs):
+        errors = []
+        report = CatalogImporter(batch_size=1, **kwargs).run(
+            read_rows(io.StringIO(data), 'csv'),
+            on_error=lambda line, error: errors.append(line),
+        )
+        return report, errors
+
+    def test_import_creates_topics_videos_and_tags(self):
+        report, errors = self.run_import(self.CSV)
+        self.assertEqual((report.created, report.batches, errors), (2, 2, [4, 5]))
+        topic = Topic.objects.get(code='1.10')
+        self.assertEqual(topic.start_seconds, 90)
+        self.assertEqual(topic.sort_key, '000001.000010')
+        self.assertEqual(sorted(topic.tags.values_list('name', flat=True)), ['Caja', 'Error 505'])
+        self.assertEqual(VideoAsset.objects.get().topic_count, 2)
+        self.assertEqual(Tag.objects.get(name='Caja').topic_count, 2)
+        self.assertEqual(
+            list(CourseSequenceEntry.objects.values_list('code', flat=True)), ['1.2', '1.10']
+        )
+
+    def test_reimport_updates_by_code_and_replaces_tags(self):
+        self.run_import(self.CSV)
+        report, _ = self.run_import(
+            'code,title,category,external_id,tags\n1.10,Facturación v2,ventas,vid1,Caja\n'
+        )
+        self.assertEqual((report.created, report.updated), (0, 1))
+        topic = Topic.objects.get(code='1.10')
+        self.assertEqual(topic.title, 'Facturación v2')
+        self.assertEqual(list(topic.tags.values_list('name', flat=True)), ['Caja'])
+        self.assertEqual(Tag.objects.get(name='Error 505').topic_count, 0)
+
+    def test_dry_run_saves_nothing(self):
+        report, _ = self.run_import(self.CSV, dry_run=True)
+        self.assertEqual(report.created, 2)
+        self.assertFalse(Topic.objects.exists())
+        self.assertFalse(VideoAsset.objects.exists())
+
+
+class CatalogExportTests(CoreTestCase):
+    """Exportación en streaming: sólo staff y reimportable con import_catalog."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ventas', slug='ventas')
+        video = VideoAsset.objects.create(title='Video', external_id='vid', duration_seconds=600)
+        topic = Topic.objects.create(code='1.1', title='Tema', category=category, video=video, start_seconds=75)
+        Tag.objects.create(name='Caja', slug='caja').topics.add(topic)
+        cls.staff = User.objects.create_user('staff', password='staff', is_staff=True)
+
+    def test_requires_staff(self):
+        response = self.client.get(reverse('core:catalog_export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_streams_jsonl_of_every_model(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('core:catalog_export'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['model'] for line in lines], ['category', 'video', 'topic', 'tag']
+        )
+        topic = json.loads(lines[2])
+        self.assertEqual(topic['watch_url'], 'https://www.youtube.com/watch?v=vid&t=75s')
+        self.assertEqual(topic['tags'], 'Caja')
+
+    def test_topic_csv_round_trips_through_the_importer(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('core:catalog_export'), {'model': 'topic', 'format': 'csv'})
+        data = b''.join(response.streaming_content).decode()
+        report = CatalogImporter().run(read_rows(io.StringIO(data), 'csv'))
+        self.assertEqual((report.created, report.updated, report.errors), (0, 1, 0))
+
+    def test_csv_of_several_models_is_rejected(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('core:catalog_export'), {'model': ['topic', 'tag'], 'format': 'csv'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiTests(CoreTestCase):
+    """API JSON: payloads pre-serializados, ETag y selección de campos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ventas', slug='ventas')
+        cls.video = VideoAsset.objects.create(title='Video', external_id='vid', duration_seconds=600)
+        for minor in (1, 2, 10):
+            Topic.objects.create(
+                code=f'1.{minor}', title=f'Tema {minor}', category=cls.category,
+                video=cls.video, start_seconds=minor * 60,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_json(self, url, params=None, **headers):
+        response = self.client.get(url, params or {}, **headers)
+        return response, json.loads(response.content) if response.content else None
+
+    def test_topic_list_pages_by_cursor_with_selected_fields(self):
+        url = reverse('core:api_topics')
+        _, data = self.get_json(url, {'limit': 2, 'fields': 'code,timestamp'})
+        self.assertEqual(data['results'], [
+            {'code': '1.1', 'timestamp': '01:00'}, {'code': '1.2', 'timestamp': '02:00'}
+        ])
+        _, data = self.get_json(url, {'limit': 2, 'after': data['next']})
+        self.assertEqual([topic['code'] for topic in data['results']], ['1.10'])
+        self.assertEqual(data['results'][0]['embed_url'], 'https://www.youtube.com/embed/vid?start=600')
+        self.assertIsNone(data['next'])
+
+    def test_unknown_field_is_rejected(self):
+        response, data = self.get_json(reverse('core:api_topics'), {'fields': 'code,secreto'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag_changes_when_related_content_changes(self):
+        url = reverse('core:api_topic_detail', args=['1.1'])
+        response, _ = self.get_json(url)
+        etag = response['ETag']
+        response, _ = self.get_json(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.video.external_id = 'otro'
+        self.video.save()
+        response, data = self.get_json(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['video']['external_id'], 'otro')
+
+    def test_payload_follows_tag_changes(self):
+        tag = Tag.objects.create(name='Caja', slug='caja')
+        tag.topics.add(Topic.objects.get(code='1.2'))
+        _, data = self.get_json(reverse('core:api_topic_detail', args=['1.2']))
+        self.assertEqual(data['tags'], ['Caja'])
+        tag.delete()
+        _, data = self.get_json(reverse('core:api_topic_detail', args=['1.2']))
+        self.assertEqual(data['tags'], [])
+
+    def test_unpublished_topic_is_not_found(self):
+        Topic.objects.filter(code='1.1').update(is_published=False)
+        Topic.objects.get(code='1.1').save()
+        response, _ = self.get_json(reverse('core:api_topic_detail', args=['1.1']))
+        self.assertEqual(response.status_code, 404)
+
+
+class SyncApiTests(CoreTestCase):
+    """Feed incremental: última versión de cada objeto, tombstones y filtros."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ventas', slug='ventas')
+        cls.video = VideoAsset.objects.create(title='Video', external_id='vid')
+        cls.bodega = Topic.objects.create(
+            code='1.1', title='Recepción', category=cls.category, video=cls.video, location_tag='bodega',
+        )
+        cls.caja = Topic.objects.create(
+            code='1.2', title='Cobro', category=cls.category, video=cls.video, location_tag='caja',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def sync(self, **params):
+        response = self.client.get(reverse('core:api_sync'), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def changed(self, data):
+        return {(change['model'], change['id'], change['action']) for change in data['changes']}
+
+    def test_full_sync_then_only_what_changed(self):
+        data = self.sync()
+        self.assertFalse(data['more'])
+        self.assertEqual(self.changed(data), {
+            ('category', self.category.pk, 'upsert'), ('video', self.video.pk, 'upsert'),
+            ('topic', self.bodega.pk, 'upsert'), ('topic', self.caja.pk, 'upsert'),
+        })
+        version = data['version']
+
+        self.bodega.title = 'Recepción de mercadería'
+        self.bodega.save()
+        self.bodega.save()  # sin cambios: no agrega nada
+        data = self.sync(since=version)
+        self.assertEqual(len(data['changes']), 1)
+        self.assertEqual(data['changes'][0]['data']['title'], 'Recepción de mercadería')
+        self.assertEqual(self.sync(since=data['version'])['changes'], [])
+
+    def test_deletes_are_tombstones(self):
+        version = self.sync()['version']
+        tag = Tag.objects.create(name='Inventario', slug='inventario')
+        tag_id, topic_id = tag.pk, self.caja.pk
+        tag.delete()
+        self.caja.delete()
+        self.assertEqual(self.changed(self.sync(since=version)), {
+            ('tag', tag_id, 'delete'), ('topic', topic_id, 'delete'),
+        })
+
+    def test_location_filter_and_moves(self):
+        data = self.sync(location='bodega')
+        self.assertEqual(
+            {change['id'] for change in data['changes'] if change['model'] == 'topic'}, {self.bodega.pk}
+        )
+        version = data['version']
+        self.bodega.location_tag = 'caja'
+        self.bodega.save()
+        self.assertEqual(self.changed(self.sync(since=version, location='bodega')), {
+            ('topic', self.bodega.pk, 'delete'),
+        })
+        self.assertEqual(self.changed(self.sync(since=version, location='caja')), {
+            ('topic', self.bodega.pk, 'upsert'),
+        })
+        response = self.client.get(reverse('core:api_sync'), {'location': 'luna'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_pages_with_limit(self):
+        first = self.sync(limit=3)
+        self.assertTrue(first['more'])
+        rest = self.sync(since=first['version'], limit=3)
+        self.assertFalse(rest['more'])
+        self.assertEqual(len(first['changes']) + len(rest['changes']), 4)
+
+    def test_import_is_logged(self):
+        version = self.sync()['version']
+        rows = read_rows(io.StringIO(
+            'code,title,category,external_id,tags\n1.3,Nuevo,ventas,nuevo,Caja\n'
+        ), 'csv')
+        CatalogImporter().run(rows)
+        topic = Topic.objects.get(code='1.3')
+        self.assertEqual(self.changed(self.sync(since=version)), {
+            ('topic', topic.pk, 'upsert'), ('video', topic.video_id, 'upsert'),
+            ('tag', Tag.objects.get(slug='caja').pk, 'upsert'),
+        })
+
+    @override_settings(CHANGELOG_COMMIT_LAG_SECONDS=60)
+    def test_recent_entries_are_held_back(self):
+        # Una entrada con id más nuevo puede confirmarse antes que otra aún abierta:
+        # la versión no pasa de las entradas de los últimos segundos
+        self.assertEqual(self.sync(), {'version': 0, 'changes': [], 'more': False})
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        version = self.sync()['version']
+        self.caja.title = 'Cobro con tarjeta'
+        self.caja.save()
+        self.assertEqual(self.sync(since=version), {'version': version, 'changes': [], 'more': False})
+        ChangeLogEntry.objects.filter(id__gt=version).update(created_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.changed(self.sync(since=version)), {('topic', self.caja.pk, 'upsert')})
+
+
+class FakePlatformHandler(BaseHTTPRequestHandler):
+    """Imita YouTube Data API y el oEmbed de Vimeo; el primer request de Vimeo falla con 503."""
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.requests.append(url.path)
+        if url.path == '/youtube/videos':
+            items = [
+                {'id': video_id, 'contentDetails': {'duration': 'PT1H2M3S'},
+                 'snippet': {'publishedAt': '2024-03-01T10:00:00Z'}}
+                for video_id in query['id'][0].split(',') if video_id != 'borrado'
+            ]
+            return self.reply(200, {'items': items})
+        if url.path == '/vimeo/oembed.json':
+            if self.requests.count(url.path) == 1:
+                return self.reply(503, {})
+            return self.reply(200, {'duration': 95, 'upload_date': '2023-12-24 08:00:00'})
+        self.reply(404, {})
+
+    def reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 503:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class VideoMetadataTests(CoreTestCase):
+    """fetch_video_metadata contra un servidor HTTP local."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakePlatformHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        FakePlatformHandler.requests = []
+        base = f'http://127.0.0.1:{self.server.server_port}'
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        settings = override_settings(
+            VIDEO_METADATA={
+                'youtube': {'base_url': f'{base}/youtube', 'api_key': 'clave', 'rate': 0},
+                'vimeo': {'base_url': f'{base}/vimeo', 'rate': 0},
+                'cloudflare': {'base_url': f'{base}/cloudflare'},
+                'drive': {'base_url': f'{base}/drive', 'api_key': 'clave', 'rate': 0},
+            },
+            VIDEO_METADATA_CACHE_DIR=cache_dir.name,
+            VIDEO_METADATA_CACHE_TIMEOUT=3600,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def fetch(self, *args):
+        call_command('fetch_video_metadata', *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_fills_blank_metadata_and_quiz_stats(self):
+        category = Category.objects.create(name='Ventas', slug='ventas')
+        youtube = VideoAsset.objects.create(title='A', external_id='abc')
+        vimeo = VideoAsset.objects.create(title='B', platform='vimeo', external_id='123')
+        gone = VideoAsset.objects.create(title='C', external_id='borrado')
+        cloudflare = VideoAsset.objects.create(title='D', platform='cloudflare', external_id='cf')
+        topic = Topic.objects.create(code='1.1', title='Tema', category=category, video=youtube)
+        quiz = Quiz.objects.create(title='Quiz')
+        quiz.topics.add(topic)
+
+        self.fetch()
+        youtube.refresh_from_db()
+        vimeo.refresh_from_db()
+        self.assertEqual(youtube.duration_seconds, 3723)
+        self.assertEqual(str(youtube.uploaded_date), '2024-03-01')
+        # El primer intento a Vimeo respondió 503 y se reintentó
+        self.assertEqual(vimeo.duration_seconds, 95)
+        self.assertEqual(FakePlatformHandler.requests.count('/vimeo/oembed.json'), 2)
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.stats_total_duration_seconds, 3723)
+        gone.refresh_from_db()
+        self.assertIsNone(gone.duration_seconds)
+        self.assertIsNotNone(gone.metadata_checked_at)
+        # Cloudflare sin credenciales: ni se consulta ni se marca
+        cloudflare.refresh_from_db()
+        self.assertIsNone(cloudflare.metadata_checked_at)
+
+        # Lo recién consultado no se repite; con --recheck-hours 0 sale del caché en disco
+        FakePlatformHandler.requests = []
+        self.fetch()
+        self.assertEqual(FakePlatformHandler.requests, [])
+        VideoAsset.objects.update(duration_seconds=None)
+        self.fetch('--recheck-hours', '0')
+        self.assertEqual(FakePlatformHandler.requests, [])
+        youtube.refresh_from_db()
+        self.assertEqual(youtube.duration_seconds, 3723)
+
+    def test_existing_values_are_kept_unless_overwrite(self):
+        video = VideoAsset.objects.create(title='A', external_id='abc', duration_seconds=60)
+        self.fetch()
+        video.refresh_from_db()
+        self.assertEqual(video.duration_seconds, 60)
+        self.assertEqual(str(video.uploaded_date), '2024-03-01')
+        self.fetch('--all', '--overwrite', '--recheck-hours', '0')
+        video.refresh_from_db()
+        self.assertEqual(video.duration_seconds, 3723)
+
+
+class FakeThumbnailFetcher:
+    """Imagen generada en memoria; registra las URLs pedidas."""
+    urls = []
+
+    def fetch(self, url):
+        self.urls.append(url)
+        buffer = io.BytesIO()
+        Image.new('RGB', (1280, 720), (len(self.urls) * 40 % 256, 80, 120)).save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+
+@override_settings(
+    STORAGES=PLAIN_STORAGES,
+    THUMBNAIL_FETCHER='core.tests.FakeThumbnailFetcher',
+)
+class ThumbnailTests(CoreTestCase):
+    """Miniaturas descargadas una vez, servidas localmente e inmutables."""
+
+    def setUp(self):
+        cache.clear()
+        FakeThumbnailFetcher.urls = []
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        category = Category.objects.create(name='Ventas', slug='ventas')
+        self.youtube = VideoAsset.objects.create(title='A', external_id='abc')
+        self.cloudflare = VideoAsset.objects.create(title='B', platform='cloudflare', external_id='cf')
+        for code, video, start in (('1.1', self.youtube, 30), ('1.2', self.cloudflare, 0), ('1.3', self.cloudflare, 95)):
+            Topic.objects.create(code=code, title=f'Tema {code}', category=category, video=video, start_seconds=start)
+
+    def fetch(self, *args):
+        call_command('fetch_thumbnails', *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_home_uses_local_immutable_thumbnails(self):
+        self.fetch()
+        # Póster de YouTube y un cuadro por tema de Cloudflare
+        self.assertEqual(len(FakeThumbnailFetcher.urls), 3)
+        self.assertTrue(any('time=95s' in url for url in FakeThumbnailFetcher.urls))
+        self.fetch()
+        self.assertEqual(len(FakeThumbnailFetcher.urls), 3)
+
+        html = self.client.get(reverse('core:home')).content.decode()
+        self.assertNotIn('img.youtube.com', html)
+        self.assertEqual(html.count('<picture'), 3)
+        url = re.search(r'src="(/thumbs/[^"]+\.jpg)"', html).group(1)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.client.get('/thumbs/../settings.py').status_code, 404)
+
+    def test_failed_download_is_retried_later(self):
+        with override_settings(THUMBNAIL_FETCHER='core.thumbnails.HttpFetcher'), \
+                mock.patch('core.thumbnails.HttpFetcher.fetch', side_effect=ThumbnailError('sin red')):
+            self.fetch()
+        self.assertFalse(VideoThumbnail.objects.exclude(digest='').exists())
+        self.assertNotIn('<picture', self.client.get(reverse('core:home')).content.decode())
+        self.fetch()
+        self.assertEqual(VideoThumbnail.objects.exclude(digest='').count(), 3)
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class DescriptionMarkupTests(CoreTestCase):
+    """Markdown convertido y saneado al guardar; las plantillas leen lo guardado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ventas', slug='ventas')
+        cls.video = VideoAsset.objects.create(title='Video', external_id='vid')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rendered_on_save_and_sanitized(self):
+        topic = Topic.objects.create(
+            code='1.1', title='Cobro', category=self.category, video=self.video,
+            description='**Paso 1**: abrir caja <script>alert(1)</script>\n\n[ver](javascript:alert(1)) [manual](https://example.com)',
+        )
+        self.assertIn('<strong>Paso 1</strong>', topic.description_html)
+        self.assertNotIn('<script>', topic.description_html)
+        self.assertNotIn('javascript:', topic.description_html)
+        self.assertIn('<a href="https://example.com" rel="noopener nofollow">manual</a>', topic.description_html)
+        self.assertTrue(topic.description_excerpt.startswith('Paso 1: abrir caja'))
+
+        topic.description = 'Otra *cosa*'
+        topic.save(update_fields=['description'])
+        topic.refresh_from_db()
+        self.assertEqual(topic.description_html, '<p>Otra <em>cosa</em></p>')
+        self.assertEqual(topic.description_excerpt, 'Otra cosa')
+
+        html = self.client.get(reverse('core:topic_detail', args=['1.1'])).content.decode()
+        self.assertIn('<p>Otra <em>cosa</em></p>', html)
+
+    def test_footnote_links_keep_prefixed_ids(self):
+        html = render_markdown('Cobro[^1].\n\n## Pasos {#header}\n\n[^1]: Con tarjeta.')
+        self.assertIn('<sup id="descripcion-fnref:1"><a href="#descripcion-fn:1">1</a></sup>', html)
+        self.assertIn('<li id="descripcion-fn:1">', html)
+        self.assertIn('href="#descripcion-fnref:1"', html)
+        # Cualquier otro id se descarta
+        self.assertIn('<h2>Pasos</h2>', html)
+
+    def test_migration_renderer_matches(self):
+        migration = importlib.import_module('core.migrations.0013_topic_description_html')
+        description = (
+            '# Cierre\n\n**Paso 1**[^1]: <b>x</b> [ver](javascript:alert(1)) [manual](https://example.com)\n'
+            'otra línea\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\n[^1]: Nota.'
+        )
+        frozen = Topic(description=description)
+        migration.render_description(frozen)
+        live = Topic(description=description)
+        render_description(live)
+        self.assertEqual(
+            (frozen.description_html, frozen.description_excerpt), (live.description_html, live.description_excerpt)
+        )
+
+    def test_render_descriptions_command(self):
+        topic = Topic.objects.create(
+            code='1.1', title='Cobro', category=self.category, video=self.video, description='uno\ndos',
+        )
+        self.assertEqual(topic.description_html, '<p>uno<br>\ndos</p>')
+        with override_settings(MARKDOWN_EXTENSIONS=['extra']):
+            call_command('render_descriptions', stdout=io.StringIO())
+        topic.refresh_from_db()
+        self.assertEqual(topic.description_html, '<p>uno\ndos</p>')
+
+
+class TypeaheadTests(CoreTestCase):
+    """Sugerencias desde el índice en memoria, sin consultas, al día con los cambios."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ventas', slug='ventas')
+        video = VideoAsset.objects.create(title='Video', external_id='vid')
+        for code, title in (('2.1', 'Apertura de caja'), ('2.10', 'Error 505 en datáfono'), ('2.2', 'Cierre')):
+            Topic.objects.create(code=code, title=title, category=category, video=video)
+        Tag.objects.create(name='Error 505', slug='error-505')
+
+    def setUp(self):
+        cache.clear()
+        typeahead._index = None
+
+    def suggest(self, query):
+        response = self.client.get(reverse('core:api_suggest'), {'q': query})
+        return [item.get('code') or item['name'] for item in json.loads(response.content)['results']]
+
+    def test_prefixes_of_codes_titles_and_tags(self):
+        self.assertEqual(self.suggest('2.1'), ['2.1', '2.10'])
+        self.assertEqual(self.suggest('2'), ['2.1', '2.2', '2.10'])
+        self.assertEqual(self.suggest('error 50'), ['2.10', 'Error 505'])
+        self.assertEqual(self.suggest('DATAFONO'), ['2.10'])
+        self.assertEqual(self.suggest('zzz'), [])
+        with self.assertNumQueries(0):
+            self.suggest('caj')
+
+    def test_index_follows_content_changes(self):
+        self.suggest('2')
+        topic = Topic.objects.get(code='2.2')
+        topic.title = 'Cuadre de caja'
+        topic.save()
+        Topic.objects.get(code='2.1').delete()
+        self.assertEqual(self.suggest('apertura'), [])
+        self.assertEqual(self.suggest('caja'), ['2.2'])
+        self.assertEqual(self.suggest('cuadre'), ['2.2'])
+        self.assertEqual(self.suggest('2'), ['2.2', '2.10'])
+
+    def test_tag_counts_follow_tagging_and_publishing(self):
+        printer = Tag.objects.create(name='Impresora', slug='impresora')
+
+        def suggested_count():
+            response = self.client.get(reverse('core:api_suggest'), {'q': 'impre'})
+            return [item['topic_count'] for item in json.loads(response.content)['results']]
+
+        self.assertEqual(suggested_count(), [0])
+        topic = Topic.objects.get(code='2.1')
+        printer.topics.add(topic)
+        self.assertEqual(suggested_count(), [1])
+        topic.is_published = False
+        topic.save()
+        self.assertEqual(suggested_count(), [0])
+
+    @override_settings(CHANGELOG_COMMIT_LAG_SECONDS=60)
+    def test_held_back_changes_are_applied_later(self):
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        self.suggest('2')
+        topic = Topic.objects.get(code='2.2')
+        topic.title = 'Cuadre de caja'
+        topic.save()
+        # El cambio está retenido en el registro: el índice lo reintenta en cada consulta
+        self.assertEqual(self.suggest('cuadre'), [])
+        self.assertIsNone(typeahead._index.content_version)
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.suggest('cuadre'), ['2.2'])
+        with self.assertNumQueries(0):
+            self.suggest('cuadre')
+
+
+class FuzzySearchTests(CoreTestCase):
+    """Consultas con errores de tipeo: temas parecidos por título o tag y sugerencia."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Caja', slug='caja')
+        video = VideoAsset.objects.create(title='Video', external_id='vid')
+        cls.error = Topic.objects.create(code='1.1', title='Error 505 al facturar', category=category, video=video)
+        cls.balance = Topic.objects.create(code='1.2', title='Cuadre diario', category=category, video=video)
+        Topic.objects.create(code='1.3', title='Apertura de caja', category=category, video=video)
+        tag = Tag.objects.create(name='Saldo negativo', slug='saldo-negativo')
+        tag.topics.add(cls.balance)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_typos_match_titles_and_tags(self):
+        result = search.execute('eror 505')
+        self.assertEqual(result.ids, [self.error.pk])
+        self.assertTrue(result.fuzzy)
+        self.assertEqual(result.suggestion, 'error 505')
+
+        result = search.execute('saldo negatvo')
+        self.assertEqual(result.ids, [self.balance.pk])
+        self.assertEqual(result.suggestion, 'saldo negativo')
+
+    def test_exact_results_skip_fuzzy_search(self):
+        result = search.execute('error 505')
+        self.assertEqual(result.ids, [self.error.pk])
+        self.assertFalse(result.fuzzy)
+        self.assertEqual(result.suggestion, '')
+        self.assertEqual(search.execute('xyzzy').ids, [])
+
+    def test_trigrams_follow_content_changes(self):
+        self.error.title = 'Error 404 al facturar'
+        self.error.save()
+        self.assertEqual(search.execute('eror 505').ids, [])
+        self.balance.is_published = False
+        self.balance.save()
+        self.assertEqual(search.execute('saldo negatvo').ids, [])
+        Tag.objects.get(slug='saldo-negativo').delete()
+        self.assertFalse(SearchTrigram.objects.filter(kind='tag').exists())
+
+    def test_search_page_shows_suggestion(self):
+        response = self.client.get(reverse('core:search'), {'q': 'eror 505'})
+        self.assertContains(response, '¿Quisiste decir')
+        self.assertContains(response, '?q=error%20505')
+        self.assertEqual(response.context['total_results'], 1)
+
+    def test_migration_trigrams_match(self):
+        migration = importlib.import_module('core.migrations.0014_searchtrigram')
+        for text in ('Facturación electrónica', 'Error_505 en CAJA', '', None):
+            self.assertEqual(migration.trigrams(text), fuzzy.trigrams(text))
+
+
+class SearchFacetTests(CoreTestCase):
+    """Facetas con conteos en consultas fijas y filtros por parámetros."""
+
+    @classmethod
+    def setUpTestData(cls):
+        sales = Category.objects.create(name='Ventas', slug='ventas')
+        stock = Category.objects.create(name='Inventario', slug='inventario')
+        youtube = VideoAsset.objects.create(title='YT', external_id='yt')
+        vimeo = VideoAsset.objects.create(title='Vimeo', external_id='vm', platform='vimeo')
+        printer = Tag.objects.create(name='Impresora', slug='impresora')
+        rows = [
+            ('1.1', sales, youtube, 'caja'), ('1.2', sales, vimeo, 'caja'),
+            ('1.3', sales, youtube, 'bodega'), ('2.1', stock, youtube, 'bodega'),
+        ]
+        for code, category, video, location in rows:
+            topic = Topic.objects.create(
+                code=code, title=f'Error de impresión {code}', category=category, video=video, location_tag=location,
+            )
+            if category == sales:
+                printer.topics.add(topic)
+        for index in range(30):
+            Tag.objects.create(name=f'Otro {index}', slug=f'otro-{index}').topics.add(Topic.objects.get(code='2.1'))
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, facets, name):
+        return {item['value']: item['count'] for item in facets.get(name, [])}
+
+    def test_facet_counts_in_two_queries(self):
+        result = search.execute('impresión')
+        with self.assertNumQueries(2):
+            facets = search.compute_facets(result.ids)
+        self.assertEqual(self.counts(facets, 'category'), {'ventas': 3, 'inventario': 1})
+        self.assertEqual(self.counts(facets, 'location'), {'caja': 2, 'bodega': 2})
+        self.assertEqual(self.counts(facets, 'platform'), {'youtube': 3, 'vimeo': 1})
+        self.assertEqual(facets['tag'][0], {'value': 'impresora', 'label': 'Impresora', 'count': 3, 'selected': False})
+        self.assertEqual(len(facets['tag']), search.FACET_TAG_LIMIT)
+
+    def test_filters_narrow_results_and_counts(self):
+        result = search.execute('impresión', {'category': ('ventas',), 'platform': ('youtube',)})
+        self.assertEqual(
+            sorted(Topic.objects.filter(pk__in=result.ids).values_list('code', flat=True)), ['1.1', '1.3']
+        )
+        self.assertEqual(self.counts(result.facets, 'location'), {'caja': 1, 'bodega': 1})
+        self.assertTrue(result.facets['category'][0]['selected'])
+        # Cada faceta ignora su propio filtro: sus otras opciones no quedan en cero
+        self.assertEqual(self.counts(result.facets, 'category'), {'ventas': 2, 'inventario': 1})
+        self.assertEqual(self.counts(result.facets, 'platform'), {'youtube': 2, 'vimeo': 1})
+        self.assertEqual(self.counts(result.facets, 'tag'), {'impresora': 2})
+
+    def test_facets_exclude_their_own_filter_in_two_queries(self):
+        ids = search.execute('impresión').ids
+        filters = {'location': ('bodega',), 'tag': ('impresora',)}
+        with self.assertNumQueries(2):
+            facets = search.compute_facets(ids, filters)
+        self.assertEqual(self.counts(facets, 'location'), {'caja': 2, 'bodega': 1})
+        self.assertEqual(self.counts(facets, 'category'), {'ventas': 1})
+        self.assertEqual(self.counts(facets, 'tag')['impresora'], 1)
+        self.assertEqual(self.counts(facets, 'tag')['otro-0'], 1)
+
+    def test_search_page_links_toggle_filters(self):
+        response = self.client.get(reverse('core:search'), {'q': 'impresión', 'location': 'caja', 'tag': 'impresora'})
+        self.assertEqual(response.context['total_results'], 2)
+        groups = {group['name']: group['items'] for group in response.context['facet_groups']}
+        caja = next(item for item in groups['location'] if item['value'] == 'caja')
+        self.assertTrue(caja['selected'])
+        self.assertNotIn('location=', caja['url'])
+        self.assertIn('tag=impresora', caja['url'])
+
+        response = self.client.get(reverse('core:api_search'), {'q': 'impresión', 'platform': 'vimeo'})
+        body = json.loads(response.content)
+        self.assertEqual(body['total'], 1)
+        self.assertEqual(body['filters'], {'platform': ['vimeo']})
+
+
+class ChapterMapTests(CoreTestCase):
+    """Mapa de capítulos por video: se mantiene al cambiar sus temas y se consulta por segundo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Caja', slug='caja')
+        cls.video = VideoAsset.objects.create(title='Video', external_id='vid', duration_seconds=600)
+        cls.other = VideoAsset.objects.create(title='Otro', external_id='otro')
+        for code, title, start in (('1.2', 'Ventas', 95), ('1.1', 'Apertura', 0), ('1.3', 'Cierre', 310)):
+            Topic.objects.create(code=code, title=title, category=cls.category, video=cls.video, start_seconds=start)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_map_is_sorted_with_derived_ends(self):
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.chapter_map['starts'], [0, 95, 310])
+        self.assertEqual(self.video.chapter_map['ends'], [95, 310, 600])
+        self.assertEqual(self.video.chapter_map['codes'], ['1.1', '1.2', '1.3'])
+        chapter_map = chapters.get_map(self.video)
+        self.assertEqual([chapter_map.locate(second) for second in (0, 94.5, 95, 599, 600)], [0, 0, 1, 2, None])
+        self.assertEqual(chapter_map.active(200).duration, 215)
+
+    def test_migration_backfill_matches(self):
+        self.video.refresh_from_db()
+        expected = self.video.chapter_map
+        VideoAsset.objects.update(chapter_map={})
+        migration = importlib.import_module('core.migrations.0015_videoasset_chapter_map')
+        migration.build_existing_maps(django_apps, None)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.chapter_map, expected)
+        self.assertEqual(migration.build_map([], 300), chapters.build_map([], 300))
+
+    def test_map_follows_topic_changes_only_of_its_video(self):
+        moved = Topic.objects.get(code='1.2')
+        moved.video = self.other
+        moved.save()
+        self.video.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.video.chapter_map['codes'], ['1.1', '1.3'])
+        self.assertEqual(self.other.chapter_map['ends'], [None])
+
+        stamp = self.video.updated_at
+        Topic.objects.get(code='1.1').save()  # sin cambios del mapa: no se reescribe
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.updated_at, stamp)
+
+        self.video.duration_seconds = 700
+        self.video.save()
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.chapter_map['ends'], [310, 700])
+
+    def test_endpoint_and_template(self):
+        url = reverse('core:api_video_chapters', kwargs={'pk': self.video.pk})
+        body = json.loads(self.client.get(url, {'t': 120}).content)
+        self.assertEqual(body['topics'], list(Topic.objects.order_by('start_seconds').values_list('pk', flat=True)))
+        self.assertEqual(body['active'], 1)
+        self.assertEqual(self.client.get(url, {'t': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('core:api_video_chapters', kwargs={'pk': 0})).status_code, 404)
+
+        response = self.client.get(reverse('core:topic_detail', kwargs={'code': '1.2'}))
+        self.assertContains(response, 'chapterPlayer(1)')
+        self.assertContains(response, '05:10')
+        self.assertContains(response, 'id="chapter-map"')
+
+
+VTT_SAMPLE = """WEBVTT
+
+NOTE generado por la plataforma
+
+1
+00:00:01.000 --> 00:00:04.500 align:start
+<v Ana>Bienvenidos a la capacitación</v>
+
+00:01:30.000 --> 00:01:33.000
+Si el datáfono muestra &quot;saldo negativo&quot;
+reinicien la terminal
+
+01:00.000 --> 01:02.000
+Primero abran la caja
+"""
+
+SRT_SAMPLE = """1\r
+00:00:02,000 --> 00:00:05,000\r
+<i>Cierre del turno</i>\r
+\r
+2\r
+00:02:10,250 --> 00:02:12,000\r
+Cuenten el efectivo dos veces\r
+"""
+
+
+class TranscriptTests(CoreTestCase):
+    """Transcripciones WebVTT/SRT: almacenamiento compacto y búsqueda con enlace al segundo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Caja', slug='caja')
+        cls.video = VideoAsset.objects.create(title='Turno', external_id='abc123', duration_seconds=300)
+        Topic.objects.create(code='1.1', title='Apertura', category=category, video=cls.video, start_seconds=0)
+        Topic.objects.create(code='1.2', title='Datáfono', category=category, video=cls.video, start_seconds=80)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_parses_webvtt_and_srt(self):
+        segments = transcripts.parse_captions(VTT_SAMPLE)
+        self.assertEqual([segment.start_ms for segment in segments], [1000, 60000, 90000])
+        self.assertEqual(segments[0].text, 'Bienvenidos a la capacitación')
+        self.assertEqual(segments[2].text, 'Si el datáfono muestra "saldo negativo" reinicien la terminal')
+        segments = transcripts.parse_captions(SRT_SAMPLE)
+        self.assertEqual([(segment.start_ms, segment.text) for segment in segments],
+                         [(2000, 'Cierre del turno'), (130250, 'Cuenten el efectivo dos veces')])
+        with self.assertRaises(transcripts.TranscriptError):
+            transcripts.parse_captions('hola')
+
+    def test_stored_compactly_in_chunks(self):
+        transcript = transcripts.save_transcript(self.video, transcripts.parse_captions(VTT_SAMPLE))
+        self.assertEqual(transcript.starts, [1000, 60000, 90000])
+        self.assertEqual(transcript.text.count('\n'), 2)
+        self.assertEqual(
+            list(transcript.chunks.order_by('first_segment').values_list('first_segment', flat=True)), [0, 2]
+        )
+
+    def test_search_returns_deep_link_and_topic(self):
+        transcripts.save_transcript(self.video, transcripts.parse_captions(VTT_SAMPLE))
+        hits = transcripts.search('saldo negativo')
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(hits[0].start_seconds, 90)
+        self.assertEqual(hits[0].topic.code, '1.2')
+        self.assertEqual(hits[0].embed_url, 'https://www.youtube.com/embed/abc123?start=90')
+        self.assertIn('<mark>saldo</mark>', hits[0].snippet)
+        self.assertEqual(transcripts.search('abran caja')[0].start_seconds, 60)
+
+        body = json.loads(self.client.get(reverse('core:api_transcript_search'), {'q': 'datafono'}).content)
+        self.assertEqual(body['results'][0]['topic'], {'code': '1.2', 'title': 'Datáfono'})
+        response = self.client.get(reverse('core:search'), {'q': 'reinicien'})
+        self.assertContains(response, 'Dicho en los videos')
+        self.assertContains(response, 'embed/abc123?start=90')
+
+    def test_import_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(f'{directory}/abc123.es.srt', 'w', encoding='utf-8') as stream:
+                stream.write(SRT_SAMPLE)
+            with open(f'{directory}/desconocido.vtt', 'w', encoding='utf-8') as stream:
+                stream.write(VTT_SAMPLE)
+            out, err = io.StringIO(), io.StringIO()
+            call_command('import_transcripts', directory, stdout=out, stderr=err)
+        self.assertIn('1 transcripción(es) importada(s) (2 segmentos), 1 con error', out.getvalue())
+        self.assertIn('desconocido', err.getvalue())
+        self.assertEqual(self.video.transcripts.get().language, 'es')
+
+
+class RelatedTopicsTests(CoreTestCase):
+    """"Ver también": TF-IDF y co-ocurrencia de tags, recalculando sólo lo que cambió."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Caja', slug='caja')
+        video = VideoAsset.objects.create(title='Video', external_id='vid')
+        rows = [
+            ('1.1', 'Anulación de factura electrónica', 'Cómo anular una factura ya emitida'),
+            ('1.2', 'Nota crédito de factura electrónica', 'Devolver una factura emitida con nota crédito'),
+            ('1.3', 'Arqueo de caja', 'Contar el efectivo al cierre del turno'),
+            ('1.4', 'Cierre de turno', 'Arqueo y entrega del efectivo'),
+            ('1.5', 'Recepción de mercancía', 'Descargue del camión en bodega'),
+            ('1.6', 'Inventario cíclico', 'Conteo de estantes en bodega'),
+        ]
+        cls.topics = {
+            code: Topic.objects.create(
+                code=code, title=title, description=description, category=category, video=video,
+            )
+            for code, title, description in rows
+        }
+        cls.facturas = Tag.objects.create(name='Facturación', slug='facturacion')
+        cls.dian = Tag.objects.create(name='DIAN', slug='dian')
+        cls.bodega = Tag.objects.create(name='Bodega', slug='bodega')
+        cls.facturas.topics.add(cls.topics['1.1'], cls.topics['1.2'])
+        cls.dian.topics.add(cls.topics['1.2'])
+        cls.bodega.topics.add(cls.topics['1.5'], cls.topics['1.6'])
+
+    def setUp(self):
+        cache.clear()
+
+    def codes(self, code):
+        return RelatedTopicSet.objects.get(topic__code=code).neighbours['codes']
+
+    def test_similar_topics_first(self):
+        self.assertEqual(related.refresh(full=True), 6)
+        self.assertEqual(self.codes('1.1')[0], '1.2')
+        self.assertEqual(self.codes('1.3')[0], '1.4')
+        self.assertEqual(self.codes('1.5')[0], '1.6')
+        self.assertNotIn('1.1', self.codes('1.1'))
+        # Nada cambió: no se escribe nada
+        self.assertEqual(related.refresh(), 0)
+        self.assertEqual(related.refresh(full=True), 0)
+
+    def test_tag_cooccurrence_relates_topics_without_shared_tags(self):
+        corpus = related.load_corpus()
+        anular, nota = (corpus.ids.index(self.topics[code].pk) for code in ('1.1', '1.2'))
+        tags = related.tag_matrix([tag_id for tag_id, _ in topic_tags] for topic_tags in corpus.tags)
+        # DIAN va con Facturación: el vector de tags de 1.1 también la incluye
+        self.assertEqual(tags[anular].nnz, 2)
+        self.assertGreater((tags[anular] @ tags[nota].T).toarray()[0, 0], 0.5)
+
+    def test_incremental_refresh_only_touches_changed_rows(self):
+        related.refresh(full=True)
+        untouched = RelatedTopicSet.objects.get(topic=self.topics['1.5']).computed_at
+
+        cierre = self.topics['1.4']
+        cierre.title = 'Inventario de bodega'
+        cierre.save()
+        self.assertGreater(related.refresh(), 0)
+        self.assertEqual(self.codes('1.4')[0], '1.6')
+        self.assertEqual(RelatedTopicSet.objects.get(topic=self.topics['1.5']).computed_at, untouched)
+
+        # Despublicado: su lista sale y desaparece de las demás
+        hidden = self.topics['1.2']
+        hidden.is_published = False
+        hidden.save()
+        related.refresh()
+        self.assertFalse(RelatedTopicSet.objects.filter(topic=hidden).exists())
+        self.assertNotIn('1.2', self.codes('1.1'))
+
+    def test_detail_page_reads_list_without_extra_queries(self):
+        url = reverse('core:topic_detail', kwargs={'code': '1.1'})
+        self.assertNotContains(self.client.get(url), 'fa-project-diagram')
+        call_command('refresh_related_topics', '--full', stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'fa-project-diagram')
+        self.assertContains(response, reverse('core:topic_detail', kwargs={'code': '1.2'}))
+        # Viene con el tema (select_related), sin consultas propias
+        self.assertFalse([
+            query for query in queries.captured_queries if 'FROM "core_relatedtopicset"' in query['sql']
+        ])
+
+
+@override_settings(CATALOG_SNAPSHOT=True, CATALOG_SNAPSHOT_CHECK_SECONDS=3600)
+class CatalogSnapshotTests(CoreTestCase):
+    """Snapshot del catálogo en memoria: páginas públicas sin consultas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.caja = Category.objects.create(name='Caja', slug='caja')
+        cls.bodega = Category.objects.create(name='Bodega', slug='bodega')
+        video = VideoAsset.objects.create(title='Video', external_id='vid', duration_seconds=600)
+        cls.topics = [
+            Topic.objects.create(
+                code=f'1.{i}', title=f'Tema {i}', category=cls.caja if i % 2 else cls.bodega,
+                video=video, start_seconds=i * 10,
+            )
+            for i in range(1, 26)
+        ]
+        Topic.objects.create(code='9.1', title='Borrador', category=cls.caja, video=video, is_published=False)
+        cls.tag = Tag.objects.create(name='Cierre', slug='cierre')
+        cls.tag.topics.add(cls.topics[2], cls.topics[0])
+        quiz = Quiz.objects.create(title='Repaso de caja')
+        quiz.topics.add(cls.topics[0])
+
+    def setUp(self):
+        cache.clear()
+        snapshot.reset()
+
+    def test_indexes(self):
+        catalog = snapshot.get_snapshot()
+        self.assertEqual(len(catalog.course), 25)
+        self.assertIsNone(catalog.topic('9.1'))
+        self.assertEqual(catalog.topic('1.10').title, 'Tema 10')
+        # Orden de curso natural (1.2 antes que 1.10) y por categoría
+        self.assertEqual([topic.code for topic in catalog.course[:3]], ['1.1', '1.2', '1.3'])
+        self.assertEqual(len(catalog.category('caja').topics), 13)
+        self.assertEqual([topic.code for topic in catalog.topics_with_tag('cierre')], ['1.1', '1.3'])
+        self.assertEqual([tag.name for tag in catalog.topic('1.1').tags.all()], ['Cierre'])
+        self.assertEqual(catalog.neighbours(catalog.topic('1.1')), (None, catalog.topic('1.2')))
+        self.assertGreater(catalog.memory_footprint(), 0)
+        with self.assertRaises(AttributeError):
+            catalog.topic('1.1').title = 'Otro'
+
+    def test_public_pages_without_queries(self):
+        snapshot.get_snapshot()
+        urls = [
+            reverse('core:home'),
+            reverse('core:topic_detail', kwargs={'code': '1.1'}),
+            reverse('core:category_list', kwargs={'slug': 'caja'}),
+            reverse('core:course_mode'),
+        ]
+        for url in urls:
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+        response = self.client.get(urls[1])
+        self.assertContains(response, 'Repaso de caja')
+        self.assertContains(response, 'Cierre')
+        self.assertEqual(self.client.get(reverse('core:topic_detail', kwargs={'code': '9.1'})).status_code, 404)
+
+    def test_cursor_pagination(self):
+        url = reverse('core:course_mode')
+        page = self.client.get(url).context['page_obj']
+        self.assertEqual(len(page), 25)
+        self.assertFalse(page.has_other_pages())
+
+        url = reverse('core:category_list', kwargs={'slug': 'caja'})
+        with override_settings(PAGE_CACHE_TIMEOUT=0):
+            first = self.client.get(url).context['page_obj']
+            self.assertEqual(first.total, 13)
+            self.assertEqual(len(first), 13)
+            page = self.client.get(url, {'code': '1.23'}).context['page_obj']
+            self.assertEqual([topic.code for topic in page], ['1.23', '1.25'])
+            self.assertTrue(page.has_previous())
+            previous = self.client.get(url, {'before': page.previous_cursor}).context['page_obj']
+            self.assertEqual(previous.object_list[-1].code, '1.21')
+
+    def test_rebuilds_when_version_changes(self):
+        first = snapshot.get_snapshot()
+        topic = self.topics[0]
+        topic.title = 'Apertura de caja'
+        topic.save()
+        # Dentro del intervalo sigue el snapshot anterior
+        self.assertIs(snapshot.get_snapshot(), first)
+        with override_settings(CATALOG_SNAPSHOT_CHECK_SECONDS=0):
+            current = snapshot.get_snapshot()
+            self.assertGreater(current.version, first.version)
+            self.assertEqual(current.topic('1.1').title, 'Apertura de caja')
+            # Sin cambios no se reconstruye
+            self.assertIs(snapshot.get_snapshot(), current)
+
+    def test_page_cache_follows_the_snapshot_version(self):
+        url = reverse('core:topic_detail', kwargs={'code': '1.1'})
+        self.assertContains(self.client.get(url), 'Tema 1')
+        topic = self.topics[0]
+        topic.title = 'Apertura de caja'
+        topic.save()
+        # Dentro del intervalo la página sale del snapshot anterior...
+        response = self.client.get(url)
+        self.assertContains(response, 'Tema 1')
+        etag = response['ETag']
+        # ...pero queda cacheada bajo su versión, no bajo la nueva versión de contenido
+        with override_settings(CATALOG_SNAPSHOT_CHECK_SECONDS=0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Apertura de caja')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(self.client.get(url), 'Apertura de caja')
+
+    def test_touch_is_a_single_update(self):
+        # La fila la crea la migración: touch() no necesita crearla (ni romper una transacción)
+        version = snapshot.current_version()
+        with CaptureQueriesContext(connection) as queries:
+            snapshot.touch()
+        self.assertEqual([query['sql'].split()[0] for query in queries.captured_queries], ['UPDATE'])
+        self.assertEqual(snapshot.current_version(), version + 1)
+
+
+class SharedCacheTests(CoreTestCase):
+    """core.shared_cache: un archivo SQLite compartido por varios procesos."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/cache.sqlite3'
+
+    def make_cache(self, **options):
+        return SharedCache(self.path, {'OPTIONS': {'ACCESS_RESOLUTION': 0, **options}})
+
+    def test_workers_share_entries_and_versions(self):
+        worker, other = self.make_cache(), self.make_cache()
+        worker.set('page', {'html': 'x' * 10000})
+        self.assertEqual(other.get('page'), {'html': 'x' * 10000})
+        self.assertTrue(worker.add('version', 7, timeout=None))
+        self.assertFalse(other.add('version', 1))
+        self.assertEqual(other.incr('version'), 8)
+        self.assertEqual(worker.incr('version', 2), 10)
+        with self.assertRaises(ValueError):
+            worker.incr('missing')
+        worker.set('gone', 1, timeout=0)
+        self.assertIsNone(other.get('gone'))
+        self.assertTrue(other.add('gone', 2))
+        other.delete('page')
+        self.assertEqual(worker.get_many(['page', 'version', 'gone']), {'version': 10, 'gone': 2})
+
+    def test_concurrent_increments_are_not_lost(self):
+        self.make_cache().set('counter', 0)
+
+        def increment():
+            cache = self.make_cache()
+            for _ in range(100):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.make_cache().get('counter'), 400)
+
+    def test_evicts_least_recently_used(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        for i in range(10):
+            cache.set(f'key-{i}', i)
+        cache.get('key-0')
+        cache.set('key-10', 10)
+        self.assertEqual(cache.get('key-0'), 0)
+        self.assertIsNone(cache.get('key-1'))
+        self.assertEqual(cache.get('key-10'), 10)
+        stats = cache.stats()
+        self.assertLessEqual(stats['entries'], 10)
+        self.assertEqual(stats['evictions'], 11 - stats['entries'])
+
+    def test_size_limit(self):
+        cache = self.make_cache(MAX_SIZE=10000, COMPRESS_MIN_SIZE=10 ** 6)
+        for i in range(8):
+            cache.set(f'page-{i}', str(i) * 3000)
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 10000)
+        self.assertEqual(cache.get('page-7'), '7' * 3000)
+        self.assertIsNone(cache.get('page-0'))
+
+    def test_stats_view_is_staff_only(self):
+        url = reverse('core:cache_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.force_login(user)
+        data = self.client.get(url).json()
+        self.assertIn('hit', data['pages'])
+        if data['store'] is not None:
+            self.assertIn('evictions', data['store'])
 
-# Create your tests here.
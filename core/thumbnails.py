@@ -0,0 +1,191 @@
+"""
+Miniaturas locales
+===================
+Las páginas no enlazan imágenes de terceros: cada póster se descarga una vez
+(comando fetch_thumbnails), se recorta a 16:9 y se guarda en MEDIA_ROOT en
+varios anchos, en WebP y JPEG:
+
+    thumbnails/<hash>-<ancho>.<webp|jpg>
+
+El hash es del contenido descargado, así que la URL cambia sólo si cambia la
+imagen y ThumbnailView la sirve con caché de un año e `immutable`.
+
+- Cloudflare Stream genera cuadros por tiempo: cada tema tiene su miniatura
+  en su start_seconds. Las demás plataformas usan el póster del video.
+- La descarga la hace THUMBNAIL_FETCHER (ruta importable, por defecto
+  HttpFetcher); los tests usan uno que no sale a la red.
+- attach(topics) carga en una consulta las miniaturas de una lista de temas
+  (topic.thumbnail, None si aún no hay).
+"""
+
+import hashlib
+import io
+import json
+import re
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import VideoThumbnail
+from .video_metadata import get_providers
+
+
+DIRECTORY = 'thumbnails'
+WIDTHS = (320, 640)
+ASPECT_RATIO = 16 / 9
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 6}), 'jpg': ('JPEG', {'quality': 82, 'optimize': True})}
+# Cambiar si cambia el procesamiento: genera nombres (y URLs) nuevos
+VARIANT_VERSION = '1'
+
+FILENAME = re.compile(r'^[0-9a-f]{16}-\d+\.(?:webp|jpg)$')
+
+# Plataformas que generan un cuadro en un segundo dado
+TIMED_PLATFORMS = {'cloudflare'}
+
+
+class ThumbnailError(Exception):
+    """No se pudo obtener o procesar la imagen."""
+
+
+class HttpFetcher:
+    """Descarga con urllib. Cualquier clase con fetch(url) -> bytes sirve."""
+    timeout = 10
+    max_bytes = 10 * 1024 * 1024
+
+    def fetch(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': 'lms-platform'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read(self.max_bytes + 1)
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as exc:
+            raise ThumbnailError(f'descarga fallida: {exc}')
+        if len(data) > self.max_bytes:
+            raise ThumbnailError('imagen demasiado grande')
+        return data
+
+
+def get_fetcher():
+    return import_string(getattr(settings, 'THUMBNAIL_FETCHER', 'core.thumbnails.HttpFetcher'))()
+
+
+def thumbnail_seconds(video, start_seconds):
+    """Segundo de la miniatura de un tema: el suyo o 0 (póster del video)."""
+    return (start_seconds or 0) if video.platform in TIMED_PLATFORMS else 0
+
+
+def source_url(video, start_seconds=0, fetcher=None):
+    """URL de la imagen original en la plataforma."""
+    external_id = quote(video.external_id, safe='')
+    if video.platform == 'youtube':
+        return f'https://img.youtube.com/vi/{external_id}/hqdefault.jpg'
+    if video.platform == 'cloudflare':
+        query = urlencode({'time': f'{start_seconds}s', 'height': 720})
+        return f'https://videodelivery.net/{external_id}/thumbnails/thumbnail.jpg?{query}'
+    if video.platform == 'drive':
+        return f'https://drive.google.com/thumbnail?id={external_id}&sz=w1280'
+    if video.platform == 'vimeo':
+        # Vimeo no tiene URL fija: la informa su oEmbed
+        url, _ = get_providers()['vimeo'].build_request([video.external_id])
+        try:
+            return json.loads((fetcher or get_fetcher()).fetch(url))['thumbnail_url']
+        except (ValueError, KeyError, TypeError):
+            raise ThumbnailError('oEmbed de Vimeo sin thumbnail_url')
+    raise ThumbnailError(f'plataforma sin miniaturas: {video.platform}')
+
+
+def variant_name(digest, width, extension):
+    return f'{DIRECTORY}/{digest}-{width}.{extension}'
+
+
+def store_variants(data):
+    """Genera y guarda las variantes de la imagen. Retorna su hash."""
+    digest = hashlib.sha256(data + VARIANT_VERSION.encode()).hexdigest()[:16]
+    names = [
+        (width, extension, variant_name(digest, width, extension))
+        for width in WIDTHS for extension in FORMATS
+    ]
+    if all(default_storage.exists(name) for _, _, name in names):
+        return digest
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+    except (UnidentifiedImageError, OSError) as exc:
+        raise ThumbnailError(f'imagen inválida: {exc}')
+    for width, extension, name in names:
+        if default_storage.exists(name):
+            continue
+        variant = ImageOps.fit(image, (width, round(width / ASPECT_RATIO)), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image_format, options = FORMATS[extension]
+        variant.save(buffer, image_format, **options)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+    return digest
+
+
+def fetch_thumbnail(video, start_seconds=0, fetcher=None):
+    """
+    Descarga (o reintenta) la miniatura y guarda el resultado en
+    VideoThumbnail. Retorna la miniatura obtenida; si falló, con digest
+    vacío y el error.
+    """
+    fetcher = fetcher or get_fetcher()
+    thumbnail = VideoThumbnail(video=video, start_seconds=start_seconds)
+    try:
+        thumbnail.source_url = source_url(video, start_seconds, fetcher=fetcher)
+        thumbnail.digest = store_variants(fetcher.fetch(thumbnail.source_url))
+    except ThumbnailError as exc:
+        thumbnail.error = str(exc)[:200]
+    defaults = {'source_url': thumbnail.source_url, 'error': thumbnail.error}
+    if thumbnail.digest:
+        # Si falla un refresco se conserva la miniatura anterior
+        defaults['digest'] = thumbnail.digest
+    VideoThumbnail.objects.update_or_create(video=video, start_seconds=start_seconds, defaults=defaults)
+    return thumbnail
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+    """URLs de las variantes de una miniatura (para las plantillas)."""
+    digest: str
+
+    def url(self, width=WIDTHS[0], extension='jpg'):
+        return reverse('core:thumbnail', kwargs={'name': f'{self.digest}-{width}.{extension}'})
+
+    def srcset(self, extension):
+        return ', '.join(f'{self.url(width, extension)} {width}w' for width in WIDTHS)
+
+    @property
+    def src(self):
+        return self.url(WIDTHS[-1], 'jpg')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpg')
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+
+def attach(topics):
+    """Asigna topic.thumbnail (Thumbnail o None) a cada tema, con una consulta."""
+    topics = list(topics)
+    keys = {topic.pk: (topic.video_id, thumbnail_seconds(topic.video, topic.start_seconds)) for topic in topics}
+    digests = {
+        (video_id, seconds): digest
+        for video_id, seconds, digest in VideoThumbnail.objects.filter(
+            video_id__in={video_id for video_id, _ in keys.values()}
+        ).exclude(digest='').values_list('video_id', 'start_seconds', 'digest')
+    }
+    for topic in topics:
+        digest = digests.get(keys[topic.pk])
+        topic.thumbnail = Thumbnail(digest) if digest else None
+    return topics
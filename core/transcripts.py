@@ -0,0 +1,343 @@
+"""
+Transcripciones con tiempos
+============================
+Los temas apuntan al inicio de un capítulo; las transcripciones permiten
+encontrar una frase dicha a mitad de capítulo y saltar a ese segundo.
+
+- Importación (comando import_transcripts): archivos WebVTT o SRT ->
+  segmentos (inicio, fin, texto) -> Transcript del video, compacto: texto de
+  un segmento por línea y arrays de inicios/fines en milisegundos.
+- Índice: los segmentos se agrupan en bloques de hasta CHUNK_SECONDS
+  (TranscriptChunk) con índice full-text propio, como SearchDocument:
+  tsvector + GIN en PostgreSQL, FTS5 en SQLite (migración 0016). Miles de
+  horas son decenas de miles de bloques, no millones de filas.
+- Búsqueda (search()): los bloques que coinciden, y dentro de cada uno el
+  segmento exacto (sus pocas líneas se revisan en Python). Cada resultado
+  trae el enlace de embed al segundo del segmento y el tema que se está
+  reproduciendo en ese momento (mapa de capítulos de core.chapters).
+"""
+
+import html
+import re
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .cache import bump_version, make_key
+from .chapters import get_map
+from .fuzzy import unaccent
+from .models import Topic, Transcript, TranscriptChunk, VideoAsset
+from .search import HIGHLIGHT_START, HIGHLIGHT_STOP, normalize_query, render_highlight, tokenize
+
+
+CHUNK_SECONDS = 60
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class TranscriptError(Exception):
+    """Archivo de subtítulos que no se puede leer."""
+
+
+# ---------------------------------------------------------------------------
+# Lectura de WebVTT / SRT
+# ---------------------------------------------------------------------------
+
+TIMESTAMP = r'(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})'
+TIMING_RE = re.compile(rf'^\s*{TIMESTAMP}\s*-->\s*{TIMESTAMP}')
+TAG_RE = re.compile(r'<[^>]*>')
+SPACES_RE = re.compile(r'\s+')
+
+
+@dataclass(frozen=True)
+class Segment:
+    start_ms: int
+    end_ms: int
+    text: str
+
+
+def to_milliseconds(hours, minutes, seconds, fraction):
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, '0'))
+
+
+def clean_text(lines):
+    """Una línea de texto plano: sin etiquetas (<v Ana>, <i>, <00:01.000>) ni entidades."""
+    return SPACES_RE.sub(' ', html.unescape(TAG_RE.sub('', ' '.join(lines)))).strip()
+
+
+def parse_captions(content):
+    """
+    Segmentos de un WebVTT o SRT (el mismo lector sirve para ambos: cada
+    bloque separado por una línea en blanco tiene una línea de tiempos
+    'inicio --> fin' y el texto debajo). Bloques sin tiempos (encabezado
+    WEBVTT, NOTE, STYLE) se ignoran. Retorna los segmentos ordenados.
+    """
+    content = content.lstrip('\ufeff').replace('\r\n', '\n').replace('\r', '\n')
+    segments = []
+    for block in re.split(r'\n\s*\n', content):
+        lines = block.split('\n')
+        for position, line in enumerate(lines):
+            match = TIMING_RE.match(line)
+            if match:
+                start = to_milliseconds(*match.groups()[:4])
+                end = to_milliseconds(*match.groups()[4:])
+                text = clean_text(lines[position + 1:])
+                if text:
+                    segments.append(Segment(start, max(start, end), text))
+                break
+    if not segments and '-->' not in content:
+        raise TranscriptError('no es un archivo WebVTT ni SRT')
+    return sorted(segments, key=lambda segment: segment.start_ms)
+
+
+def read_captions(path):
+    try:
+        with open(path, encoding='utf-8-sig') as stream:
+            return parse_captions(stream.read())
+    except (OSError, UnicodeDecodeError) as exc:
+        raise TranscriptError(str(exc))
+
+
+# ---------------------------------------------------------------------------
+# Guardado e índice
+# ---------------------------------------------------------------------------
+
+def build_chunks(transcript):
+    """Bloques de segmentos consecutivos de hasta CHUNK_SECONDS (sin guardar)."""
+    lines = transcript.text.split('\n') if transcript.text else []
+    chunks = []
+    first = 0
+    for index, start in enumerate(transcript.starts):
+        if index > first and start - transcript.starts[first] >= CHUNK_SECONDS * 1000:
+            chunks.append(TranscriptChunk(
+                transcript=transcript, first_segment=first, text='\n'.join(lines[first:index]),
+            ))
+            first = index
+    if lines:
+        chunks.append(TranscriptChunk(transcript=transcript, first_segment=first, text='\n'.join(lines[first:])))
+    return chunks
+
+
+def save_transcript(video, segments, language='es', source_name=''):
+    """Crea o reemplaza la transcripción del video en ese idioma y su índice."""
+    with transaction.atomic():
+        transcript, _ = Transcript.objects.update_or_create(
+            video=video, language=language,
+            defaults={
+                'starts': [segment.start_ms for segment in segments],
+                'ends': [segment.end_ms for segment in segments],
+                # El texto ya viene sin saltos de línea (clean_text)
+                'text': '\n'.join(segment.text for segment in segments),
+                'source_name': source_name[:255],
+            },
+        )
+        TranscriptChunk.objects.filter(transcript=transcript).delete()
+        TranscriptChunk.objects.bulk_create(build_chunks(transcript), batch_size=500)
+    bump_version('search')
+    return transcript
+
+
+def rebuild_index():
+    """Regenera los bloques de todas las transcripciones. Retorna cuántos."""
+    total = 0
+    for transcript in Transcript.objects.iterator(chunk_size=100):
+        with transaction.atomic():
+            TranscriptChunk.objects.filter(transcript=transcript).delete()
+            total += len(TranscriptChunk.objects.bulk_create(build_chunks(transcript), batch_size=500))
+    bump_version('search')
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Búsqueda
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ChunkHit:
+    chunk_id: int
+    transcript_id: int
+    first_segment: int
+    text: str
+    rank: float
+
+
+class BaseTranscriptBackend:
+    """search(query, limit) -> [ChunkHit] ordenados por relevancia."""
+
+    def search(self, query, limit):
+        raise NotImplementedError
+
+
+class PostgresTranscriptBackend(BaseTranscriptBackend):
+    """tsvector `search_vector` (columna generada) + GIN, migración 0016."""
+
+    def search(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        tsquery = ' & '.join(f"'{token}':*" for token in tokens)
+        sql = """
+            SELECT id, transcript_id, first_segment, text,
+                   ts_rank_cd(search_vector, to_tsquery('spanish', %s)) AS rank
+            FROM core_transcriptchunk
+            WHERE search_vector @@ to_tsquery('spanish', %s)
+            ORDER BY rank DESC, id
+            LIMIT %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tsquery, tsquery, limit])
+            return [ChunkHit(*row) for row in cursor.fetchall()]
+
+
+class SQLiteTranscriptBackend(BaseTranscriptBackend):
+    """Tabla FTS5 externa `core_transcriptchunk_fts` con bm25."""
+
+    def search(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        sql = """
+            SELECT c.id, c.transcript_id, c.first_segment, c.text, bm25(core_transcriptchunk_fts) AS rank
+            FROM core_transcriptchunk_fts
+            JOIN core_transcriptchunk c ON c.id = core_transcriptchunk_fts.rowid
+            WHERE core_transcriptchunk_fts MATCH %s
+            ORDER BY rank, c.id
+            LIMIT %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, limit])
+            # bm25: menor = mejor
+            return [ChunkHit(*row[:4], -row[4]) for row in cursor.fetchall()]
+
+
+class BasicTranscriptBackend(BaseTranscriptBackend):
+    """Fallback sin índice full-text: icontains por token."""
+
+    def search(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        condition = Q()
+        for token in tokens:
+            condition &= Q(text__icontains=token)
+        chunks = TranscriptChunk.objects.filter(condition).order_by('pk').values_list(
+            'pk', 'transcript_id', 'first_segment', 'text'
+        )[:limit]
+        return [ChunkHit(*row, 0.0) for row in chunks]
+
+
+_backend = None
+
+
+def get_backend():
+    """Mismo criterio que core.search.get_backend()."""
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'postgresql':
+            _backend = PostgresTranscriptBackend()
+        elif connection.vendor == 'sqlite' and 'core_transcriptchunk_fts' in connection.introspection.table_names():
+            _backend = SQLiteTranscriptBackend()
+        else:
+            _backend = BasicTranscriptBackend()
+    return _backend
+
+
+def token_pattern(tokens):
+    """Palabras que empiezan con alguno de los tokens (como el prefijo de FTS)."""
+    return re.compile(r'\b(?:' + '|'.join(re.escape(token) for token in tokens) + r')\w*', re.IGNORECASE)
+
+
+def best_line(lines, pattern):
+    """Índice de la línea con más tokens distintos (la primera, a igualdad), sin tildes."""
+    scores = [len(set(pattern.findall(unaccent(line)))) for line in lines]
+    return max(range(len(lines)), key=lambda index: (scores[index], -index)) if lines else 0
+
+
+def highlight(line, pattern):
+    return render_highlight(pattern.sub(lambda match: f'{HIGHLIGHT_START}{match.group()}{HIGHLIGHT_STOP}', line))
+
+
+@dataclass
+class TranscriptHit:
+    """Un momento de un video donde se dice la frase buscada."""
+    video: VideoAsset
+    topic: Topic
+    start_seconds: int
+    text: str
+    snippet: str
+    language: str
+    rank: float
+
+    @property
+    def embed_url(self):
+        return self.video.get_embed_url(start_seconds=self.start_seconds)
+
+    def as_dict(self):
+        return {
+            'video': {'id': self.video.pk, 'title': self.video.title, 'platform': self.video.platform},
+            'topic': {'code': self.topic.code, 'title': self.topic.title} if self.topic else None,
+            'start_seconds': self.start_seconds,
+            'embed_url': self.embed_url,
+            'text': self.text,
+            'language': self.language,
+        }
+
+
+def search(query, limit=DEFAULT_LIMIT):
+    """
+    Momentos de los videos que coinciden con la consulta, cacheados como
+    los resultados de core.search (namespace 'search').
+    """
+    normalized = normalize_query(query)
+    if not normalized:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+    key = make_key('search', 'transcripts', normalized, limit)
+    hits = cache.get(key)
+    if hits is None:
+        hits = find_moments(normalized, limit)
+        cache.set(key, hits, getattr(settings, 'SEARCH_CACHE_TIMEOUT', 600))
+    return hits
+
+
+def find_moments(query, limit):
+    """
+    Una consulta al índice, una por las transcripciones con sus videos y
+    una por los temas.
+    """
+    tokens = tokenize(query)
+    chunks = get_backend().search(query, limit)
+    if not chunks:
+        return []
+    transcripts = Transcript.objects.select_related('video').only(
+        'language', 'starts', 'video__title', 'video__platform', 'video__external_id', 'video__chapter_map',
+    ).in_bulk({chunk.transcript_id for chunk in chunks})
+    pattern = token_pattern(tokens)
+    plain_pattern = token_pattern([unaccent(token) for token in tokens])
+
+    located = []
+    for chunk in chunks:
+        transcript = transcripts.get(chunk.transcript_id)
+        if transcript is None:
+            continue
+        lines = chunk.text.split('\n')
+        line = best_line(lines, plain_pattern)
+        segment = chunk.first_segment + line
+        seconds = transcript.starts[segment] // 1000 if segment < len(transcript.starts) else 0
+        chapter = get_map(transcript.video).active(seconds)
+        located.append((chunk, transcript, lines[line], seconds, chapter.topic_id if chapter else None))
+
+    topics = Topic.objects.published().only('code', 'title').in_bulk(
+        {topic_id for *_, topic_id in located if topic_id}
+    )
+    return [
+        TranscriptHit(
+            video=transcript.video, topic=topics.get(topic_id), start_seconds=seconds, text=line,
+            snippet=highlight(line, pattern), language=transcript.language, rank=chunk.rank,
+        )
+        for chunk, transcript, line, seconds, topic_id in located
+    ]
@@ -0,0 +1,276 @@
+"""
+Autocompletado (typeahead)
+===========================
+Sugerencias mientras se escribe en el buscador (GET /api/suggest/?q=), desde
+un índice de prefijos en memoria de cada proceso: la consulta no toca la
+base de datos.
+
+- Claves: el código del tema, su título y cada sufijo del título desde una
+  palabra ("505 en caja" de "Error 505 en caja"), y el nombre de cada tag.
+  Se normalizan sin tildes, en minúsculas y sin puntuación (salvo el punto
+  de los códigos).
+- Las claves viven en una lista ordenada de tuplas (clave, puntaje, objeto);
+  un prefijo es un rango que se encuentra con bisect. Para prefijos de hasta
+  3 caracteres (rangos enormes) el top-k se precalcula al construir.
+- Orden: coincidencia desde el inicio antes que desde una palabra interna,
+  temas antes que tags, temas en orden de curso y tags por cantidad de temas.
+- Se construye al arrancar el proceso (lms_platform/wsgi.py) o en la primera
+  consulta. Cada consulta compara la versión del namespace 'content' (una
+  lectura del caché); si cambió, aplica sólo los cambios de temas y tags del
+  registro de cambios (core.changelog) desde la última versión vista, y
+  publica un índice nuevo. Con muchos cambios lo reconstruye completo.
+  Si el registro retuvo entradas recientes (ver changelog.current_version)
+  el índice no marca la versión de contenido como vista y vuelve a
+  aplicar los cambios en la consulta siguiente, hasta alcanzarlas.
+"""
+
+import bisect
+import heapq
+import json
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from operator import itemgetter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.urls import reverse
+
+from . import changelog
+from .cache import get_version
+from .models import Tag, Topic
+
+
+SHORT_PREFIX_LENGTH = 3
+MAX_LIMIT = 20
+DEFAULT_LIMIT = 8
+# Tope de claves recorridas para un prefijo largo (su rango ya es chico)
+MAX_SCAN = 1000
+# Sufijos de título indexados por tema (desde cada una de sus primeras palabras)
+MAX_SUFFIXES = 8
+# Más cambios que esto en el registro: reconstruir en vez de aplicar deltas
+MAX_INCREMENTAL_CHANGES = 2000
+
+# Tipos de coincidencia y de objeto (menor = primero)
+FROM_START, FROM_WORD = 0, 1
+TOPIC, TAG = 0, 1
+
+NON_WORD = re.compile(r'[^a-z0-9.]+')
+
+
+def normalize(text):
+    """'Ñandú: Error 505' -> 'nandu error 505'."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return NON_WORD.sub(' ', text).strip()
+
+
+@dataclass(frozen=True)
+class Entry:
+    """Una sugerencia; `data` es su JSON ya serializado."""
+    kind: int
+    pk: int
+    rank: tuple
+    keys: tuple
+    data: str = field(compare=False)
+
+    @property
+    def ref(self):
+        return (self.kind, self.pk)
+
+
+def title_keys(*labels, code=None):
+    """(clave, tipo de coincidencia) de un tema o tag."""
+    keys = set()
+    if code:
+        keys.add((normalize(code), FROM_START))
+    for label in labels:
+        words = normalize(label).split()
+        if words:
+            keys.add((' '.join(words), FROM_START))
+        for start in range(1, min(len(words), MAX_SUFFIXES)):
+            keys.add((' '.join(words[start:]), FROM_WORD))
+    return tuple(sorted(key for key in keys if key[0]))
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def topic_entries(topic_ids=None):
+    topics = Topic.objects.published()
+    if topic_ids is not None:
+        topics = topics.filter(pk__in=topic_ids)
+    for pk, code, title, sort_key, category in topics.values_list(
+        'pk', 'code', 'title', 'sort_key', 'category__name'
+    ).iterator(chunk_size=2000):
+        yield Entry(
+            kind=TOPIC, pk=pk, rank=(sort_key, code), keys=title_keys(title, code=code),
+            data=dumps({
+                'type': 'topic', 'code': code, 'title': title, 'category': category,
+                'url': reverse('core:topic_detail', kwargs={'code': code}),
+            }),
+        )
+
+
+def tag_entries(tag_ids=None):
+    tags = Tag.objects.all()
+    if tag_ids is not None:
+        tags = tags.filter(pk__in=tag_ids)
+    search_url = reverse('core:search')
+    for pk, name, count in tags.values_list('pk', 'name', 'published_topic_count').iterator(chunk_size=2000):
+        yield Entry(
+            kind=TAG, pk=pk, rank=(-count, name), keys=title_keys(name),
+            data=dumps({
+                'type': 'tag', 'name': name, 'topic_count': count,
+                'url': f"{search_url}?{urlencode({'q': name})}",
+            }),
+        )
+
+
+def entry_items(entry):
+    """Tuplas (clave, puntaje, ref) de la lista ordenada."""
+    return [(key, (match, entry.kind, entry.rank), entry.ref) for key, match in entry.keys]
+
+
+def top(items, limit):
+    """
+    Mejores `limit` refs distintas de unas tuplas (clave, puntaje, ref).
+    Un objeto aparece con varias claves: se piden más candidatos de los
+    necesarios y se agranda la muestra sólo si los repetidos no alcanzan.
+    """
+    sample = limit * 4
+    while True:
+        refs = []
+        for _, _, ref in heapq.nsmallest(sample, items, key=itemgetter(1)):
+            if ref not in refs:
+                refs.append(ref)
+                if len(refs) == limit:
+                    return refs
+        if sample >= len(items):
+            return refs
+        sample *= 4
+
+
+def seen_content_version(content_version, log_version):
+    """
+    La versión de contenido que el índice puede dar por vista: ninguna si
+    hay entradas del registro más nuevas que `log_version` aún retenidas.
+    """
+    if settings.CHANGELOG_COMMIT_LAG_SECONDS and changelog.current_version(lag=0) > log_version:
+        return None
+    return content_version
+
+
+class PrefixIndex:
+    """Índice inmutable: las actualizaciones crean uno nuevo (seguro entre hilos)."""
+
+    def __init__(self, entries, items, short, content_version, log_version):
+        self.entries = entries          # {ref: Entry}
+        self.items = items              # [(clave, puntaje, ref)] ordenada
+        self.short = short              # {prefijo corto: [ref]} ya ordenadas
+        self.content_version = content_version
+        self.log_version = log_version
+
+    @classmethod
+    def build(cls):
+        # Versiones antes de leer: un cambio concurrente se vuelve a aplicar después
+        content_version = get_version('content')
+        log_version = changelog.current_version()
+        entries = {entry.ref: entry for entry in (*topic_entries(), *tag_entries())}
+        items = sorted(item for entry in entries.values() for item in entry_items(entry))
+        short = {}
+        for item in items:
+            key = item[0]
+            for length in range(1, min(len(key), SHORT_PREFIX_LENGTH) + 1):
+                short.setdefault(key[:length], []).append(item)
+        short = {prefix: top(candidates, MAX_LIMIT) for prefix, candidates in short.items()}
+        content_version = seen_content_version(content_version, log_version)
+        return cls(entries, items, short, content_version, log_version)
+
+    def prefix_range(self, prefix):
+        start = bisect.bisect_left(self.items, (prefix,))
+        end = bisect.bisect_left(self.items, (prefix + '\uffff',), start)
+        return start, end
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """JSON (texto) de las mejores `limit` sugerencias para el prefijo."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if len(prefix) <= SHORT_PREFIX_LENGTH:
+            refs = self.short.get(prefix, [])[:limit]
+        else:
+            start, end = self.prefix_range(prefix)
+            refs = top(self.items[start:min(end, start + MAX_SCAN)], limit)
+        return [self.entries[ref].data for ref in refs]
+
+    def updated(self, changed_entries, removed_refs, content_version, log_version):
+        """Índice nuevo con esas entradas reemplazadas/agregadas y sin las borradas."""
+        changed_refs = {entry.ref for entry in changed_entries}
+        dropped = (changed_refs | set(removed_refs)) & self.entries.keys()
+        entries = {ref: entry for ref, entry in self.entries.items() if ref not in dropped}
+        entries.update((entry.ref, entry) for entry in changed_entries)
+        touched_keys = {key for ref in dropped for key, _ in self.entries[ref].keys}
+        touched_keys.update(key for entry in changed_entries for key, _ in entry.keys)
+
+        added = sorted(item for entry in changed_entries for item in entry_items(entry))
+        items = list(heapq.merge((item for item in self.items if item[2] not in dropped), added))
+        index = PrefixIndex(entries, items, dict(self.short), content_version, log_version)
+        for prefix in {key[:length] for key in touched_keys for length in range(1, SHORT_PREFIX_LENGTH + 1)
+                       if len(key) >= length}:
+            start, end = index.prefix_range(prefix)
+            if start == end:
+                index.short.pop(prefix, None)
+            else:
+                index.short[prefix] = top(items[start:end], MAX_LIMIT)
+        return index
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def refresh(index):
+    """Índice al día con el registro de cambios (o reconstruido)."""
+    content_version = get_version('content')
+    entries, log_version, more = changelog.changes(index.log_version, limit=MAX_INCREMENTAL_CHANGES)
+    if more:
+        return PrefixIndex.build()
+    changed = {'topic': set(), 'tag': set()}
+    for entry in entries:
+        if entry.model in changed:
+            changed[entry.model].add(entry.object_id)
+    new_entries = [*topic_entries(changed['topic']), *tag_entries(changed['tag'])]
+    # Lo que ya no existe (o no está publicado) sale del índice
+    removed = {(TOPIC, pk) for pk in changed['topic']} | {(TAG, pk) for pk in changed['tag']}
+    content_version = seen_content_version(content_version, log_version)
+    return index.updated(new_entries, removed, content_version, log_version)
+
+
+def get_index():
+    """Índice del proceso, al día con la versión de contenido."""
+    global _index
+    index = _index
+    if index is not None and index.content_version == get_version('content'):
+        return index
+    with _lock:
+        if _index is None:
+            _index = PrefixIndex.build()
+        elif _index.content_version != get_version('content'):
+            _index = refresh(_index)
+        return _index
+
+
+def warm_up():
+    """Construye el índice al arrancar el proceso (si la base está disponible)."""
+    try:
+        get_index()
+    except DatabaseError:
+        # Sin base (ej: antes de migrar): se construirá en la primera consulta
+        pass
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    return get_index().suggest(query, max(1, min(limit, MAX_LIMIT)))
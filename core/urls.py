@@ -3,7 +3,7 @@ URL Configuration para Core App
 """
 
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'core'
 
@@ -13,4 +13,19 @@ urlpatterns = [
     path('category/<slug:slug>/', views.CategoryView.as_view(), name='category_list'),
     path('search/', views.SearchView.as_view(), name='search'),
     path('course/', views.CourseView.as_view(), name='course_mode'),
+    path('export/', views.CatalogExportView.as_view(), name='catalog_export'),
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache_stats'),
+    path('thumbs/<str:name>', views.ThumbnailView.as_view(), name='thumbnail'),
+    
+    # API JSON de solo lectura (core.api)
+    path('api/categories/', api.CategoryListApiView.as_view(), name='api_categories'),
+    path('api/topics/', api.TopicListApiView.as_view(), name='api_topics'),
+    path('api/topics/<str:code>/', api.TopicDetailApiView.as_view(), name='api_topic_detail'),
+    path('api/videos/<int:pk>/chapters/', api.ChapterMapApiView.as_view(), name='api_video_chapters'),
+    path('api/tags/', api.TagListApiView.as_view(), name='api_tags'),
+    path('api/quizzes/', api.QuizListApiView.as_view(), name='api_quizzes'),
+    path('api/search/', api.SearchApiView.as_view(), name='api_search'),
+    path('api/transcripts/search/', api.TranscriptSearchApiView.as_view(), name='api_transcript_search'),
+    path('api/sync/', api.SyncApiView.as_view(), name='api_sync'),
+    path('api/suggest/', api.SuggestApiView.as_view(), name='api_suggest'),
 ]
@@ -0,0 +1,416 @@
+"""
+Metadatos de videos
+====================
+Completa VideoAsset.duration_seconds y uploaded_date consultando la API de
+cada plataforma (comando fetch_video_metadata), en vez de cargarlos a mano.
+
+- Un proveedor por VideoAsset.PLATFORM_CHOICES: YouTube Data API (hasta 50
+  ids por request), oEmbed de Vimeo, Cloudflare Stream y Google Drive API.
+- Las requests corren con asyncio: a lo sumo `concurrency` en vuelo y cada
+  proveedor respeta su límite de requests por segundo. urllib es
+  bloqueante, así que cada request va en un hilo (asyncio.to_thread); no
+  hace falta otro cliente HTTP.
+- Errores transitorios (429, 5xx, timeouts) se reintentan con backoff
+  exponencial, respetando Retry-After; un 404 es definitivo.
+- Las respuestas exitosas se guardan en disco (VIDEO_METADATA_CACHE_DIR)
+  por VIDEO_METADATA_CACHE_TIMEOUT segundos: repetir el comando no vuelve a
+  gastar cuota de las APIs.
+- Las URLs base salen de settings.VIDEO_METADATA (los tests usan un
+  servidor HTTP local).
+
+MetadataFetcher.fetch() es async y no toca la base de datos: el comando lee
+los videos, corre asyncio.run(fetcher.fetch(...)) por lote y guarda con
+save(), así los signals recalculan payloads y estadísticas de quizzes.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import VideoAsset
+
+
+# Estados HTTP que vale la pena reintentar
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+ISO_DURATION = re.compile(
+    r'^P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$'
+)
+
+
+@dataclass
+class VideoMetadata:
+    duration_seconds: int | None = None
+    uploaded_date: date | None = None
+
+
+@dataclass
+class FetchResult:
+    """Resultado de un fetch(): claves (platform, external_id)."""
+    found: dict = field(default_factory=dict)      # -> VideoMetadata
+    missing: set = field(default_factory=set)      # la plataforma no lo conoce
+    errors: dict = field(default_factory=dict)     # -> mensaje (se reintenta en otra corrida)
+    skipped: set = field(default_factory=set)      # proveedor sin credenciales
+    requests: int = 0
+    cache_hits: int = 0
+
+
+class FetchError(Exception):
+    def __init__(self, message, retry=False, retry_after=None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+
+
+def parse_iso_duration(value):
+    """'PT1H2M3S' -> 3723 (formato de YouTube)."""
+    match = ISO_DURATION.match(value or '')
+    if not match or not any(match.groupdict().values()):
+        return None
+    parts = {name: float(number or 0) for name, number in match.groupdict().items()}
+    return round(parts['days'] * 86400 + parts['hours'] * 3600 + parts['minutes'] * 60 + parts['seconds'])
+
+
+def parse_date(value):
+    """Fecha de un timestamp ISO ('2024-03-01T10:00:00Z', '2024-03-01 10:00:00')."""
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def positive_seconds(value):
+    """Duración en segundos, o None si la plataforma aún no la conoce (0, -1)."""
+    try:
+        seconds = round(float(value))
+    except (TypeError, ValueError):
+        return None
+    return seconds if seconds > 0 else None
+
+
+# --- Proveedores -------------------------------------------------------------
+
+class Provider:
+    """
+    Arma las requests de una plataforma e interpreta sus respuestas.
+    Las opciones vienen de settings.VIDEO_METADATA[name].
+    """
+    name = ''
+    default_base_url = ''
+    batch_size = 1
+    default_rate = 5
+
+    def __init__(self, base_url=None, rate=None, **options):
+        self.base_url = (base_url or self.default_base_url).rstrip('/')
+        self.rate = self.default_rate if rate is None else rate
+        self.options = options
+
+    def is_configured(self):
+        return True
+
+    def requests(self, external_ids):
+        """(url, headers, ids) por cada request necesaria."""
+        for start in range(0, len(external_ids), self.batch_size):
+            chunk = external_ids[start:start + self.batch_size]
+            url, headers = self.build_request(chunk)
+            yield url, headers, chunk
+
+    def build_request(self, external_ids):
+        raise NotImplementedError
+
+    def parse(self, external_ids, data):
+        """{external_id: VideoMetadata} de los videos presentes en la respuesta."""
+        raise NotImplementedError
+
+
+class YouTubeProvider(Provider):
+    name = 'youtube'
+    default_base_url = 'https://www.googleapis.com/youtube/v3'
+    batch_size = 50  # máximo de ids de videos.list
+
+    def is_configured(self):
+        return bool(self.options.get('api_key'))
+
+    def build_request(self, external_ids):
+        query = urlencode({
+            'part': 'contentDetails,snippet',
+            'id': ','.join(external_ids),
+            'key': self.options['api_key'],
+        })
+        return f'{self.base_url}/videos?{query}', {}
+
+    def parse(self, external_ids, data):
+        return {
+            item['id']: VideoMetadata(
+                duration_seconds=parse_iso_duration(item.get('contentDetails', {}).get('duration')),
+                uploaded_date=parse_date(item.get('snippet', {}).get('publishedAt')),
+            )
+            for item in data.get('items', [])
+        }
+
+
+class VimeoProvider(Provider):
+    name = 'vimeo'
+    default_base_url = 'https://vimeo.com/api'
+    default_rate = 2
+
+    def build_request(self, external_ids):
+        query = urlencode({'url': f'https://vimeo.com/{external_ids[0]}'})
+        return f'{self.base_url}/oembed.json?{query}', {}
+
+    def parse(self, external_ids, data):
+        return {external_ids[0]: VideoMetadata(
+            duration_seconds=positive_seconds(data.get('duration')),
+            uploaded_date=parse_date(data.get('upload_date')),
+        )}
+
+
+class CloudflareProvider(Provider):
+    name = 'cloudflare'
+    default_base_url = 'https://api.cloudflare.com/client/v4'
+    default_rate = 4
+
+    def is_configured(self):
+        return bool(self.options.get('account_id') and self.options.get('api_token'))
+
+    def build_request(self, external_ids):
+        account = quote(self.options['account_id'], safe='')
+        url = f'{self.base_url}/accounts/{account}/stream/{quote(external_ids[0], safe="")}'
+        return url, {'Authorization': f"Bearer {self.options['api_token']}"}
+
+    def parse(self, external_ids, data):
+        result = data['result']
+        return {external_ids[0]: VideoMetadata(
+            duration_seconds=positive_seconds(result.get('duration')),
+            uploaded_date=parse_date(result.get('uploaded')),
+        )}
+
+
+class DriveProvider(Provider):
+    name = 'drive'
+    default_base_url = 'https://www.googleapis.com/drive/v3'
+
+    def is_configured(self):
+        return bool(self.options.get('api_key'))
+
+    def build_request(self, external_ids):
+        query = urlencode({
+            'fields': 'createdTime,videoMediaMetadata(durationMillis)',
+            'key': self.options['api_key'],
+        })
+        return f'{self.base_url}/files/{quote(external_ids[0], safe="")}?{query}', {}
+
+    def parse(self, external_ids, data):
+        millis = data.get('videoMediaMetadata', {}).get('durationMillis')
+        return {external_ids[0]: VideoMetadata(
+            duration_seconds=positive_seconds(int(millis) / 1000 if millis else None),
+            uploaded_date=parse_date(data.get('createdTime')),
+        )}
+
+
+PROVIDERS = {
+    provider.name: provider
+    for provider in (YouTubeProvider, VimeoProvider, CloudflareProvider, DriveProvider)
+}
+
+
+def get_providers():
+    """Proveedores configurados según settings.VIDEO_METADATA."""
+    config = getattr(settings, 'VIDEO_METADATA', {})
+    return {name: provider(**config.get(name, {})) for name, provider in PROVIDERS.items()}
+
+
+# --- Caché en disco y límite de velocidad ------------------------------------
+
+class ResponseCache:
+    """Un archivo JSON por URL; expira por antigüedad del archivo."""
+
+    def __init__(self, directory, timeout):
+        self.directory = directory
+        self.timeout = timeout
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            getattr(settings, 'VIDEO_METADATA_CACHE_DIR', None),
+            getattr(settings, 'VIDEO_METADATA_CACHE_TIMEOUT', 0),
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.directory) and self.timeout > 0
+
+    def path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def get(self, url):
+        if not self.enabled:
+            return None
+        path = self.path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > self.timeout:
+                return None
+            with open(path, encoding='utf-8') as stream:
+                return json.load(stream)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, url, data):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(url)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as stream:
+            json.dump(data, stream)
+        os.replace(temporary, path)
+
+
+class RateLimiter:
+    """Espacia el inicio de las requests: como máximo `rate` por segundo."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = asyncio.get_running_loop().time()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# --- Fetcher -----------------------------------------------------------------
+
+class MetadataFetcher:
+    def __init__(self, providers=None, concurrency=None, retries=3, backoff=1.0, timeout=10, cache=None):
+        self.providers = get_providers() if providers is None else providers
+        self.concurrency = concurrency or getattr(settings, 'VIDEO_METADATA_CONCURRENCY', 8)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = ResponseCache.from_settings() if cache is None else cache
+
+    async def fetch(self, videos):
+        """Consulta los (platform, external_id) indicados. Retorna un FetchResult."""
+        result = FetchResult()
+        by_platform = {}
+        for platform, external_id in videos:
+            by_platform.setdefault(platform, []).append(external_id)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = []
+        for platform, external_ids in by_platform.items():
+            provider = self.providers.get(platform)
+            if provider is None or not provider.is_configured():
+                result.skipped.update((platform, external_id) for external_id in external_ids)
+                continue
+            limiter = RateLimiter(provider.rate)
+            for url, headers, chunk in provider.requests(sorted(set(external_ids))):
+                tasks.append(self._fetch_chunk(provider, limiter, semaphore, url, headers, chunk, result))
+        await asyncio.gather(*tasks)
+        return result
+
+    async def _fetch_chunk(self, provider, limiter, semaphore, url, headers, external_ids, result):
+        keys = [(provider.name, external_id) for external_id in external_ids]
+        try:
+            data = await self._get(limiter, semaphore, url, headers, result)
+            parsed = {} if data is None else provider.parse(external_ids, data)
+        except FetchError as exc:
+            result.errors.update((key, str(exc)) for key in keys)
+            return
+        except (KeyError, TypeError, ValueError, AttributeError) as exc:
+            result.errors.update((key, f'respuesta inesperada: {exc!r}') for key in keys)
+            return
+        for key in keys:
+            if key[1] in parsed:
+                result.found[key] = parsed[key[1]]
+            else:
+                result.missing.add(key)
+
+    async def _get(self, limiter, semaphore, url, headers, result):
+        """JSON de la URL (None si no existe), desde el caché o con reintentos."""
+        cached = self.cache.get(url)
+        if cached is not None:
+            result.cache_hits += 1
+            return cached
+        for attempt in range(self.retries + 1):
+            await limiter.wait()
+            async with semaphore:
+                result.requests += 1
+                try:
+                    data = await asyncio.to_thread(self._download, url, headers)
+                except FetchError as exc:
+                    if not exc.retry or attempt == self.retries:
+                        raise
+                    delay = exc.retry_after if exc.retry_after is not None else self.backoff * 2 ** attempt
+                else:
+                    if data is not None:
+                        self.cache.set(url, data)
+                    return data
+            await asyncio.sleep(delay)
+
+    def _download(self, url, headers):
+        request = urllib.request.Request(
+            url, headers={'Accept': 'application/json', 'User-Agent': 'lms-platform', **headers}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as exc:
+            if exc.code in (404, 410):
+                return None
+            retry_after = exc.headers.get('Retry-After', '')
+            raise FetchError(
+                f'HTTP {exc.code}',
+                retry=exc.code in TRANSIENT_STATUS,
+                retry_after=int(retry_after) if retry_after.isdigit() else None,
+            )
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as exc:
+            raise FetchError(f'sin respuesta: {exc}', retry=True)
+        except ValueError as exc:
+            raise FetchError(f'JSON inválido: {exc}')
+
+
+# --- Selección y actualización de videos -------------------------------------
+
+def stale_videos(recheck_hours=24, include_complete=False):
+    """
+    Videos a consultar: les falta la duración o la fecha (o todos con
+    include_complete) y no se consultaron en las últimas `recheck_hours`.
+    """
+    videos = VideoAsset.objects.all()
+    if not include_complete:
+        videos = videos.filter(Q(duration_seconds__isnull=True) | Q(uploaded_date__isnull=True))
+    if recheck_hours:
+        since = timezone.now() - timedelta(hours=recheck_hours)
+        videos = videos.filter(Q(metadata_checked_at__isnull=True) | Q(metadata_checked_at__lt=since))
+    return videos.order_by('pk')
+
+
+def apply_metadata(video, metadata, overwrite=False):
+    """Copia los valores obtenidos al video; retorna los campos que cambiaron."""
+    changed = []
+    for name in ('duration_seconds', 'uploaded_date'):
+        value = getattr(metadata, name)
+        current = getattr(video, name)
+        if value is not None and value != current and (overwrite or current is None):
+            setattr(video, name, value)
+            changed.append(name)
+    return changed
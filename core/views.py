@@ -3,13 +3,73 @@ Views para LMS + Knowledge Base
 ================================
 """
 
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
+from django.views import View
 from django.views.generic import ListView, DetailView
-from django.db.models import Q
-from .models import Category, Topic, Tag
+from . import export, related, search, snapshot, thumbnails, transcripts
+from .cache import CachedPageMixin, ConditionalGetMixin, make_key, page_cache_stats
+from .models import Category, CourseSequenceEntry, Quiz, Topic, Tag
+from .pagination import KeysetPaginationMixin
+
+
+def latest(*timestamps):
+    """La fecha más reciente, ignorando None."""
+    return max((value for value in timestamps if value is not None), default=None)
+
+
+def listing_state(topics, with_categories=True):
+    """
+    Estado de un listado para ETag/Last-Modified: última modificación de sus
+    topics (y sus videos y categorías) y cuántos hay, para detectar borrados.
+    """
+    state = topics.aggregate(
+        total=Count('pk'),
+        topic=Max('updated_at'),
+        video=Max('video__updated_at'),
+        category=Max('category__updated_at'),
+    )
+    categories = {'total': None, 'latest': None}
+    if with_categories:
+        categories = Category.objects.aggregate(total=Count('pk'), latest=Max('updated_at'))
+    return (
+        latest(state['topic'], state['video'], state['category'], categories['latest']),
+        state['total'],
+        categories['total'],
+    )
+
+
+class CatalogSnapshotMixin:
+    """
+    Con CATALOG_SNAPSHOT=True la vista lee del snapshot del catálogo en
+    memoria (core.snapshot) en lugar de la base de datos.
+    """
+
+    @cached_property
+    def catalog(self):
+        """El snapshot al día, o None si el modo está desactivado."""
+        return snapshot.get_snapshot() if snapshot.is_enabled() else None
 
+    def get_snapshot_state(self):
+        return (self.catalog.modified_at, self.catalog.version)
 
-class HomeView(ListView):
+    def get_cache_variant(self):
+        # El snapshot puede ir hasta CATALOG_SNAPSHOT_CHECK_SECONDS detrás de la
+        # versión 'content': la página (y su ETag) se cachea bajo la suya
+        return (self.catalog.version,) if self.catalog else ()
+
+
+class HomeView(CatalogSnapshotMixin, ConditionalGetMixin, CachedPageMixin, ListView):
     """
     Vista principal: Buscador + Categorías destacadas.
     """
@@ -18,16 +78,25 @@ class HomeView(ListView):
     context_object_name = 'recent_topics'
     
     def get_queryset(self):
-        """Obtiene los últimos 6 topics publicados."""
-        return Topic.objects.filter(is_published=True).select_related('category', 'video')[:6]
+        """Obtiene los últimos 6 topics publicados (con su miniatura local)."""
+        if self.catalog:
+            return list(self.catalog.course[:6])
+        return thumbnails.attach(
+            Topic.objects.filter(is_published=True).select_related('category', 'video')[:6]
+        )
+    
+    def get_validator_state(self):
+        if self.catalog:
+            return self.get_snapshot_state()
+        return listing_state(Topic.objects.published())
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = self.catalog.categories if self.catalog else Category.objects.all()
         return context
 
 
-class TopicDetailView(DetailView):
+class TopicDetailView(CatalogSnapshotMixin, ConditionalGetMixin, CachedPageMixin, DetailView):
     """
     Vista de detalle del Topic con reproductor inteligente.
     """
@@ -38,24 +107,71 @@ class TopicDetailView(DetailView):
     slug_url_kwarg = 'code'
     
     def get_queryset(self):
-        """Solo muestra topics publicados."""
-        return Topic.objects.filter(is_published=True).select_related('category', 'video').prefetch_related('tags', 'quizzes')
+        """Solo muestra topics publicados (con su entrada de la secuencia del curso y sus relacionados)."""
+        return Topic.objects.filter(is_published=True).select_related(
+            'category', 'video', 'sequence__prev_topic', 'sequence__next_topic', 'related_set'
+        ).prefetch_related('tags', 'quizzes')
+    
+    def get_object(self, queryset=None):
+        if not self.catalog:
+            return super().get_object(queryset)
+        topic = self.catalog.topic(self.kwargs['code'])
+        if topic is None:
+            raise Http404('Tema no encontrado')
+        return topic
+    
+    def get_validator_state(self):
+        """Una consulta: el topic, su video, categoría, vecinos, tags y quizzes."""
+        if self.catalog:
+            return self.get_snapshot_state() if self.catalog.topic(self.kwargs['code']) else None
+        tags = Tag.objects.filter(topics=OuterRef('pk')).order_by().values('topics').annotate(
+            latest=Max('updated_at')
+        ).values('latest')
+        quizzes = Quiz.objects.filter(topics=OuterRef('pk')).order_by().values('topics').annotate(
+            latest=Max('updated_at')
+        ).values('latest')
+        row = Topic.objects.filter(is_published=True, code=self.kwargs['code']).annotate(
+            tags_updated_at=Subquery(tags),
+            quizzes_updated_at=Subquery(quizzes),
+        ).values_list(
+            'updated_at', 'video__updated_at', 'category__updated_at',
+            'sequence__updated_at', 'sequence__prev_topic__updated_at',
+            'sequence__next_topic__updated_at', 'tags_updated_at', 'quizzes_updated_at',
+            'related_set__computed_at',
+        ).first()
+        return (latest(*row),) if row else None
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         topic = self.object
         
-        # Navegación prev/next
-        context['prev_topic'] = topic.get_previous_topic()
-        context['next_topic'] = topic.get_next_topic()
+        if self.catalog:
+            # Todo viene del snapshot, sin consultas
+            context['prev_topic'], context['next_topic'] = self.catalog.neighbours(topic)
+            context['quizzes'] = topic.quizzes
+            context['related_topics'] = topic.related
+            return context
+        
+        # Navegación prev/next desde la secuencia materializada (sin consultas extra)
+        try:
+            entry = topic.sequence
+        except CourseSequenceEntry.DoesNotExist:
+            context['prev_topic'] = topic.get_previous_topic()
+            context['next_topic'] = topic.get_next_topic()
+        else:
+            context['prev_topic'] = entry.prev_topic
+            context['next_topic'] = entry.next_topic
         
         # Quizzes relacionados
         context['quizzes'] = topic.quizzes.filter(is_active=True)
         
+        # "Ver también" precalculado (core.related)
+        context['related_topics'] = related.related_topics(topic)
+        
         return context
 
 
-class CategoryView(ListView):
+class CategoryView(CatalogSnapshotMixin, ConditionalGetMixin, CachedPageMixin, KeysetPaginationMixin, ListView):
     """
     Vista de topics filtrados por categoría (Modo Biblioteca).
     """
@@ -66,22 +182,50 @@ class CategoryView(ListView):
     
     def get_queryset(self):
         """Filtra por categoría."""
+        if self.catalog:
+            self.category = self.catalog.category(self.kwargs['slug'])
+            if self.category is None:
+                raise Http404('Categoría no encontrada')
+            return self.category.topics
         self.category = get_object_or_404(Category, slug=self.kwargs['slug'])
         return Topic.objects.filter(
             category=self.category,
             is_published=True
-        ).select_related('video', 'category').order_by('code')
+        ).select_related('video', 'category').in_course_order()
+    
+    def get_validator_state(self):
+        if self.catalog:
+            return self.get_snapshot_state()
+        return listing_state(Topic.objects.published().filter(category__slug=self.kwargs['slug']))
+    
+    def get_approximate_total(self):
+        return self.category.published_topic_count
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['category'] = self.category
-        context['all_categories'] = Category.objects.all()
+        context['all_categories'] = self.catalog.categories if self.catalog else Category.objects.all()
         return context
 
 
+# Facetas de la búsqueda en el orden en que se muestran
+FACET_TITLES = [
+    ('category', 'Categoría'),
+    ('location', 'Ubicación'),
+    ('platform', 'Plataforma'),
+    ('tag', 'Tags'),
+]
+
+
+# Momentos de las transcripciones que se muestran junto a los resultados
+TRANSCRIPT_HITS = 5
+
+
 class SearchView(ListView):
     """
-    Buscador inteligente: Title, Code, Tags.
+    Buscador inteligente: Code, Title, Tags y Descripción.
+    Usa el índice full-text de core.search (GIN en PostgreSQL, FTS5 en SQLite);
+    sin resultados, temas parecidos por trigramas con "¿Quisiste decir?".
     """
     model = Topic
     template_name = 'core/search_results.html'
@@ -89,32 +233,60 @@ class SearchView(ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        """Búsqueda en Title, Code y Tags."""
+        """Resultados ordenados por relevancia; cada página carga sólo sus topics."""
         query = self.request.GET.get('q', '').strip()
         self.query = query
         
+        self.filters = search.parse_filters(self.request.GET)
+        
         if not query:
             return Topic.objects.none()
         
-        # Búsqueda en múltiples campos
-        return Topic.objects.filter(
-            Q(title__icontains=query) |
-            Q(code__icontains=query) |
-            Q(tags__name__icontains=query) |
-            Q(description__icontains=query),
-            is_published=True
-        ).select_related('category', 'video').distinct().order_by('code')
+        self.result = search.execute(query, self.filters)
+        return search.TopicHitList(self.result)
+    
+    def get_search_url(self, filters):
+        return '?' + urlencode({'q': self.query, **filters}, doseq=True)
+    
+    def get_facet_groups(self, facets):
+        """Cada valor de faceta con la URL que lo agrega o lo quita de los filtros."""
+        groups = []
+        for name, title in FACET_TITLES:
+            items = []
+            for item in facets.get(name, []):
+                values = set(self.filters.get(name, ()))
+                values.symmetric_difference_update({item['value']})
+                filters = {**self.filters, name: sorted(values)}
+                items.append({**item, 'url': self.get_search_url(filters)})
+            if items:
+                groups.append({'name': name, 'title': title, 'items': items})
+        return groups
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['query'] = self.query
-        context['total_results'] = self.get_queryset().count()
+        result = getattr(self, 'result', None)
+        context['total_results'] = result.total if result else 0
+        context['results_limited'] = result.limited if result else False
+        context['facets'] = result.facets if result else {}
+        context['facet_groups'] = self.get_facet_groups(context['facets'])
+        context['filters'] = self.filters
+        # Query string de la búsqueda actual (para la paginación)
+        context['search_query'] = self.get_search_url(self.filters)[1:]
+        context['clear_filters_url'] = self.get_search_url({})
+        context['fuzzy'] = result.fuzzy if result else False
+        context['suggestion'] = result.suggestion if result else ''
+        # Frases dichas dentro de los videos (sólo en la primera página)
+        page = context.get('page_obj')
+        if self.query and (page is None or page.number == 1):
+            context['transcript_hits'] = transcripts.search(self.query, TRANSCRIPT_HITS)
         return context
 
 
-class CourseView(ListView):
+class CourseView(CatalogSnapshotMixin, ConditionalGetMixin, CachedPageMixin, KeysetPaginationMixin, ListView):
     """
     Modo Curso: Lista secuencial ordenada por código.
+    Paginada por cursor (core.pagination): sin COUNT(*) ni OFFSET.
     """
     model = Topic
     template_name = 'core/course_mode.html'
@@ -123,11 +295,90 @@ class CourseView(ListView):
     
     def get_queryset(self):
         """Todos los topics ordenados por código."""
+        if self.catalog:
+            return self.catalog.course
         return Topic.objects.filter(
             is_published=True
-        ).select_related('category', 'video').order_by('code')
+        ).select_related('category', 'video').in_course_order()
+    
+    def get_validator_state(self):
+        if self.catalog:
+            return self.get_snapshot_state()
+        return listing_state(Topic.objects.published(), with_categories=False)
+    
+    def get_approximate_total(self):
+        """Suma de los contadores de las categorías (cacheada hasta el próximo cambio)."""
+        if self.catalog:
+            return len(self.catalog.course)
+        return cache.get_or_set(
+            make_key('content', 'course_total'),
+            lambda: Category.objects.aggregate(total=Sum('published_topic_count'))['total'] or 0,
+            getattr(settings, 'PAGE_CACHE_TIMEOUT', 3600),
+        )
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_topics'] = self.get_queryset().count()
+        context['total_topics'] = context['page_obj'].total
         return context
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class CatalogExportView(View):
+    """
+    Descarga del catálogo en streaming (sólo staff).
+    ?format=jsonl|csv  &model=topic (repetible; CSV admite uno).
+    """
+    
+    def get(self, request):
+        fmt = request.GET.get('format', 'jsonl')
+        models = request.GET.getlist('model')
+        try:
+            chunks = export.stream_catalog(models, fmt)
+        except ValueError as exc:
+            return HttpResponseBadRequest(str(exc))
+        
+        name = '-'.join(models) if models else 'catalogo'
+        response = StreamingHttpResponse(chunks, content_type=export.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = (
+            f'attachment; filename="{name}-{timezone.localdate():%Y%m%d}.{fmt}"'
+        )
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class CacheStatsView(View):
+    """
+    Estado del caché (sólo staff): aciertos del caché de páginas y, con
+    core.shared_cache, filas, bytes, desalojos y aciertos de todos los workers.
+    """
+    
+    def get(self, request):
+        store = cache.stats() if hasattr(cache, 'stats') else None
+        response = JsonResponse({
+            'backend': f'{type(cache).__module__}.{type(cache).__name__}',
+            'pages': page_cache_stats(),
+            'store': store,
+        })
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+class ThumbnailView(View):
+    """
+    Variantes de core.thumbnails. El nombre lleva el hash del contenido:
+    nunca cambia, así que se cachea un año sin revalidar.
+    """
+    
+    def get(self, request, name):
+        if not thumbnails.FILENAME.match(name):
+            raise Http404
+        path = f'{thumbnails.DIRECTORY}/{name}'
+        try:
+            stream = default_storage.open(path)
+        except FileNotFoundError:
+            raise Http404
+        content_type = 'image/webp' if name.endswith('.webp') else 'image/jpeg'
+        response = FileResponse(stream, content_type=content_type)
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
@@ -150,3 +150,100 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Búsqueda full-text (core.search)
+# El motor se elige según la base de datos (PostgreSQL: GIN, SQLite: FTS5).
+# SEARCH_BACKEND permite forzar uno, ej: 'core.search.BasicSearchBackend'
+SEARCH_BACKEND = config('SEARCH_BACKEND', default=None)
+SEARCH_MAX_RESULTS = config('SEARCH_MAX_RESULTS', default=500, cast=int)
+SEARCH_CACHE_TIMEOUT = config('SEARCH_CACHE_TIMEOUT', default=600, cast=int)
+# Sin resultados exactos se buscan temas y tags parecidos (core.fuzzy):
+# fracción mínima de los trigramas de la consulta que debe contener el texto
+FUZZY_SEARCH_THRESHOLD = config('FUZZY_SEARCH_THRESHOLD', default=0.6, cast=float)
+
+
+# Temas relacionados (core.related): cuántos se muestran en "Ver también".
+# Se recalculan con el comando refresh_related_topics (cron)
+RELATED_TOPICS_LIMIT = config('RELATED_TOPICS_LIMIT', default=6, cast=int)
+
+# Snapshot del catálogo en memoria (core.snapshot): las vistas públicas leen
+# de él sin consultas. Cada proceso revisa el sello de versión en la base a
+# lo sumo cada CATALOG_SNAPSHOT_CHECK_SECONDS y reconstruye si cambió
+CATALOG_SNAPSHOT = config('CATALOG_SNAPSHOT', default=False, cast=bool)
+CATALOG_SNAPSHOT_CHECK_SECONDS = config('CATALOG_SNAPSHOT_CHECK_SECONDS', default=5, cast=int)
+
+# Registro de cambios (core.changelog): la versión que se entrega a los
+# dispositivos retiene las entradas de los últimos segundos. En PostgreSQL un
+# id se asigna antes del commit y una transacción lenta puede confirmar un id
+# menor que otro ya visible; SQLite serializa las escrituras y no lo necesita
+CHANGELOG_COMMIT_LAG_SECONDS = config(
+    'CHANGELOG_COMMIT_LAG_SECONDS', default=5 if DATABASE_URL else 0, cast=int
+)
+
+
+# Caché
+# Por defecto core.shared_cache.SharedCache: un archivo SQLite (WAL) que
+# comparten todos los workers de gunicorn del servidor, así las páginas
+# cacheadas y las invalidaciones (bump_version) llegan a todos y sobreviven
+# al reciclado de workers. Límites: CACHE_MAX_ENTRIES filas y CACHE_MAX_SIZE
+# bytes (se desalojan las menos usadas). También se puede usar Redis:
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHE_BACKEND = config('CACHE_BACKEND', default='core.shared_cache.SharedCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'var' / 'cache.sqlite3')),
+    }
+}
+if CACHE_BACKEND == 'core.shared_cache.SharedCache':
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=100000, cast=int),
+        'MAX_SIZE': config('CACHE_MAX_SIZE', default=256 * 1024 * 1024, cast=int),
+    }
+
+# Páginas públicas completas (core.cache.CachedPageMixin); 0 lo desactiva
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Exportación del catálogo (core.export): filas por consulta
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Metadatos de videos (core.video_metadata, comando fetch_video_metadata)
+# base_url se puede cambiar para usar un proxy o un servidor local; rate es
+# el máximo de requests por segundo a cada plataforma.
+GOOGLE_API_KEY = config('GOOGLE_API_KEY', default='')
+VIDEO_METADATA = {
+    'youtube': {
+        'base_url': config('YOUTUBE_API_URL', default='https://www.googleapis.com/youtube/v3'),
+        'api_key': GOOGLE_API_KEY,
+        'rate': 5,
+    },
+    'vimeo': {
+        'base_url': config('VIMEO_API_URL', default='https://vimeo.com/api'),
+        'rate': 2,
+    },
+    'cloudflare': {
+        'base_url': config('CLOUDFLARE_API_URL', default='https://api.cloudflare.com/client/v4'),
+        'account_id': config('CLOUDFLARE_ACCOUNT_ID', default=''),
+        'api_token': config('CLOUDFLARE_API_TOKEN', default=''),
+        'rate': 4,
+    },
+    'drive': {
+        'base_url': config('DRIVE_API_URL', default='https://www.googleapis.com/drive/v3'),
+        'api_key': GOOGLE_API_KEY,
+        'rate': 5,
+    },
+}
+VIDEO_METADATA_CONCURRENCY = config('VIDEO_METADATA_CONCURRENCY', default=8, cast=int)
+# Respuestas guardadas en disco (0 desactiva el caché)
+VIDEO_METADATA_CACHE_DIR = config('VIDEO_METADATA_CACHE_DIR', default=str(BASE_DIR / 'var' / 'video_metadata'))
+VIDEO_METADATA_CACHE_TIMEOUT = config('VIDEO_METADATA_CACHE_TIMEOUT', default=7 * 24 * 3600, cast=int)
+
+# Miniaturas locales (core.thumbnails, comando fetch_thumbnails): clase que
+# descarga las imágenes originales
+THUMBNAIL_FETCHER = config('THUMBNAIL_FETCHER', default='core.thumbnails.HttpFetcher')
+
+# Markdown de las descripciones (core.markup). Tras cambiarlo correr
+# python manage.py render_descriptions
+MARKDOWN_EXTENSIONS = ['extra', 'sane_lists', 'nl2br']
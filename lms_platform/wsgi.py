@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms_platform.settings')
 
 application = get_wsgi_application()
+
+# Índice de autocompletado del proceso (core.typeahead), antes de la primera request
+from core import snapshot, typeahead  # noqa: E402
+
+typeahead.warm_up()
+
+# Snapshot del catálogo (core.snapshot, si CATALOG_SNAPSHOT está activado)
+snapshot.warm_up()